@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -7,10 +8,32 @@ class Settings(BaseSettings):
     supabase_url: str
     supabase_anon_key: str
     supabase_service_role_key: str
+    # Legacy HS256 JWT secret; asymmetric keys are fetched from the JWKS endpoint
+    supabase_jwt_secret: str = ""
+
+    # Auth identity cache
+    identity_cache_max_entries: int = 4096
+    identity_cache_ttl_seconds: int = 60
+    jwks_cache_ttl_seconds: int = 3600
 
     # LangSmith
     langsmith_api_key: str = ""
     langsmith_project: str = "rag-masterclass"
+    langsmith_endpoint: str = "https://eu.api.smith.langchain.com"
+    # Fraction of runs traced per operation type
+    langsmith_sample_rate_chat: float = 1.0
+    langsmith_sample_rate_embeddings: float = 0.1
+    langsmith_sample_rate_ingestion: float = 0.1
+    # Runs waiting for export beyond this are dropped
+    langsmith_queue_max_runs: int = 1000
+    langsmith_batch_size: int = 50
+    langsmith_flush_interval_seconds: float = 2.0
+    # Longer strings and lists in run inputs/outputs are cut before queueing,
+    # which bounds the queue's memory (e.g. batches of chunk texts being embedded)
+    langsmith_max_field_chars: int = 1000
+    langsmith_max_list_items: int = 20
+    # Check connectivity in the background at startup
+    langsmith_startup_check: bool = False
 
     # OpenAI API Key (legacy, used as fallback for LLM and Embedding)
     openai_api_key: str = ""
@@ -19,6 +42,17 @@ class Settings(BaseSettings):
     llm_api_key: str = ""
     llm_base_url: str = ""
     llm_model: str = "gpt-4o"
+    # Output token limit for a chat completion (verbatim mode uses its own, smaller one)
+    llm_max_completion_tokens: int = 16000
+    # Provider prompt caching: auto | openai | cache_control | off
+    llm_prompt_cache_mode: str = "auto"
+    # Extra OpenAI-compatible providers tried in order after the primary, as JSON:
+    # [{"base_url": "...", "api_key": "...", "model": "..."}]
+    llm_fallback_providers: list[dict[str, str]] = []
+    # Start a hedged request on the next provider if no token arrives in time (0 = off)
+    llm_hedge_after_ms: int = 4000
+    llm_breaker_failure_threshold: int = 3
+    llm_breaker_reset_seconds: float = 30.0
 
     # Embedding Settings (fallback if global_settings not configured)
     embedding_api_key: str = ""
@@ -26,6 +60,114 @@ class Settings(BaseSettings):
     embedding_model: str = "text-embedding-3-small"
     embedding_dimensions: int = 1536
 
+    # Upstream call scheduling: requests/second (0 = unlimited), burst size and
+    # concurrent calls (0 = unlimited). Batch work (ingestion, backfills) may
+    # only use batch_max_concurrency slots and always queues behind chat.
+    embedding_requests_per_second: float = 0.0
+    embedding_requests_burst: float = 10.0
+    embedding_max_concurrency: int = 8
+    embedding_batch_max_concurrency: int = 4
+    llm_requests_per_second: float = 0.0
+    llm_requests_burst: float = 10.0
+    llm_max_concurrency: int = 32
+    llm_batch_max_concurrency: int = 2
+    rerank_requests_per_second: float = 0.0
+    rerank_requests_burst: float = 10.0
+    rerank_max_concurrency: int = 8
+
+    # Hybrid search sizes: chunks returned to the model, candidates per leg,
+    # fused results sent to the reranker, and the RRF constant
+    search_top_k: int = 20
+    search_match_count: int = 50
+    search_final_count: int = 30
+    search_rrf_k: int = 60
+    # Vector leg index: "exact" (full vectors), or a "halfvec"/"binary" quantized
+    # first pass of match_count * search_rescore_factor candidates, re-scored exactly
+    search_vector_index: Literal["exact", "halfvec", "binary"] = "exact"
+    search_rescore_factor: int = 4
+    # Adaptive sizing: start with the initial sizes and widen to the ones above
+    # only when vector scores are flat or the vector and keyword legs disagree
+    search_adaptive_enabled: bool = True
+    search_initial_match_count: int = 20
+    search_initial_final_count: int = 20
+    search_widen_min_score_gap: float = 0.05
+    search_widen_min_agreement: float = 0.2
+    # Per-query reranker payload caps (Jina truncates long documents anyway)
+    rerank_max_documents: int = 30
+    rerank_max_document_chars: int = 3000
+    rerank_max_payload_chars: int = 60000
+
+    # In-process vector index replica for the vector leg (needs numpy); falls
+    # back to the database while loading or behind the corpus generation
+    vector_index_enabled: bool = False
+    # Snapshot directory relative to the backend directory
+    vector_index_path: str = "data/vector_index"
+    vector_index_dimensions: int = 1536
+    # IVF clusters (0 = sqrt of the row count) and clusters scanned per query
+    vector_index_lists: int = 0
+    vector_index_nprobe: int = 16
+    # Write a new snapshot once this many rows were added or hidden since the last
+    vector_index_compact_rows: int = 20000
+
+    # In-process BM25 keyword index with Uzbek-aware tokenization (needs numpy);
+    # replaces the ts_rank('russian') keyword leg while current
+    keyword_index_enabled: bool = False
+    # Snapshot directory relative to the backend directory
+    keyword_index_path: str = "data/keyword_index"
+    keyword_index_k1: float = 1.2
+    keyword_index_b: float = 0.75
+    # Compact and snapshot once this many rows were added or hidden since the last
+    keyword_index_compact_rows: int = 20000
+
+    # Retrieval result cache
+    search_cache_max_entries: int = 512
+    search_cache_ttl_seconds: int = 600
+
+    # Number of most recent thread messages sent to the LLM
+    chat_history_window: int = 50
+
+    # Assistant messages that could not be written after all retries (JSON lines),
+    # retried on the next start
+    write_behind_dead_letter_path: str = "data/write_behind_failed.jsonl"
+
+    # SSE text_delta coalescing: flush interval and UTF-8 bytes (0/0 sends one frame per token)
+    sse_flush_interval_ms: int = 50
+    sse_flush_bytes: int = 2048
+
+    # Resumable SSE stream buffers
+    stream_buffer_retention_seconds: int = 300
+    stream_buffer_max_streams: int = 500
+    stream_buffer_max_bytes: int = 4 * 1024 * 1024
+    # Cancel a generation this long after its last client disconnects (0 = immediately)
+    stream_disconnect_grace_seconds: float = 15.0
+
+    # Semantic answer cache (single-turn questions only)
+    answer_cache_enabled: bool = True
+    answer_cache_similarity_threshold: float = 0.97
+    answer_cache_max_entries: int = 256
+    answer_cache_ttl_seconds: int = 86400
+
+    # Verbatim delivery: the LLM selects article spans, the server streams stored text
+    verbatim_delivery_enabled: bool = False
+
+    # Logging
+    log_level: str = "INFO"
+    # text | json (one JSON object per line)
+    log_format: str = "text"
+    # Log file relative to the backend directory ("" logs to the console only)
+    log_file: str = "logs/rag_debug.log"
+    # Records waiting for the writer thread beyond this are dropped
+    log_queue_max_records: int = 10000
+    # Fraction of DEBUG/INFO records kept per logger prefix, as JSON:
+    # {"app.services.retrieval_service": 0.1}
+    log_sample_rates: dict[str, float] = {}
+
+    # Expose Prometheus metrics on /metrics (unauthenticated; restrict at the proxy)
+    metrics_enabled: bool = True
+
+    # How long the global_settings row is cached in-process
+    global_settings_cache_ttl_seconds: int = 30
+
     # Encryption
     settings_encryption_key: str = ""
 
@@ -1,3 +1,9 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
@@ -5,9 +11,38 @@ from pydantic import BaseModel
 
 from app.config import get_settings
 from app.db.supabase import get_supabase_client
+from app.services.cache import TTLCache
+from app.services.http_clients import get_http_client
+from app.services.metrics import timed_stage
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+_settings = get_settings()
+
+# user_id -> is_admin, so the common auth path needs no DB round-trip
+identity_cache = TTLCache(
+    max_entries=_settings.identity_cache_max_entries,
+    ttl_seconds=_settings.identity_cache_ttl_seconds,
+    name="identity",
+)
+
+# sha256(token) -> claims of HS256 tokens verified by Supabase Auth, used
+# when SUPABASE_JWT_SECRET is not set; entries never outlive the token
+verified_token_cache = TTLCache(
+    max_entries=_settings.identity_cache_max_entries,
+    ttl_seconds=_settings.identity_cache_ttl_seconds,
+    name="verified_tokens",
+)
+
+# Last fetched JWKS; kept past its TTL if a refresh fails
+_jwks: dict = {"keys": [], "fetched_at": 0.0, "forced_at": float("-inf")}
+# Unknown key ids force at most one JWKS fetch per interval, so tokens with
+# made-up kids cannot turn every request into an outbound fetch
+JWKS_FORCED_REFRESH_INTERVAL_SECONDS = 30.0
+_warned_auth_fallback = False
+
 
 class User(BaseModel):
     id: str
@@ -15,22 +50,121 @@ class User(BaseModel):
     is_admin: bool = False
 
 
+def invalidate_user_identity(user_id: str) -> None:
+    """Drop a cached identity, e.g. after the user's admin status changes."""
+    identity_cache.pop(user_id)
+
+
+async def get_jwks(force_refresh: bool = False) -> list[dict]:
+    """
+    Return the project's JSON Web Key Set, refreshing it when older than the TTL.
+
+    force_refresh fetches even within the TTL (key rotation), but at most once
+    per JWKS_FORCED_REFRESH_INTERVAL_SECONDS; within that window the cached
+    keys are returned.
+    """
+    settings = get_settings()
+    now = time.monotonic()
+    if force_refresh:
+        if now - _jwks["forced_at"] < JWKS_FORCED_REFRESH_INTERVAL_SECONDS:
+            return _jwks["keys"]
+        _jwks["forced_at"] = now
+    elif _jwks["keys"] and now - _jwks["fetched_at"] < settings.jwks_cache_ttl_seconds:
+        return _jwks["keys"]
+
+    try:
+        response = await get_http_client().get(
+            f"{settings.supabase_url}/auth/v1/.well-known/jwks.json",
+            headers={"apikey": settings.supabase_anon_key},
+            timeout=5.0,
+        )
+        response.raise_for_status()
+        _jwks["keys"] = response.json().get("keys", [])
+        _jwks["fetched_at"] = time.monotonic()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error(f"Failed to fetch JWKS: {e}. Using last known keys.")
+
+    return _jwks["keys"]
+
+
+async def verify_with_auth_server(token: str) -> dict:
+    """
+    Verify an HS256 token by asking Supabase Auth, for projects without SUPABASE_JWT_SECRET.
+
+    Results are cached per token until it expires (at most the identity cache
+    TTL), so only a user's first request pays the round-trip.
+
+    Raises JWTError if Supabase Auth rejects the token.
+    """
+    global _warned_auth_fallback
+    if not _warned_auth_fallback:
+        logger.warning("SUPABASE_JWT_SECRET not set - verifying HS256 tokens with Supabase Auth")
+        _warned_auth_fallback = True
+
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    claims = verified_token_cache.get(cache_key)
+    if claims is not None:
+        return claims
+
+    claims = jwt.get_unverified_claims(token)
+    try:
+        response = await asyncio.to_thread(get_supabase_client().auth.get_user, token)
+    except Exception as e:
+        raise JWTError(f"Token rejected by Supabase Auth: {e}")
+    user = response.user if response else None
+    if user is None or user.id != claims.get("sub"):
+        raise JWTError("Token rejected by Supabase Auth")
+
+    ttl = min(verified_token_cache.ttl_seconds, claims.get("exp", 0) - time.time())
+    if ttl > 0:
+        verified_token_cache.set(cache_key, claims, ttl_seconds=ttl)
+    return claims
+
+
+async def decode_token(token: str) -> dict:
+    """
+    Verify a Supabase JWT signature and return its claims.
+
+    Asymmetric tokens (ES256/RS256) are checked against the cached JWKS, with
+    a rate-limited forced refresh for an unknown key id (key rotation). HS256
+    tokens are checked against SUPABASE_JWT_SECRET, or by Supabase Auth when
+    the secret is not configured. Signatures are never skipped.
+
+    Raises JWTError if the token is invalid.
+    """
+    settings = get_settings()
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm == "HS256":
+        if not settings.supabase_jwt_secret:
+            return await verify_with_auth_server(token)
+        return jwt.decode(token, settings.supabase_jwt_secret, algorithms=["HS256"], audience="authenticated")
+
+    if algorithm not in ("ES256", "RS256"):
+        raise JWTError(f"Unsupported token algorithm: {algorithm}")
+
+    kid = header.get("kid")
+    keys = await get_jwks()
+    key = next((k for k in keys if k.get("kid") == kid), None)
+    if key is None:
+        keys = await get_jwks(force_refresh=True)
+        key = next((k for k in keys if k.get("kid") == kid), None)
+    if key is None:
+        raise JWTError("Signing key not found")
+
+    return jwt.decode(token, key, algorithms=[algorithm], audience="authenticated")
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> User:
     """Verify Supabase JWT token and extract user info, including admin status."""
-    settings = get_settings()
     token = credentials.credentials
-    supabase = get_supabase_client()
 
     try:
-        payload = jwt.decode(
-            token,
-            settings.supabase_anon_key,
-            algorithms=["HS256", "ES256"],
-            options={"verify_signature": False},
-            audience="authenticated"
-        )
+        with timed_stage("auth_token"):
+            payload = await decode_token(token)
 
         user_id = payload.get("sub")
         email = payload.get("email")
@@ -41,13 +175,18 @@ async def get_current_user(
                 detail="Invalid token: missing user ID"
             )
 
-        # Query user_profiles for admin status
-        try:
-            response = supabase.table("user_profiles").select("is_admin").eq("id", user_id).single().execute()
-            is_admin = response.data.get("is_admin", False) if response.data else False
-        except Exception as e:
-            # If user_profiles table doesn't exist or query fails, user is not admin
-            is_admin = False
+        is_admin = identity_cache.get(user_id)
+        if is_admin is None:
+            # Query user_profiles for admin status
+            supabase = get_supabase_client()
+            try:
+                with timed_stage("auth_profile"):
+                    response = supabase.table("user_profiles").select("is_admin").eq("id", user_id).single().execute()
+                is_admin = response.data.get("is_admin", False) if response.data else False
+                identity_cache.set(user_id, is_admin)
+            except Exception as e:
+                # If user_profiles table doesn't exist or query fails, user is not admin (not cached)
+                is_admin = False
 
         return User(id=user_id, email=email, is_admin=is_admin)
 
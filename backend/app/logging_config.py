@@ -0,0 +1,126 @@
+"""Queue-based logging: callers only enqueue records; a listener thread formats and writes them."""
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.config import Settings
+from app.services.sse import dumps
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else came in via extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra={...} fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return dumps(entry)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of DEBUG/INFO records per logger prefix.
+
+    rates maps a logger name prefix (e.g. "app.services.retrieval_service")
+    to the fraction kept; the longest matching prefix wins. WARNING and above
+    are never sampled out.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return random.random() < rate
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records without formatting them, dropping them when the queue is full.
+
+    The stock QueueHandler formats the message on the calling thread; here
+    only the traceback is rendered (it cannot outlive the frame safely) and
+    %-style interpolation happens on the listener thread.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def get_logging_stats() -> dict[str, int]:
+    queued = sum(
+        handler.queue.qsize() for handler in logging.getLogger().handlers
+        if isinstance(handler, NonBlockingQueueHandler)
+    )
+    return {"queued": queued, "dropped": NonBlockingQueueHandler.dropped}
+
+
+def configure_logging(settings: Settings, backend_dir: Path) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a bounded queue drained by a background listener.
+
+    Returns the started listener; it is also stopped (flushed) at interpreter exit.
+    """
+    formatter = JsonFormatter() if settings.log_format == "json" else logging.Formatter(TEXT_FORMAT)
+
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if settings.log_file:
+        log_file = backend_dir / settings.log_file
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_max_records)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.log_sample_rates))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(settings.log_level.upper())
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener: logging.handlers.QueueListener) -> None:
+    """Flush queued records and stop the listener thread; safe to call twice."""
+    if listener._thread is not None:
+        listener.stop()
@@ -1,54 +1,83 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import traceback
 import logging
 
 from app.config import get_settings
+from app.services.metrics import RequestTimingMiddleware, registry as metrics_registry
 from app.routers import auth, threads, chat, documents, admin
 from app.routers import settings as settings_router
 
-# Configure logging - write to both console and file
-import os
 from pathlib import Path
 
-# Create logs directory if it doesn't exist
-logs_dir = Path(__file__).parent.parent / "logs"
-logs_dir.mkdir(exist_ok=True)
-log_file = logs_dir / "rag_debug.log"
-
-# Configure logging with both file and console handlers
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),  # Write to file
-        logging.StreamHandler()  # Also output to console
-    ]
-)
-logger = logging.getLogger(__name__)
-logger.info(f"📝 Logging to file: {log_file}")
+from app.logging_config import configure_logging, stop_listener
 
 settings = get_settings()
 
+# Configure logging - console, plus a file unless LOG_FILE is empty. Records
+# are queued and written by a background thread, off the request path.
+log_listener = configure_logging(settings, Path(__file__).parent.parent)
+logger = logging.getLogger(__name__)
+if settings.log_file:
+    logger.info("📝 Logging to file: %s", settings.log_file)
+
 app = FastAPI(
     title="RAG Masterclass API",
     description="Backend API for the RAG Masterclass application",
     version="1.0.0"
 )
 
+# The event loop only keeps weak references to tasks: hold startup background
+# tasks here so they cannot be garbage-collected before they finish
+background_tasks: set[asyncio.Task] = set()
+
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
     logger.info("🚀 Starting RAG Masterclass API")
 
-    # Import langsmith module to trigger initialization and test trace
-    try:
-        from app.services import langsmith
-        logger.info("✅ LangSmith module loaded")
-    except Exception as e:
-        logger.error(f"❌ Failed to load LangSmith: {e}")
+    if settings.langsmith_startup_check:
+        # In the background, so a slow LangSmith endpoint never delays startup
+        from app.services.langsmith import check_connection
+        run_in_background(check_connection())
+
+    from app.services.persistence_queue import persistence_queue
+    persistence_queue.start()
+
+    if settings.vector_index_enabled:
+        # Loads the snapshot and syncs in a background thread; searches use the RPC until ready
+        from app.services.vector_index import vector_index
+        vector_index.start()
+    if settings.keyword_index_enabled:
+        from app.services.keyword_index import keyword_index
+        keyword_index.start()
+
+    # Fill caches and pools in the background; /ready reports when done
+    from app.services.warmup import warm_up
+    run_in_background(warm_up())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending writes before the process exits."""
+    from app.services.persistence_queue import persistence_queue
+    await persistence_queue.stop()
+    from app.services.langsmith import exporter
+    await exporter.stop()
+    from app.services.http_clients import close_http_clients
+    await close_http_clients()
+    logger.info("👋 RAG Masterclass API stopped")
+    stop_listener(log_listener)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,7 +85,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(RequestTimingMiddleware)
 
 
 @app.exception_handler(Exception)
@@ -75,6 +106,35 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: 503 until startup warm-up (settings cache, HTTP pools) has run.
+
+    Unauthenticated, so it only reports whether each step succeeded; the
+    errors of failed steps are in the log.
+    """
+    from app.services.warmup import warmup_state
+
+    status_code = 200 if warmup_state["ready"] else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={
+            "status": "ready" if warmup_state["ready"] else "warming_up",
+            "ready": warmup_state["ready"],
+            "steps": dict(warmup_state["steps"]),
+        },
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: stage latency histograms and token counters."""
+    if not settings.metrics_enabled:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(threads.router)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
-from app.dependencies import get_admin_user, User
+from app.dependencies import get_admin_user, invalidate_user_identity, User
 from app.db.supabase import get_supabase_admin_client
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -62,6 +62,7 @@ async def create_user(
             )
 
         profile = profile_response.data[0]
+        invalidate_user_identity(user_id)
 
         return UserResponse(
             id=profile["id"],
@@ -132,6 +133,9 @@ async def toggle_admin_status(
 
         user = response.data[0]
 
+        # Apply the new role on the user's next request instead of after the cache TTL
+        invalidate_user_identity(user_id)
+
         return UserResponse(
             id=user["id"],
             email=user["email"],
@@ -146,3 +150,56 @@ async def toggle_admin_status(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update admin status: {str(e)}"
         )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    admin: User = Depends(get_admin_user)
+) -> dict:
+    """Return hit-rate and request-coalescing statistics for in-process caches (admin only)."""
+    from app.services.retrieval_service import search_cache, search_flight
+    from app.services.embedding_service import embedding_flight
+    from app.services.answer_cache import answer_cache
+    from app.services.corpus_state import get_corpus_generation
+    from app.services.llm_service import get_prompt_cache_stats
+    from app.dependencies import identity_cache, verified_token_cache
+    from app.routers.settings import settings_row_cache
+    from app.services.persistence_queue import persistence_queue
+    from app.services.stream_registry import stream_registry
+    from app.services.scheduler import get_scheduler_stats
+    from app.services.llm_providers import get_provider_stats
+    from app.services.langsmith import exporter as trace_exporter
+    from app.logging_config import get_logging_stats
+    from app.services.vector_index import vector_index
+    from app.services.keyword_index import keyword_index
+
+    return {
+        "corpus_generation": get_corpus_generation(),
+        "caches": [
+            search_cache.stats(),
+            answer_cache.stats(),
+            identity_cache.stats(),
+            verified_token_cache.stats(),
+            settings_row_cache.stats(),
+        ],
+        "coalescing": [search_flight.stats(), embedding_flight.stats()],
+        "prompt_cache": get_prompt_cache_stats(),
+        "write_behind": persistence_queue.stats(),
+        "streams": stream_registry.stats(),
+        "upstream": get_scheduler_stats(),
+        "llm_providers": get_provider_stats(),
+        "tracing": trace_exporter.stats(),
+        "logging": get_logging_stats(),
+        "vector_index": vector_index.stats(),
+        "keyword_index": keyword_index.stats(),
+    }
+
+
+@router.delete("/cache/answers")
+async def purge_answer_cache(
+    admin: User = Depends(get_admin_user)
+) -> dict:
+    """Drop all cached assistant answers (admin only)."""
+    from app.services.answer_cache import answer_cache
+
+    return {"purged": answer_cache.purge()}
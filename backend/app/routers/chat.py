@@ -1,17 +1,48 @@
-import json
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import logging
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from starlette.responses import StreamingResponse
 from datetime import datetime
 
+from app.config import get_settings
 from app.dependencies import get_current_user, User
 from app.db.supabase import get_supabase_client
 from app.models.schemas import MessageCreate, MessageResponse
-from app.services.llm_service import astream_chat_response, RAG_TOOLS
-from app.services.tool_executor import execute_tool_call
+from app.services.answer_cache import answer_cache, is_cacheable_conversation
+from app.services.corpus_state import get_corpus_generation, get_corpus_state
+from app.services.embedding_service import get_embeddings
+from app.services.llm_service import (
+    astream_chat_response,
+    get_global_llm_settings,
+    RAG_TOOLS,
+    SYSTEM_PROMPT,
+    VERBATIM_TOOLS,
+    VERBATIM_SYSTEM_PROMPT,
+    QUOTE_TOOL_NAME,
+)
+from app.services.metrics import get_request_timings, observe_stage, timed_stage
+from app.services.persistence_queue import persistence_queue
+from app.services.retrieval_service import normalize_query
+from app.services.sse import DeltaCoalescer, format_sse, paced_events
+from app.services.stream_registry import (
+    stream_registry,
+    StreamBuffer,
+    ResumeUnavailable,
+    record_generation_cancelled,
+    record_generation_completed,
+)
+from app.services.tool_executor import execute_tool_call, execute_quote_call
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/threads/{thread_id}", tags=["chat"])
 
 MAX_TOOL_ROUNDS = 3
+MAX_VERBATIM_TOOL_ROUNDS = 4  # search -> quote -> closing text, plus one re-search
+VERBATIM_MAX_COMPLETION_TOKENS = 2000  # Model only writes framing text in verbatim mode
+CACHED_ANSWER_DELTA_CHARS = 400  # Size of text_delta frames when replaying a cached answer
+PENDING_WRITE_WAIT_SECONDS = 5.0  # Longest a new turn waits for the previous answer to be written
 
 
 async def verify_thread_access(thread_id: str, user_id: str) -> dict:
@@ -38,12 +69,153 @@ def get_thread_messages(thread_id: str) -> list[dict[str, str]]:
 
 def system_has_documents() -> bool:
     """Check if system has any completed documents for RAG (shared access model)."""
-    supabase = get_supabase_client()
     # Check if ANY documents exist (not filtered by user - all users can search all docs)
-    result = supabase.table("documents").select("id", count="exact").eq(
-        "status", "completed"
-    ).limit(1).execute()
-    return (result.count or 0) > 0
+    return (get_corpus_state().get("completed_documents") or 0) > 0
+
+
+async def prepare_chat_turn(thread_id: str, user_id: str, content: str) -> tuple[list[dict[str, str]], bool]:
+    """
+    Verify thread access, store the user message and load the windowed history
+    plus the corpus flag in a single prepare_chat_turn RPC.
+
+    Falls back to the sequential queries if the RPC is not deployed.
+
+    Returns:
+        Tuple of (message history formatted for the API, system has documents)
+    """
+    supabase = get_supabase_client()
+    history_limit = get_settings().chat_history_window
+
+    # The previous answer may still be in the write-behind queue
+    await persistence_queue.wait_for_thread(thread_id, PENDING_WRITE_WAIT_SECONDS)
+
+    try:
+        with timed_stage("prepare_turn"):
+            result = supabase.rpc("prepare_chat_turn", {
+                "p_thread_id": thread_id,
+                "p_user_id": user_id,
+                "p_content": content,
+                "p_history_limit": history_limit,
+                # Same clock as the assistant message timestamps
+                "p_created_at": datetime.utcnow().isoformat(),
+            }).execute()
+    except Exception as e:
+        # PGRST202: function not found (migration not applied yet)
+        if getattr(e, "code", None) != "PGRST202":
+            raise
+        logger.warning("prepare_chat_turn RPC not found, using sequential queries")
+        return await _prepare_chat_turn_sequential(thread_id, user_id, content, history_limit)
+
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Thread not found"
+        )
+
+    return result.data["history"], result.data["has_documents"]
+
+
+async def _prepare_chat_turn_sequential(
+    thread_id: str, user_id: str, content: str, history_limit: int
+) -> tuple[list[dict[str, str]], bool]:
+    """Pre-RPC path: one round-trip per step."""
+    await verify_thread_access(thread_id, user_id)
+    supabase = get_supabase_client()
+
+    user_message_result = supabase.table("messages").insert({
+        "thread_id": thread_id,
+        "user_id": user_id,
+        "role": "user",
+        "content": content,
+        "created_at": datetime.utcnow().isoformat(),
+    }).execute()
+
+    if not user_message_result.data:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to save user message"
+        )
+
+    return get_thread_messages(thread_id)[-history_limit:], system_has_documents()
+
+
+def save_assistant_message(thread_id: str, user_id: str, content: str) -> None:
+    """
+    Store the assistant's reply and bump the thread's updated_at.
+
+    The writes go through the write-behind queue so the done event is not
+    held up by database latency.
+    """
+    persistence_queue.enqueue_assistant_message(thread_id, user_id, content)
+
+
+async def prepare_answer_cache(question: str, user_id: str) -> dict | None:
+    """
+    Embed a single-turn question and look it up in the semantic answer cache.
+
+    Returns the context needed to store the answer on a miss (and the hit, if
+    any), or None if the cache cannot be used for this request.
+    """
+    try:
+        model = get_global_llm_settings()["model"]
+        generation = get_corpus_generation()
+        embeddings = await get_embeddings([normalize_query(question)], user_id=user_id)
+    except Exception as e:
+        logger.warning(f"Answer cache lookup skipped: {e}")
+        return None
+
+    hit = answer_cache.lookup(question, embeddings[0], model, generation)
+    if hit:
+        logger.debug("Answer cache hit (similarity=%.4f)", hit[1])
+
+    return {
+        "question": question,
+        "embedding": embeddings[0],
+        "model": model,
+        "generation": generation,
+        "hit": hit[0] if hit else None,
+    }
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+async def stream_buffered_frames(buffer: StreamBuffer, after_seq: int = 0):
+    """
+    Relay a buffered stream to one client, replaying frames after after_seq.
+
+    Closing the subscription as soon as the client goes away lets the buffer
+    start its disconnect grace period (and then cancel the generation).
+    """
+    frames = buffer.subscribe(after_seq)
+    try:
+        async for frame in frames:
+            yield frame
+    except ResumeUnavailable as e:
+        yield format_sse("error", {"error": str(e)})
+    finally:
+        await frames.aclose()
+
+
+def resume_stream_response(thread_id: str, user_id: str, last_event_id: str | None) -> StreamingResponse:
+    """Replay the frames a client missed, then continue with the live stream."""
+    try:
+        buffer, after_seq = stream_registry.resolve(thread_id, user_id, last_event_id)
+    except ResumeUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+    return StreamingResponse(
+        stream_buffered_frames(buffer, after_seq),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 @router.get("/messages", response_model=list[MessageResponse])
@@ -64,52 +236,104 @@ async def get_messages(
 async def send_message(
     thread_id: str,
     message_data: MessageCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    last_event_id: str | None = Header(default=None),
 ):
-    """Send a message and stream the assistant's response via SSE."""
-    await verify_thread_access(thread_id, current_user.id)
-    supabase = get_supabase_client()
+    """
+    Send a message and stream the assistant's response via SSE.
 
-    # Store user message in database
-    now = datetime.utcnow().isoformat()
-    user_message_result = supabase.table("messages").insert({
-        "thread_id": thread_id,
-        "user_id": current_user.id,
-        "role": "user",
-        "content": message_data.content,
-        "created_at": now,
-    }).execute()
+    The response is generated in the background and buffered; a client that
+    reconnects with a Last-Event-ID header resumes the existing stream
+    instead of posting the message again.
+    """
+    if last_event_id:
+        return resume_stream_response(thread_id, current_user.id, last_event_id)
 
-    if not user_message_result.data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to save user message"
-        )
-
-    # Get full message history for context
-    messages = get_thread_messages(thread_id)
+    # Access check, user message insert, recent history and corpus flag in one round-trip
+    messages, has_documents = await prepare_chat_turn(thread_id, current_user.id, message_data.content)
 
     # Only provide tools if system has documents (shared access - admin uploads, all users query)
-    tools = RAG_TOOLS if system_has_documents() else None
+    verbatim = get_settings().verbatim_delivery_enabled and has_documents
+    if verbatim:
+        # Model selects article spans; the server streams the stored text itself
+        tools = VERBATIM_TOOLS
+        system_prompt = VERBATIM_SYSTEM_PROMPT
+        max_rounds = MAX_VERBATIM_TOOL_ROUNDS
+        max_completion_tokens = VERBATIM_MAX_COMPLETION_TOKENS
+    else:
+        tools = RAG_TOOLS if has_documents else None
+        system_prompt = SYSTEM_PROMPT
+        max_rounds = MAX_TOOL_ROUNDS
+        max_completion_tokens = get_settings().llm_max_completion_tokens
+
+    # Repeated single-turn questions can be answered from the semantic answer cache
+    cache_context = None
+    if get_settings().answer_cache_enabled and is_cacheable_conversation(messages):
+        cache_context = await prepare_answer_cache(message_data.content, current_user.id)
+
+    settings = get_settings()
 
     async def generate():
         """Generate SSE events with tool-calling loop."""
         full_response = ""
         current_messages = list(messages)
         rounds = 0
+        # Completion tokens reported by finished LLM calls, plus deltas of the current one
+        tokens = {"reported": 0, "streaming": 0}
+        # Models that produced this answer; differs from the configured one after a failover
+        answer_models: set[str] = set()
+        # Coalesce token deltas into fewer, larger frames
+        coalescer = DeltaCoalescer(settings.sse_flush_interval_ms, settings.sse_flush_bytes)
+        stream_started_at = time.perf_counter()
+
+        def done_frame() -> str:
+            """Final event, carrying this request's per-stage timings in milliseconds."""
+            observe_stage("chat_stream", time.perf_counter() - stream_started_at)
+            return format_sse("done", {"timings": get_request_timings() or {}})
 
         try:
-            while rounds < MAX_TOOL_ROUNDS:
+            if cache_context and cache_context["hit"]:
+                answer = cache_context["hit"].answer
+                for start in range(0, len(answer), CACHED_ANSWER_DELTA_CHARS):
+                    yield format_sse("text_delta", {"content": answer[start:start + CACHED_ANSWER_DELTA_CHARS]})
+                save_assistant_message(thread_id, current_user.id, answer)
+                yield done_frame()
+                return
+
+            while rounds < max_rounds:
                 rounds += 1
-                async for event in astream_chat_response(current_messages, tools=tools, user_id=current_user.id):
-                    if event["type"] == "text_delta":
+                events = astream_chat_response(
+                    current_messages,
+                    tools=tools,
+                    user_id=current_user.id,
+                    system_prompt=system_prompt,
+                    max_completion_tokens=max_completion_tokens,
+                )
+                async for event in paced_events(events, coalescer):
+                    if event["type"] == "sse_flush":
+                        # Flush interval passed with no new delta
+                        yield event["frame"]
+
+                    elif event["type"] == "text_delta":
+                        tokens["streaming"] += 1
                         full_response += event["content"]
-                        data = json.dumps({"content": event["content"]})
-                        yield f"event: text_delta\ndata: {data}\n\n"
+                        frame = coalescer.add(event["content"])
+                        if frame:
+                            yield frame
+
+                    elif event["type"] == "usage":
+                        tokens["reported"] += event["completion_tokens"]
+                        tokens["streaming"] = 0
 
                     elif event["type"] == "tool_calls":
+                        # Don't hold buffered text back while tools run
+                        frame = coalescer.flush()
+                        if frame:
+                            yield frame
+
                         # Execute tool calls and add results to messages
                         tool_calls = event["tool_calls"]
+                        answer_models.add(event["model"])
 
                         # Add assistant message with tool calls
                         current_messages.append({
@@ -130,7 +354,17 @@ async def send_message(
 
                         # Execute each tool and add results
                         for tc in tool_calls:
-                            result = await execute_tool_call(tc, current_user.id)
+                            if tc["name"] == QUOTE_TOOL_NAME:
+                                # Stream the exact stored text; the model only gets a confirmation
+                                text, result = execute_quote_call(tc)
+                                if text:
+                                    if full_response and not full_response.endswith("\n\n"):
+                                        text = "\n\n" + text
+                                    text += "\n\n"
+                                    full_response += text
+                                    yield format_sse("text_delta", {"content": text})
+                            else:
+                                result = await execute_tool_call(tc, current_user.id)
                             current_messages.append({
                                 "role": "tool",
                                 "tool_call_id": tc["id"],
@@ -141,50 +375,79 @@ async def send_message(
                         break
 
                     elif event["type"] == "response_completed":
+                        frame = coalescer.flush()
+                        if frame:
+                            yield frame
+
                         # Save assistant message to database
                         if full_response:
-                            supabase.table("messages").insert({
-                                "thread_id": thread_id,
-                                "user_id": current_user.id,
-                                "role": "assistant",
-                                "content": full_response,
-                                "created_at": datetime.utcnow().isoformat(),
-                            }).execute()
-
-                            # Update thread's updated_at
-                            supabase.table("threads").update({
-                                "updated_at": datetime.utcnow().isoformat()
-                            }).eq("id", thread_id).execute()
-
-                        yield f"event: done\ndata: {{}}\n\n"
+                            save_assistant_message(thread_id, current_user.id, full_response)
+
+                            # Record the model that actually answered; an answer
+                            # mixing providers across tool rounds is not cached
+                            answer_models.add(event["model"])
+                            if cache_context and len(answer_models) == 1:
+                                answer_cache.store(
+                                    cache_context["question"],
+                                    cache_context["embedding"],
+                                    full_response,
+                                    event["model"],
+                                    cache_context["generation"],
+                                )
+
+                        logger.debug("SSE stream stats: %s", coalescer.stats())
+                        record_generation_completed(tokens["reported"] + tokens["streaming"])
+                        yield done_frame()
                         return  # Done, exit the generator
 
                     elif event["type"] == "error":
-                        data = json.dumps({"error": event["error"]})
-                        yield f"event: error\ndata: {data}\n\n"
+                        frame = coalescer.flush()
+                        if frame:
+                            yield frame
+                        yield format_sse("error", {"error": event["error"]})
                         return
 
             # If we exhausted rounds without a final response, send done
+            frame = coalescer.flush()
+            if frame:
+                yield frame
             if full_response:
-                supabase.table("messages").insert({
-                    "thread_id": thread_id,
-                    "user_id": current_user.id,
-                    "role": "assistant",
-                    "content": full_response,
-                    "created_at": datetime.utcnow().isoformat(),
-                }).execute()
-            yield f"event: done\ndata: {{}}\n\n"
+                save_assistant_message(thread_id, current_user.id, full_response)
+            record_generation_completed(tokens["reported"] + tokens["streaming"])
+            yield done_frame()
+
+        except asyncio.CancelledError:
+            # Every client left: the LLM stream and any running tool are
+            # cancelled with us. Nothing is persisted for an abandoned answer.
+            record_generation_cancelled(tokens["reported"] + tokens["streaming"])
+            logger.info(f"Generation for thread {thread_id} cancelled after client disconnect")
+            raise
 
         except Exception as e:
-            data = json.dumps({"error": str(e)})
-            yield f"event: error\ndata: {data}\n\n"
+            frame = coalescer.flush()
+            if frame:
+                yield frame
+            yield format_sse("error", {"error": str(e)})
+
+    buffer = stream_registry.start(thread_id, current_user.id, generate())
 
     return StreamingResponse(
-        generate(),
+        stream_buffered_frames(buffer),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
+        headers=SSE_HEADERS,
     )
+
+
+@router.get("/messages/stream")
+async def resume_message_stream(
+    thread_id: str,
+    current_user: User = Depends(get_current_user),
+    last_event_id: str | None = Header(default=None),
+):
+    """
+    Resume the thread's latest response stream.
+
+    With a Last-Event-ID header, only frames after that event are replayed;
+    without one, the whole buffered response is replayed.
+    """
+    return resume_stream_response(thread_id, current_user.id, last_event_id)
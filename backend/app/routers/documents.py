@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Backgro
 from app.dependencies import get_current_user, get_admin_user, User
 from app.db.supabase import get_supabase_client
 from app.services.ingestion_service import process_document, hash_file_content
+from app.services.corpus_state import bump_corpus_generation
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
@@ -93,6 +94,7 @@ async def upload_document(
         if old_doc.get("content_hash") and old_doc["content_hash"] != content_hash:
             # Content changed - delete old chunks and re-use document record
             supabase.table("chunks").delete().eq("document_id", old_doc["id"]).execute()
+            bump_corpus_generation(f"document {old_doc['id']} replaced")
 
             # Re-use existing storage path and document ID
             document_id = old_doc["id"]
@@ -208,5 +210,6 @@ async def delete_document(
 
     # Delete document record (chunks cascade)
     supabase.table("documents").delete().eq("id", document_id).execute()
+    bump_corpus_generation(f"document {document_id} deleted")
 
     return {"status": "deleted"}
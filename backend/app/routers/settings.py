@@ -1,20 +1,41 @@
 """Global settings router for LLM and embedding configuration."""
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from cryptography.fernet import Fernet, InvalidToken
 
 from app.dependencies import get_current_user, get_admin_user, User
 from app.db.supabase import get_supabase_client
 from app.config import get_settings as get_app_settings
+from app.services.cache import TTLCache
+from app.services.metrics import timed_stage
+
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
+# The single global_settings row, read by every LLM/embedding/rerank call
+settings_row_cache = TTLCache(
+    max_entries=1,
+    ttl_seconds=get_app_settings().global_settings_cache_ttl_seconds,
+    name="global_settings",
+)
+
 
-def get_fernet() -> Fernet | None:
+def get_fernet() -> "Fernet | None":
     """Get Fernet instance if encryption key is configured."""
     key = get_app_settings().settings_encryption_key
     if not key:
         return None
+    return _fernet_for(key)
+
+
+@lru_cache(maxsize=4)
+def _fernet_for(key: str) -> "Fernet":
+    # cryptography is only loaded once a key is configured
+    from cryptography.fernet import Fernet
     return Fernet(key.encode())
 
 
@@ -37,7 +58,7 @@ def decrypt_value(value: str | None) -> str | None:
         return value
     try:
         return f.decrypt(value.encode()).decode()
-    except (InvalidToken, Exception):
+    except Exception:  # InvalidToken
         return value  # Legacy plaintext or corrupted - return as-is
 
 
@@ -86,18 +107,30 @@ def is_masked_value(value: str | None) -> bool:
     return "***" in value
 
 
-def system_has_chunks() -> bool:
-    """Check if any chunks exist in the system."""
-    supabase = get_supabase_client()
-    result = supabase.table("chunks").select("id", count="exact").limit(1).execute()
-    return (result.count or 0) > 0
+def system_has_chunks(refresh: bool = False) -> bool:
+    """Check if any chunks exist in the system (trigger-maintained counter, cached briefly)."""
+    from app.services.corpus_state import get_corpus_state
+
+    return (get_corpus_state(refresh=refresh).get("chunk_count") or 0) > 0
+
 
+def get_global_settings_row(refresh: bool = False) -> dict | None:
+    """
+    Get the single global settings row, cached for GLOBAL_SETTINGS_CACHE_TTL_SECONDS.
+
+    Updates through this API refresh the cache immediately; other replicas
+    pick them up within the TTL.
+    """
+    cached = None if refresh else settings_row_cache.get("row")
+    if cached is not None:
+        return cached[0]
 
-def get_global_settings_row() -> dict | None:
-    """Get the single global settings row."""
     supabase = get_supabase_client()
-    result = supabase.table("global_settings").select("*").limit(1).maybe_single().execute()
-    return result.data if result else None
+    with timed_stage("settings_fetch"):
+        result = supabase.table("global_settings").select("*").limit(1).maybe_single().execute()
+    data = result.data if result else None
+    settings_row_cache.set("row", (data,))
+    return data
 
 
 @router.get("", response_model=GlobalSettingsResponse)
@@ -131,11 +164,12 @@ async def update_settings(
 ):
     """Update global settings. Admin only."""
     supabase = get_supabase_client()
-    has_chunks = system_has_chunks()
+    # Guards embedding changes, so do not trust a cached counter here
+    has_chunks = system_has_chunks(refresh=True)
 
     # If chunks exist, check if embedding fields are being changed
     if has_chunks:
-        current = get_global_settings_row()
+        current = get_global_settings_row(refresh=True)
 
         if current:
             embedding_changed = False
@@ -204,7 +238,7 @@ async def update_settings(
         )
 
     # Get the existing row ID
-    existing = get_global_settings_row()
+    existing = get_global_settings_row(refresh=True)
     if not existing:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -222,6 +256,7 @@ async def update_settings(
         )
 
     saved = result.data[0]
+    settings_row_cache.set("row", (saved,))
     return GlobalSettingsResponse(
         llm_model=saved.get("llm_model"),
         llm_base_url=saved.get("llm_base_url"),
@@ -9,11 +9,13 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from supabase import create_client
 from app.config import get_settings
 from app.services.metadata_service import extract_metadata
+from app.services.scheduler import batch_priority
 
 settings = get_settings()
 supabase = create_client(settings.supabase_url, settings.supabase_service_role_key)
 
 
+@batch_priority
 async def backfill_metadata():
     """Extract metadata for documents missing it."""
 
@@ -0,0 +1,83 @@
+"""Import-time budget check for app.main, measured with `python -X importtime`.
+
+Fails (exit code 1) if importing the app takes longer than the budget or
+loads any module that chat-only processes must not pay for at startup:
+
+    python app/scripts/check_import_time.py --budget-ms 1500 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+
+# Loaded on first use only (document extraction, tracing export, settings encryption)
+LAZY_MODULES = ("pypdf", "docx", "bs4", "html2text", "langsmith", "cryptography.fernet", "openai")
+
+
+def measure(module: str) -> list[tuple[str, int, int]]:
+    """Import module in a fresh interpreter; return (name, self_us, cumulative_us) rows."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=15, help="Show the N slowest top-level imports")
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    imported = {name for name, _, _ in rows}
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+
+    print("=" * 60)
+    print(f"Import time of {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("=" * 60)
+    # Cumulative import time per top-level package
+    top_level = sorted(
+        ((name, cumulative) for name, _, cumulative in rows if "." not in name),
+        key=lambda row: row[1],
+        reverse=True,
+    )
+    for name, cumulative in top_level[:args.top]:
+        print(f"{cumulative / 1000:9.1f} ms  {name}")
+
+    eager = [
+        module for module in LAZY_MODULES
+        if any(name == module or name.startswith(module + ".") for name in imported)
+    ]
+    failed = False
+    if eager:
+        print(f"\n✗ Imported eagerly (should be lazy): {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\n✗ Over budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print("\n✓ Within budget, heavy backends not loaded")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
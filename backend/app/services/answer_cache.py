@@ -0,0 +1,175 @@
+"""Semantic cache of final assistant answers for repeated single-turn questions."""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHEABLE_QUESTION_CHARS = 500
+
+SUPERSCRIPT_DIGITS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")
+# "509⁶" - an article number with its superscript part
+SUPERSCRIPT_NUMBER_PATTERN = re.compile(r"(\d+)([⁰¹²³⁴⁵⁶⁷⁸⁹]+)")
+# "46", "509-6", "46-modda" (the number part)
+NUMBER_PATTERN = re.compile(r"\d+(?:-\d+)*")
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    embedding: Any  # unit-normalized float32 numpy vector
+    numbers: frozenset[str]
+    answer: str
+    model: str
+    generation: int
+    created_at: float
+
+
+def _normalize(vector: list[float]) -> Any:
+    import numpy as np
+
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+def question_numbers(question: str) -> frozenset[str]:
+    """
+    Article, part and other numbers in a question ("509⁶" and "509-6" alike).
+
+    Questions about neighbouring articles ("46-moddasi" vs "47-moddasi")
+    embed almost identically, so a cached answer is only reused when these
+    match exactly.
+    """
+    text = SUPERSCRIPT_NUMBER_PATTERN.sub(
+        lambda m: f"{m.group(1)}-{m.group(2).translate(SUPERSCRIPT_DIGITS)}", question
+    )
+    return frozenset(NUMBER_PATTERN.findall(text))
+
+
+def is_cacheable_conversation(messages: list[dict]) -> bool:
+    """
+    Only single-turn, self-contained questions are eligible.
+
+    Follow-ups depend on earlier turns (e.g. a clarification of which law is
+    meant), so their answers cannot be reused for the same text elsewhere.
+    """
+    if len(messages) != 1 or messages[0].get("role") != "user":
+        return False
+    content = (messages[0].get("content") or "").strip()
+    return 0 < len(content) <= MAX_CACHEABLE_QUESTION_CHARS
+
+
+class SemanticAnswerCache:
+    """
+    Bounded LRU cache of answers matched by embedding cosine similarity.
+
+    Entries are only returned for the same LLM model, corpus generation and
+    question numbers, so a re-uploaded law, a model switch or a question
+    about a different article never serves an old answer.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(
+        self, question: str, embedding: list[float], model: str, generation: int
+    ) -> tuple[CachedAnswer, float] | None:
+        """Return the most similar fresh entry above the threshold, with its score."""
+        import numpy as np
+
+        query = _normalize(embedding)
+        numbers = question_numbers(question)
+        now = time.time()
+
+        with self._lock:
+            candidates = []
+            for entry_id in list(self._entries):
+                entry = self._entries[entry_id]
+                if entry.generation != generation or now - entry.created_at > self.ttl_seconds:
+                    # Stale for good: corpus changed or entry expired
+                    del self._entries[entry_id]
+                    self.evictions += 1
+                    continue
+                if entry.model == model and entry.numbers == numbers:
+                    candidates.append((entry_id, entry))
+
+            best = None
+            if candidates:
+                scores = np.stack([entry.embedding for _, entry in candidates]) @ query
+                index = int(np.argmax(scores))
+                if scores[index] >= self.similarity_threshold:
+                    best = (*candidates[index], float(scores[index]))
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best[0])
+            self.hits += 1
+            return best[1], best[2]
+
+    def store(self, question: str, embedding: list[float], answer: str, model: str, generation: int) -> None:
+        """Add an answer, evicting the least recently used entries if full."""
+        if self.max_entries <= 0 or not answer:
+            return
+        entry = CachedAnswer(
+            question=question,
+            embedding=_normalize(embedding),
+            numbers=question_numbers(question),
+            answer=answer,
+            model=model,
+            generation=generation,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._next_id += 1
+            self._entries[self._next_id] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def purge(self) -> int:
+        """Drop all cached answers. Returns the number of entries removed."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+        logger.info(f"Answer cache purged: {count} entries removed")
+        return count
+
+    def stats(self) -> dict[str, Any]:
+        """Return size and hit-rate counters for monitoring."""
+        total = self.hits + self.misses
+        return {
+            "name": "answers",
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_settings = get_settings()
+answer_cache = SemanticAnswerCache(
+    max_entries=_settings.answer_cache_max_entries,
+    ttl_seconds=_settings.answer_cache_ttl_seconds,
+    similarity_threshold=_settings.answer_cache_similarity_threshold,
+)
@@ -0,0 +1,83 @@
+"""Bounded in-process LRU cache with TTL expiry and hit-rate statistics."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live.
+
+    Entries are evicted least-recently-used first once max_entries is reached,
+    and lazily dropped on access once older than ttl_seconds.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0, name: str = "cache"):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on miss/expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None) -> None:
+        """Store value under key, evicting the least recently used entries if full."""
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not)."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else default
+
+    def clear(self) -> int:
+        """Drop all entries. Returns the number of entries removed."""
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        """Return size and hit-rate counters for monitoring."""
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
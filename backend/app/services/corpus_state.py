@@ -0,0 +1,124 @@
+"""Corpus state (document/chunk counters and generation) used by chat, settings and caches."""
+import itertools
+import logging
+import threading
+import time
+from typing import Any
+
+from app.db.supabase import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+CORPUS_STATE_TTL_SECONDS = 5.0  # How long a fetched corpus_state row is reused
+
+_generation_counter = itertools.count(1)
+_local_generation = 0
+
+_state_lock = threading.Lock()
+_cached_state: dict[str, Any] | None = None
+_cached_at = 0.0
+
+
+def _fetch_state() -> dict[str, Any]:
+    """Read the trigger-maintained corpus_state row, falling back to count probes."""
+    supabase = get_supabase_client()
+    try:
+        result = supabase.table("corpus_state").select("*").limit(1).maybe_single().execute()
+        data = result.data if result else None
+        if data:
+            return data
+    except Exception as e:
+        logger.warning(f"corpus_state unavailable ({e}), falling back to count queries")
+
+    # Fallback for databases without the corpus_state migration
+    completed = supabase.table("documents").select("id", count="exact").eq(
+        "status", "completed"
+    ).limit(1).execute()
+    chunks = supabase.table("chunks").select("id", count="exact").limit(1).execute()
+    return {
+        "completed_documents": completed.count or 0,
+        "chunk_count": chunks.count or 0,
+        "generation": 0,
+    }
+
+
+def get_corpus_state(refresh: bool = False) -> dict[str, Any]:
+    """
+    Return corpus counters, cached in-process for CORPUS_STATE_TTL_SECONDS.
+
+    Keys include completed_documents, chunk_count and generation.
+    Pass refresh=True where a stale answer is not acceptable.
+    """
+    global _cached_state, _cached_at
+    with _state_lock:
+        if not refresh and _cached_state is not None and time.monotonic() - _cached_at < CORPUS_STATE_TTL_SECONDS:
+            return _cached_state
+
+    state = _fetch_state()
+    with _state_lock:
+        _cached_state = state
+        _cached_at = time.monotonic()
+    return state
+
+
+def get_corpus_generation() -> int:
+    """
+    Return the current corpus generation.
+
+    The generation is bumped whenever documents or chunks are added, replaced
+    or deleted, so anything cached under an older generation is never served.
+    It combines the database counter (maintained by triggers, seen by every
+    process within CORPUS_STATE_TTL_SECONDS) with a local counter that takes
+    effect immediately in the process that made the change. Both only grow,
+    so their sum changes whenever either does.
+    """
+    try:
+        db_generation = int(get_corpus_state().get("generation") or 0)
+    except Exception as e:
+        logger.warning(f"Could not read corpus generation: {e}")
+        db_generation = 0
+    return db_generation + _local_generation
+
+
+def bump_corpus_generation(reason: str = "") -> int:
+    """Advance the corpus generation after documents or chunks change."""
+    global _local_generation, _cached_state
+    _local_generation = next(_generation_counter)
+    with _state_lock:
+        # Force the next read to pick up the new counts
+        _cached_state = None
+    logger.debug(f"Corpus generation bumped locally to {_local_generation} ({reason or 'unspecified'})")
+    return _local_generation
+
+
+def fetch_stamp_changes(
+    stamps: dict[str, list], since_generation: int | None
+) -> tuple[list[str], list[str], dict[str, list], int]:
+    """
+    Compare per-document chunk stamps with the database, for index replicas.
+
+    stamps maps document id -> [chunk count, generation of its last chunk
+    change] as of since_generation. Only documents changed after it are
+    fetched (chunk_document_stamps RPC over the trigger-maintained
+    document_chunk_stamps table); with since_generation None, or if the
+    database generation went backwards (e.g. a restore), every document is.
+
+    Returns (changed document ids, removed document ids, updated stamps,
+    database generation the stamps are current to).
+    """
+    supabase = get_supabase_client()
+    data = supabase.rpc("chunk_document_stamps", {"since_generation": since_generation}).execute().data or {}
+    generation = int(data.get("generation") or 0)
+    if since_generation is not None and generation < since_generation:
+        return fetch_stamp_changes(stamps, None)
+
+    remote = data.get("stamps") or {}
+    if since_generation is None:
+        removed = [document_id for document_id in stamps if document_id not in remote]
+        merged = remote
+    else:
+        # Documents whose chunks were all deleted come back with chunk count 0
+        removed = [document_id for document_id, stamp in remote.items() if not stamp[0] and document_id in stamps]
+        merged = {**stamps, **remote}
+    changed = [document_id for document_id, stamp in remote.items() if stamp[0] and stamps.get(document_id) != stamp]
+    return changed, removed, {document_id: stamp for document_id, stamp in merged.items() if stamp[0]}, generation
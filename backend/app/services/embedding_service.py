@@ -3,9 +3,14 @@ from typing import Any
 
 from fastapi import HTTPException, status
 
-from app.db.supabase import get_supabase_client
-from app.services.langsmith import get_traced_async_openai_client
-from app.routers.settings import decrypt_value
+from app.services.http_clients import get_async_openai_client
+from app.services.langsmith import trace_run
+from app.services.metrics import provider_label, timed_stage
+from app.services.scheduler import Priority, current_priority, embedding_scheduler
+from app.services.singleflight import SingleFlight
+from app.routers.settings import decrypt_value, get_global_settings_row
+
+embedding_flight = SingleFlight(name="embeddings")
 
 
 def get_global_embedding_settings() -> dict[str, Any]:
@@ -18,18 +23,13 @@ def get_global_embedding_settings() -> dict[str, Any]:
     """
     from app.config import get_settings
 
-    supabase = get_supabase_client()
     api_key = None
     model = None
     base_url = None
     dimensions = None
 
     try:
-        result = supabase.table("global_settings").select(
-            "embedding_model, embedding_base_url, embedding_api_key, embedding_dimensions"
-        ).limit(1).maybe_single().execute()
-
-        data = result.data if result else None
+        data = get_global_settings_row()
         if data:
             api_key = decrypt_value(data.get("embedding_api_key"))
             model = data.get("embedding_model")
@@ -62,19 +62,38 @@ def get_global_embedding_settings() -> dict[str, Any]:
 
 
 async def get_embeddings(texts: list[str], user_id: str | None = None) -> list[list[float]]:
-    """Generate embeddings for a list of texts using global settings."""
+    """
+    Generate embeddings for a list of texts using global settings.
+
+    Concurrent calls with identical inputs share a single provider request,
+    admitted by the embedding scheduler at the caller's priority.
+    """
     emb_settings = get_global_embedding_settings()
     model = emb_settings["model"]
     dimensions = emb_settings["dimensions"]
 
-    client = get_traced_async_openai_client(
-        base_url=emb_settings["base_url"],
-        api_key=emb_settings["api_key"],
-    )
-
-    response = await client.embeddings.create(
-        model=model,
-        input=texts,
-        dimensions=dimensions,
-    )
-    return [item.embedding for item in response.data]
+    async def create_embeddings() -> list[list[float]]:
+        client = get_async_openai_client(
+            base_url=emb_settings["base_url"],
+            api_key=emb_settings["api_key"],
+        )
+
+        provider = provider_label(emb_settings["base_url"])
+        operation = "ingestion" if current_priority() == Priority.BATCH else "embeddings"
+        async with embedding_scheduler.slot():
+            async with trace_run(
+                "Embeddings", operation, run_type="embedding",
+                inputs={"input": texts}, model=model, provider=provider,
+            ) as outputs:
+                with timed_stage("embedding", model=model, provider=provider):
+                    response = await client.embeddings.create(
+                        model=model,
+                        input=texts,
+                        dimensions=dimensions,
+                    )
+                outputs["embeddings"] = len(response.data)
+        return [item.embedding for item in response.data]
+
+    key = (emb_settings["base_url"], model, dimensions, tuple(texts))
+    embeddings = await embedding_flight.do(key, create_embeddings)
+    return [list(embedding) for embedding in embeddings]
@@ -1,10 +1,9 @@
 """Multi-format text extraction service for document ingestion."""
 import io
 import logging
-from pypdf import PdfReader
-from docx import Document
-from bs4 import BeautifulSoup
-import html2text
+
+# Parsing backends (pypdf, python-docx, bs4, html2text) are imported inside
+# their extractors so chat-only processes never load them.
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +44,21 @@ def normalize_text(text: str) -> str:
     return normalized
 
 
+def strip_search_annotations(text: str) -> str:
+    """
+    Reverse normalize_text() for display.
+
+    Removes the searchable "(497-26)" annotations added after superscript
+    article numbers, restoring the original "497²⁶" notation.
+    """
+    if not text:
+        return text
+
+    import re
+
+    return re.sub(r'(\d+)([⁰¹²³⁴⁵⁶⁷⁸⁹]+) \(\1-\d+\)', r'\1\2', text)
+
+
 def extract_text_from_pdf(file_bytes: bytes) -> str:
     """
     Extract text from PDF using pypdf.
@@ -58,6 +72,8 @@ def extract_text_from_pdf(file_bytes: bytes) -> str:
     Raises:
         ValueError: If PDF extraction fails or no text found
     """
+    from pypdf import PdfReader
+
     try:
         pdf_reader = PdfReader(io.BytesIO(file_bytes))
 
@@ -104,6 +120,8 @@ def extract_text_from_docx(file_bytes: bytes) -> str:
     Raises:
         ValueError: If DOCX extraction fails or no text found
     """
+    from docx import Document
+
     try:
         doc = Document(io.BytesIO(file_bytes))
 
@@ -153,6 +171,9 @@ def extract_text_from_html(file_bytes: bytes) -> str:
     Raises:
         ValueError: If HTML extraction fails or no text found
     """
+    import html2text
+    from bs4 import BeautifulSoup
+
     try:
         # Decode HTML with error handling
         try:
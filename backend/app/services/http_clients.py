@@ -0,0 +1,52 @@
+"""Process-wide HTTP connection pools, created lazily and closed on shutdown."""
+from typing import TYPE_CHECKING
+
+import httpx
+
+from app.config import get_settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_http_client: httpx.AsyncClient | None = None
+# (base_url, api_key) -> client, so TLS connections to a provider are reused
+_openai_clients: dict[tuple[str | None, str], "AsyncOpenAI"] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client for plain HTTP APIs (reranker, JWKS). Pass timeouts per request."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    return _http_client
+
+
+def get_async_openai_client(base_url: str | None = None, api_key: str | None = None) -> "AsyncOpenAI":
+    """
+    Get a shared AsyncOpenAI client for a provider.
+
+    Calls are traced with langsmith.start_run()/trace_run() rather than by
+    wrapping the client, so sampling and export stay off the request path.
+
+    Args:
+        base_url: Optional base URL for the API (e.g., OpenRouter, Ollama)
+        api_key: Optional API key (falls back to openai_api_key)
+    """
+    effective_key = api_key or get_settings().openai_api_key
+    key = (base_url or None, effective_key)
+    client = _openai_clients.get(key)
+    if client is None:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=effective_key, base_url=base_url or None)
+        _openai_clients[key] = client
+    return client
+
+
+async def close_http_clients() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    for client in _openai_clients.values():
+        await client.close()
+    _openai_clients.clear()
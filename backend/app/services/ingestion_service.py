@@ -2,10 +2,13 @@
 import hashlib
 import logging
 from app.db.supabase import get_supabase_client
+from app.services.corpus_state import bump_corpus_generation
 from app.services.chunking_service import chunk_text
 from app.services.embedding_service import get_embeddings
 from app.services.metadata_service import extract_metadata
 from app.services.extraction_service import extract_text
+from app.services.metrics import timed_stage
+from app.services.scheduler import batch_priority
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +20,13 @@ def hash_file_content(file_bytes: bytes) -> str:
     return hashlib.sha256(file_bytes).hexdigest()
 
 
+@batch_priority
 async def process_document(document_id: str, user_id: str) -> None:
     """
     Process an uploaded document: extract text, chunk, embed, and store.
 
-    Updates document status throughout the process.
+    Updates document status throughout the process. Provider calls run at
+    batch priority so uploads never delay chat requests.
     """
     supabase = get_supabase_client()
 
@@ -40,17 +45,20 @@ async def process_document(document_id: str, user_id: str) -> None:
 
         # Download file from storage
         storage_path = doc["storage_path"]
-        file_bytes = supabase.storage.from_("documents").download(storage_path)
+        with timed_stage("ingest_download"):
+            file_bytes = supabase.storage.from_("documents").download(storage_path)
 
         # Extract text based on file type
-        text = extract_text(file_bytes, doc["file_type"])
+        with timed_stage("ingest_extract"):
+            text = extract_text(file_bytes, doc["file_type"])
 
         if not text.strip():
             raise ValueError("No text content extracted from document")
 
         # Extract metadata from document content
         logger.debug(f"Extracting metadata for document {document_id}")
-        document_metadata = await extract_metadata(text, doc["filename"])
+        with timed_stage("ingest_metadata"):
+            document_metadata = await extract_metadata(text, doc["filename"])
 
         # Store metadata in documents table
         supabase.table("documents").update({
@@ -58,7 +66,8 @@ async def process_document(document_id: str, user_id: str) -> None:
         }).eq("id", document_id).execute()
 
         # Chunk the text
-        chunks = chunk_text(text)
+        with timed_stage("ingest_chunk"):
+            chunks = chunk_text(text)
 
         if not chunks:
             raise ValueError("No chunks generated from document")
@@ -67,7 +76,8 @@ async def process_document(document_id: str, user_id: str) -> None:
         total_chunks = 0
         for i in range(0, len(chunks), BATCH_SIZE):
             batch = chunks[i:i + BATCH_SIZE]
-            embeddings = await get_embeddings(batch, user_id=user_id)
+            with timed_stage("ingest_embed"):
+                embeddings = await get_embeddings(batch, user_id=user_id)
 
             # Insert chunks with embeddings (inherit metadata from document)
             chunk_records = []
@@ -86,7 +96,8 @@ async def process_document(document_id: str, user_id: str) -> None:
                     "metadata": chunk_metadata,
                 })
 
-            supabase.table("chunks").insert(chunk_records).execute()
+            with timed_stage("ingest_store"):
+                supabase.table("chunks").insert(chunk_records).execute()
             total_chunks += len(batch)
 
         # Update document status to completed
@@ -95,6 +106,7 @@ async def process_document(document_id: str, user_id: str) -> None:
             "chunk_count": total_chunks,
         }).eq("id", document_id).execute()
 
+        bump_corpus_generation(f"document {document_id} processed")
         logger.info(f"Document {document_id} processed: {total_chunks} chunks created")
 
     except Exception as e:
@@ -103,3 +115,5 @@ async def process_document(document_id: str, user_id: str) -> None:
             "status": "failed",
             "error_message": str(e),
         }).eq("id", document_id).execute()
+        # Some chunk batches may already have been stored
+        bump_corpus_generation(f"document {document_id} failed")
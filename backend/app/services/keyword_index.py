@@ -0,0 +1,462 @@
+"""
+In-process BM25 index for the keyword leg of hybrid search.
+
+The SQL keyword leg ranks with ts_rank over the 'russian' text search
+configuration, which splits Uzbek words at apostrophes (oʻz, maʼmuriy) and
+does not connect "509⁶" with "509-6". This index tokenizes with the same
+normalization as ingestion and query handling instead:
+
+- chunk content is stored after extraction_service.normalize_text(), which
+  annotates "509⁶" as "509⁶ (509-6)"; queries go through normalize_text()
+  too, so both sides carry the same article tokens
+- retrieval_service.normalize_query() then folds apostrophe variants and
+  superscripts; apostrophes inside words are dropped ("o'z" -> "oz")
+- hyphenated numbers are indexed whole and by part ("509-6", "509", "6")
+- common Uzbek case/plural suffixes are stripped ("moddalarda" -> "modda")
+
+Postings are typed arrays (chunk row ids as int32, term frequencies as
+uint16) appended to as documents arrive, so updates are incremental; rows
+of changed or deleted documents are masked and dropped at the next
+compaction. Sync follows the corpus generation like vector_index, fetching
+the document stamps changed since the last sync the same way, and snapshots are written under
+keyword_index_path so restarts only fetch what changed. As there, workers
+write under the snapshot lock and load a snapshot another worker has just
+published instead of writing their own.
+
+search() returns None while the index is not loaded or lags the corpus
+generation; retrieval_service then uses the SQL keyword leg.
+"""
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime, timezone
+from math import log
+from pathlib import Path
+from typing import Any, Iterable
+
+from app.config import get_settings
+from app.db.supabase import get_supabase_client
+from app.services.corpus_state import fetch_stamp_changes, get_corpus_generation
+from app.services.metrics import keyword_index_lookups
+from app.services.snapshots import current_snapshot, new_snapshot_directory, publish_snapshot, snapshot_lock
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+FETCH_DOCUMENTS_PER_REQUEST = 20
+FETCH_PAGE_SIZE = 1000
+MAX_TERM_FREQUENCY = 65535
+
+TOKEN_PATTERN = re.compile(r"\d+(?:-\d+)+|\d+|[^\W\d_]+")
+# Longest first; a suffix is only stripped when at least MIN_STEM_LENGTH characters remain
+UZBEK_SUFFIXES = sorted(
+    ("larning", "lardan", "larda", "larga", "larni", "lari", "lar",
+     "ning", "dagi", "dan", "da", "ga", "ka", "qa", "ni", "si"),
+    key=len, reverse=True,
+)
+MIN_STEM_LENGTH = 4  # Keeps short stems like "modda" intact
+
+
+def stem(word: str) -> str:
+    """Strip one common Uzbek case or plural suffix."""
+    for suffix in UZBEK_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Index terms of normalize_text()-ed content (chunks are stored that way).
+
+    Use tokenize_query() for user queries.
+    """
+    from app.services.retrieval_service import normalize_query
+
+    text = normalize_query(text).lower().replace("'", "")
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        if token[0].isdigit():
+            tokens.append(token)
+            if "-" in token:
+                tokens.extend(token.split("-"))
+        else:
+            tokens.append(stem(token))
+    return tokens
+
+
+def tokenize_query(query: str) -> list[str]:
+    """Index terms of a raw query: normalize_text() first, as ingestion does."""
+    from app.services.extraction_service import normalize_text
+
+    return tokenize(normalize_text(query))
+
+
+class KeywordIndex:
+    """Process-wide BM25 index (see module docstring)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._sync_thread: threading.Thread | None = None
+        self._generation: int | None = None
+        self.loaded = False
+        self._reset()
+        self.last_sync_at: str | None = None
+        self.last_sync_ms: float | None = None
+        self.last_error: str | None = None
+        self.snapshots_written = 0
+
+    def _reset(self) -> None:
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._lengths = array("I")
+        self._alive = bytearray()
+        self._ids: list[bytes] = []
+        self._documents: list[bytes] = []
+        self._document_rows: dict[bytes, list[int]] = {}
+        self._total_length = 0
+        self._hidden = 0
+        self._stamps: dict[str, list] = {}
+        self._stamps_generation: int | None = None
+        self._changes_since_snapshot = 0
+        self._snapshot: str | None = None
+
+    @property
+    def path(self) -> Path:
+        return BACKEND_DIR / get_settings().keyword_index_path
+
+    @property
+    def hidden_rows(self) -> int:
+        return self._hidden
+
+    def start(self) -> None:
+        """Load the snapshot and sync in the background (idempotent)."""
+        self.request_sync()
+
+    def request_sync(self) -> None:
+        """Start a background sync unless one is already running."""
+        with self._sync_lock:
+            if self._sync_thread and self._sync_thread.is_alive():
+                return
+            self._sync_thread = threading.Thread(target=self._sync_safely, name="keyword-index-sync", daemon=True)
+            self._sync_thread.start()
+
+    def add(self, chunk_ids: Iterable[str], document_ids: Iterable[str], contents: Iterable[str]) -> int:
+        """Index chunks (appending to the postings); returns rows added."""
+        added = 0
+        for chunk_id, document_id, content in zip(chunk_ids, document_ids, contents):
+            frequencies: dict[str, int] = {}
+            for token in tokenize(content or ""):
+                frequencies[token] = frequencies.get(token, 0) + 1
+            length = sum(frequencies.values())
+            document = uuid.UUID(document_id).bytes
+            with self._lock:
+                row = len(self._lengths)
+                for term, frequency in frequencies.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("i"), array("H"))
+                    postings[0].append(row)
+                    postings[1].append(min(frequency, MAX_TERM_FREQUENCY))
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._ids.append(uuid.UUID(chunk_id).bytes)
+                self._documents.append(document)
+                self._document_rows.setdefault(document, []).append(row)
+                self._total_length += length
+            added += 1
+        self._changes_since_snapshot += added
+        return added
+
+    def remove_documents(self, document_ids: Iterable[str]) -> int:
+        """Mask all rows of the given documents; returns rows hidden."""
+        hidden = 0
+        with self._lock:
+            for document_id in document_ids:
+                for row in self._document_rows.pop(uuid.UUID(document_id).bytes, []):
+                    if self._alive[row]:
+                        self._alive[row] = 0
+                        self._total_length -= self._lengths[row]
+                        hidden += 1
+            self._hidden += hidden
+        self._changes_since_snapshot += hidden
+        return hidden
+
+    def search(self, query: str, match_count: int) -> list[tuple[str, float]] | None:
+        """
+        Best BM25 matches as (chunk id, score), best first.
+
+        Returns None if the index is not loaded or behind the current corpus
+        generation (a sync is requested); callers fall back to the database.
+        """
+        if not self.loaded:
+            keyword_index_lookups.inc(outcome="not_loaded")
+            self.request_sync()
+            return None
+        if self._generation != get_corpus_generation():
+            keyword_index_lookups.inc(outcome="stale")
+            self.request_sync()
+            return None
+        keyword_index_lookups.inc(outcome="hit")
+        return self.score(query, match_count)
+
+    def score(self, query: str, match_count: int) -> list[tuple[str, float]]:
+        """
+        BM25 ranking without the freshness check (benchmarks score directly).
+
+        Document frequencies and the row count include masked rows until
+        the next compaction, which shifts idf slightly after large deletions.
+        """
+        import numpy as np
+
+        settings = get_settings()
+        k1, b = settings.keyword_index_k1, settings.keyword_index_b
+        terms = list(dict.fromkeys(tokenize_query(query)))
+
+        with self._lock:
+            live_rows = len(self._alive) - self.hidden_rows
+            if not terms or not live_rows:
+                return []
+            rows_total = len(self._lengths)
+            average_length = max(self._total_length / live_rows, 1.0)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            scores = np.zeros(rows_total, dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                rows = np.frombuffer(postings[0], dtype=np.int32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                idf = log(1 + (rows_total - len(rows) + 0.5) / (len(rows) + 0.5))
+                norms = k1 * (1 - b + b * lengths[rows] / average_length)
+                scores[rows] += idf * frequencies * (k1 + 1) / (frequencies + norms)
+            rows = None  # Release the view: add() cannot grow an array with exported buffers
+            scores *= np.frombuffer(self._alive, dtype=np.uint8)
+
+            matched = np.flatnonzero(scores > 0)
+            if len(matched) > match_count:
+                matched = matched[np.argpartition(-scores[matched], match_count - 1)[:match_count]]
+            matched = matched[np.argsort(-scores[matched])]
+            return [(str(uuid.UUID(bytes=self._ids[row])), float(scores[row])) for row in matched]
+
+    def compact(self) -> None:
+        """Drop masked rows from the postings and renumber the remaining ones."""
+        import numpy as np
+
+        with self._lock:
+            if not self._hidden:
+                return
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            new_rows = np.cumsum(alive, dtype=np.int64) - 1
+            postings = {}
+            for term, (rows, frequencies) in self._postings.items():
+                rows = np.frombuffer(rows, dtype=np.int32)
+                keep = alive[rows]
+                if keep.any():
+                    postings[term] = (
+                        array("i", new_rows[rows[keep]].astype(np.int32).tobytes()),
+                        array("H", np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes()),
+                    )
+            kept = np.flatnonzero(alive)
+            self._postings = postings
+            self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[kept].tobytes())
+            self._ids = [self._ids[row] for row in kept]
+            self._documents = [self._documents[row] for row in kept]
+            self._alive = bytearray(b"\x01" * len(kept))
+            self._hidden = 0
+            self._document_rows = {}
+            for row, document in enumerate(self._documents):
+                self._document_rows.setdefault(document, []).append(row)
+
+    def stats(self) -> dict[str, Any]:
+        # Under the lock: the sync thread may be adding terms to the postings
+        with self._lock:
+            rows = len(self._alive) - self.hidden_rows
+            hidden_rows = self.hidden_rows
+            terms = len(self._postings)
+            postings_bytes = sum(
+                term_rows.itemsize * len(term_rows) + frequencies.itemsize * len(frequencies)
+                for term_rows, frequencies in self._postings.values()
+            )
+        return {
+            "name": "keyword_index",
+            "loaded": self.loaded,
+            "generation": self._generation,
+            "rows": rows,
+            "hidden_rows": hidden_rows,
+            "terms": terms,
+            "postings_bytes": postings_bytes,
+            "snapshot": self._snapshot,
+            "snapshots_written": self.snapshots_written,
+            "last_sync_at": self.last_sync_at,
+            "last_sync_ms": self.last_sync_ms,
+            "last_error": self.last_error,
+        }
+
+    def _sync_safely(self) -> None:
+        try:
+            self.sync()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Keyword index sync failed: {e}")
+
+    def sync(self) -> None:
+        """Bring the index up to the current corpus generation (blocking)."""
+        started = time.perf_counter()
+        # Read first: changes made while syncing move it again and trigger another sync
+        generation = get_corpus_generation()
+        if not self.loaded or self._published_elsewhere():
+            self._load_snapshot()
+
+        changed, removed = self._apply_stamps()
+
+        if self._needs_snapshot(changed, removed):
+            with snapshot_lock(self.path):
+                # Another worker may have written one while we fetched: use it
+                if self._published_elsewhere() and self._load_snapshot():
+                    changed, removed = self._apply_stamps()
+                if self._needs_snapshot(changed, removed):
+                    self._write_snapshot()
+
+        self.loaded = True
+        self._generation = generation
+        self.last_sync_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.last_sync_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            "Keyword index synced to generation %s: %d rows, %d terms (%d changed, %d removed documents) in %.0f ms",
+            generation, len(self._alive) - self.hidden_rows, len(self._postings),
+            len(changed), len(removed), self.last_sync_ms,
+        )
+
+    def _published_elsewhere(self) -> bool:
+        """Whether CURRENT names a snapshot other than the one the index is built on."""
+        published = current_snapshot(self.path)
+        return published is not None and published != self._snapshot
+
+    def _needs_snapshot(self, changed: list[str], removed: list[str]) -> bool:
+        if not changed and not removed:
+            return False
+        # Also snapshot the first load, so a restart only fetches what changed since
+        return (
+            self._snapshot is None
+            or self._changes_since_snapshot >= get_settings().keyword_index_compact_rows
+        )
+
+    def _apply_stamps(self) -> tuple[list[str], list[str]]:
+        """Drop rows of documents changed since the last sync and index the changed ones."""
+        changed, removed, stamps, stamps_generation = fetch_stamp_changes(self._stamps, self._stamps_generation)
+        if changed or removed:
+            self.remove_documents(changed + removed)
+            for chunk_ids, document_ids, contents in self._fetch_chunks(changed):
+                self.add(chunk_ids, document_ids, contents)
+            if self.hidden_rows >= get_settings().keyword_index_compact_rows:
+                self.compact()
+        # Only once applied: a failed fetch is retried from the old generation
+        self._stamps = stamps
+        self._stamps_generation = stamps_generation
+        return changed, removed
+
+    def _fetch_chunks(self, document_ids: list[str]):
+        """Yield (chunk ids, document ids, contents) pages for the given documents."""
+        supabase = get_supabase_client()
+        for start in range(0, len(document_ids), FETCH_DOCUMENTS_PER_REQUEST):
+            batch = document_ids[start:start + FETCH_DOCUMENTS_PER_REQUEST]
+            offset = 0
+            while True:
+                rows = supabase.table("chunks").select("id, document_id, content").in_(
+                    "document_id", batch
+                ).order("id").range(offset, offset + FETCH_PAGE_SIZE - 1).execute().data or []
+                yield [row["id"] for row in rows], [row["document_id"] for row in rows], [row["content"] for row in rows]
+                if len(rows) < FETCH_PAGE_SIZE:
+                    break
+                offset += FETCH_PAGE_SIZE
+
+    def _load_snapshot(self) -> bool:
+        """Load the snapshot CURRENT points to, if there is one."""
+        import numpy as np
+
+        name = current_snapshot(self.path)
+        if name is None:
+            return False
+        directory = self.path / name
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+            stamps_generation = meta["stamps_generation"]
+            offsets = np.load(directory / "offsets.npy")
+            rows = np.load(directory / "rows.npy")
+            frequencies = np.load(directory / "frequencies.npy")
+            lengths = np.load(directory / "lengths.npy")
+            ids = np.load(directory / "ids.npy")
+            documents = np.load(directory / "documents.npy")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load keyword index snapshot {directory.name}: {e}")
+            return False
+
+        with self._lock:
+            self._reset()
+            self._postings = {
+                term: (
+                    array("i", rows[offsets[i]:offsets[i + 1]].tobytes()),
+                    array("H", frequencies[offsets[i]:offsets[i + 1]].tobytes()),
+                )
+                for i, term in enumerate(meta["terms"])
+            }
+            self._lengths = array("I", lengths.tobytes())
+            self._alive = bytearray(b"\x01" * len(lengths))
+            self._ids = [bytes(value) for value in ids]
+            self._documents = [bytes(value) for value in documents]
+            for row, document in enumerate(self._documents):
+                self._document_rows.setdefault(document, []).append(row)
+            self._total_length = int(lengths.sum())
+            self._stamps = meta["stamps"]
+            self._stamps_generation = stamps_generation
+            self._snapshot = directory.name
+        logger.info("Loaded keyword index snapshot %s (%d rows)", directory.name, len(lengths))
+        return True
+
+    def _write_snapshot(self) -> None:
+        """
+        Compact, write the postings as flat arrays and point CURRENT at them.
+        Call with snapshot_lock() held.
+        """
+        import numpy as np
+
+        self.compact()
+        with self._lock:
+            terms = list(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(self._postings[term][0]) for term in terms])
+            rows = np.frombuffer(b"".join(self._postings[term][0].tobytes() for term in terms), dtype=np.int32)
+            frequencies = np.frombuffer(
+                b"".join(self._postings[term][1].tobytes() for term in terms), dtype=np.uint16
+            )
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).copy()
+            ids = np.array(self._ids, dtype="S16")
+            documents = np.array(self._documents, dtype="S16")
+            stamps = dict(self._stamps)
+            stamps_generation = self._stamps_generation
+
+        directory = new_snapshot_directory(self.path)
+        np.save(directory / "offsets.npy", offsets)
+        np.save(directory / "rows.npy", rows)
+        np.save(directory / "frequencies.npy", frequencies)
+        np.save(directory / "lengths.npy", lengths)
+        np.save(directory / "ids.npy", ids)
+        np.save(directory / "documents.npy", documents)
+        (directory / "meta.json").write_text(json.dumps(
+            {"terms": terms, "stamps": stamps, "stamps_generation": stamps_generation}, ensure_ascii=False
+        ))
+
+        publish_snapshot(self.path, directory)
+        self._snapshot = directory.name
+        self._changes_since_snapshot = 0
+        self.snapshots_written += 1
+        logger.info("Wrote keyword index snapshot %s (%d rows, %d terms)", directory.name, len(lengths), len(terms))
+
+
+keyword_index = KeywordIndex()
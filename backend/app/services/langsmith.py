@@ -1,86 +1,221 @@
-"""LangSmith tracing configuration for OpenAI API calls."""
-import os
+"""LangSmith tracing: sampled runs exported in background batches, off the request path."""
+import asyncio
 import logging
+import random
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
 
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Set LangSmith environment variables BEFORE importing langsmith
-if settings.langsmith_api_key:
-    os.environ["LANGSMITH_TRACING"] = "true"
-    os.environ["LANGSMITH_API_KEY"] = settings.langsmith_api_key
-    os.environ["LANGSMITH_PROJECT"] = settings.langsmith_project
-    os.environ["LANGSMITH_ENDPOINT"] = "https://eu.api.smith.langchain.com"
-else:
-    logger.warning("LangSmith API key not configured - tracing disabled")
-
-# Import langsmith AFTER setting env vars
-import langsmith
-from langsmith.wrappers import wrap_openai
-from openai import OpenAI, AsyncOpenAI
-
-# Log LangSmith configuration for debugging
-if settings.langsmith_api_key:
-    api_key_preview = settings.langsmith_api_key[:8] + "..." if len(settings.langsmith_api_key) > 8 else "***"
-    logger.info(f"LangSmith enabled: project={settings.langsmith_project}")
-    logger.debug(f"LangSmith SDK version: {langsmith.__version__}")
-    logger.debug(f"LangSmith API key: {api_key_preview}")
-
-    # Test LangSmith connectivity on startup
-    try:
-        from langsmith import Client
-        ls_client = Client()
-        logger.debug("LangSmith client initialized")
-
-        # Test trace
-        with langsmith.trace("startup_test", project_name=settings.langsmith_project) as run:
-            run.end(outputs={"status": "LangSmith connection verified"})
-        logger.debug("LangSmith test trace sent")
-    except Exception as e:
-        logger.error(f"LangSmith startup test failed: {e}")
-        logger.error("Traces may not appear in dashboard")
+SHUTDOWN_FLUSH_TIMEOUT_SECONDS = 5.0
 
 
-def get_traced_openai_client(base_url: str | None = None, api_key: str | None = None) -> OpenAI:
+class TraceExporter:
     """
-    Get an OpenAI client wrapped with LangSmith tracing.
+    Bounded queue of finished runs, sent to LangSmith in batches by a background task.
 
-    Args:
-        base_url: Optional base URL for the API (e.g., OpenRouter, Ollama)
-        api_key: Optional API key (falls back to openai_api_key)
+    submit() never blocks: when the queue is full the run is dropped and
+    counted, so a slow or unreachable LangSmith endpoint cannot add latency
+    to requests or grow memory without bound. Runs are truncated (see
+    truncate_payload()) before they get here, so the bound on runs is also
+    a bound on bytes.
     """
-    effective_key = api_key or settings.openai_api_key
-    client = OpenAI(api_key=effective_key, base_url=base_url or None)
-
-    if settings.langsmith_api_key:
-        wrapped = wrap_openai(client)
-        logger.debug(f"OpenAI client wrapped with LangSmith (base_url={base_url})")
-        return wrapped
-
-    return client
 
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._client = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.langsmith_api_key)
+
+    def submit(self, run: dict[str, Any]) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if not self._worker or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait(run)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def stop(self, timeout: float = SHUTDOWN_FLUSH_TIMEOUT_SECONDS) -> None:
+        """Send what is queued (best effort), then stop the worker."""
+        if not self._queue or not self._worker:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unsent LangSmith run(s) at shutdown")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def get_client(self):
+        if self._client is None:
+            from langsmith import Client
+            self._client = Client(api_key=settings.langsmith_api_key, api_url=settings.langsmith_endpoint)
+        return self._client
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self.get_client().batch_ingest_runs, create=batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"LangSmith export of {len(batch)} run(s) failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+exporter = TraceExporter(
+    max_queue=settings.langsmith_queue_max_runs,
+    batch_size=settings.langsmith_batch_size,
+    flush_interval=settings.langsmith_flush_interval_seconds,
+)
+
+SAMPLE_RATES = {
+    "chat": settings.langsmith_sample_rate_chat,
+    "embeddings": settings.langsmith_sample_rate_embeddings,
+    "ingestion": settings.langsmith_sample_rate_ingestion,
+}
+
+
+def truncate_payload(value: Any) -> Any:
+    """
+    Copy of a run input/output with long strings and lists cut short.
 
-def get_traced_async_openai_client(base_url: str | None = None, api_key: str | None = None) -> AsyncOpenAI:
+    Strings keep their first LANGSMITH_MAX_FIELD_CHARS characters and lists
+    their first LANGSMITH_MAX_LIST_ITEMS items, each followed by a marker
+    saying how much was left out.
     """
-    Get an AsyncOpenAI client wrapped with LangSmith tracing.
+    if isinstance(value, str):
+        limit = settings.langsmith_max_field_chars
+        if len(value) > limit:
+            return f"{value[:limit]}... [{len(value) - limit} more chars]"
+        return value
+    if isinstance(value, dict):
+        return {key: truncate_payload(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        limit = settings.langsmith_max_list_items
+        items = [truncate_payload(item) for item in value[:limit]]
+        if len(value) > limit:
+            items.append(f"... [{len(value) - limit} more items]")
+        return items
+    return value
+
+
+class TraceRun:
+    """
+    One root run. Unsampled runs are inert, so callers never branch on sampling.
 
-    Args:
-        base_url: Optional base URL for the API (e.g., OpenRouter, Ollama)
-        api_key: Optional API key (falls back to openai_api_key)
+    Call end() exactly once; the run is queued for export only then.
     """
-    effective_key = api_key or settings.openai_api_key
-    client = AsyncOpenAI(api_key=effective_key, base_url=base_url or None)
 
-    if settings.langsmith_api_key:
-        try:
-            wrapped = wrap_openai(client)
-            logger.debug(f"AsyncOpenAI wrapped with LangSmith (base_url={base_url or 'default'}, project={settings.langsmith_project})")
-            return wrapped
-        except Exception as e:
-            logger.error(f"Failed to wrap AsyncOpenAI client: {e}")
-            return client
-    else:
-        logger.warning("LangSmith tracing disabled (no API key)")
-        return client
+    def __init__(self, name: str, run_type: str, inputs: dict[str, Any], metadata: dict[str, Any], sampled: bool):
+        self.sampled = sampled
+        if not sampled:
+            return
+        run_id = uuid.uuid4()
+        start_time = datetime.now(timezone.utc)
+        self.run = {
+            "id": run_id,
+            "trace_id": run_id,
+            "dotted_order": f"{start_time.strftime('%Y%m%dT%H%M%S%fZ')}{run_id}",
+            "name": name,
+            "run_type": run_type,
+            "inputs": truncate_payload(inputs),
+            "start_time": start_time,
+            "session_name": settings.langsmith_project,
+            "extra": {"metadata": metadata},
+        }
+
+    def end(self, outputs: dict[str, Any] | None = None, error: str | None = None) -> None:
+        if not self.sampled:
+            return
+        self.run.update(
+            outputs=truncate_payload(outputs or {}),
+            error=truncate_payload(error),
+            end_time=datetime.now(timezone.utc),
+        )
+        exporter.submit(self.run)
+
+
+def start_run(
+    name: str,
+    operation: str,
+    run_type: str = "chain",
+    inputs: dict[str, Any] | None = None,
+    **metadata: Any,
+) -> TraceRun:
+    """Start a run, sampled at the rate configured for operation (chat, embeddings, ingestion)."""
+    sampled = exporter.enabled and random.random() < SAMPLE_RATES.get(operation, 1.0)
+    return TraceRun(name, run_type, inputs or {}, {"operation": operation, **metadata}, sampled)
+
+
+@asynccontextmanager
+async def trace_run(
+    name: str,
+    operation: str,
+    run_type: str = "chain",
+    inputs: dict[str, Any] | None = None,
+    **metadata: Any,
+) -> AsyncIterator[dict[str, Any]]:
+    """Trace a block; put results in the yielded dict to record them as outputs."""
+    run = start_run(name, operation, run_type, inputs, **metadata)
+    outputs: dict[str, Any] = {}
+    try:
+        yield outputs
+    except Exception as e:
+        run.end(outputs, error=str(e))
+        raise
+    run.end(outputs)
+
+
+async def check_connection() -> None:
+    """Optional startup connectivity check, run in the background."""
+    if not exporter.enabled:
+        logger.info("LangSmith API key not configured - tracing disabled")
+        return
+    try:
+        info = await asyncio.to_thread(lambda: exporter.get_client().info)
+        logger.info(f"LangSmith reachable (version {getattr(info, 'version', 'unknown')}), project={settings.langsmith_project}")
+    except Exception as e:
+        logger.error(f"LangSmith connectivity check failed: {e}")
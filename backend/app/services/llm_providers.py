@@ -0,0 +1,298 @@
+"""Ordered LLM providers with circuit breakers and hedged stream start."""
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable
+from urllib.parse import urlparse
+
+from app.config import get_settings
+from app.services.scheduler import Priority, UpstreamScheduler
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LLMProvider:
+    """One OpenAI-compatible chat completions endpoint."""
+    base_url: str | None
+    api_key: str
+    model: str
+
+    @property
+    def name(self) -> str:
+        host = urlparse(self.base_url).hostname if self.base_url else "api.openai.com"
+        return f"{host}/{self.model}"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one provider.
+
+    After failure_threshold consecutive failures the breaker opens and the
+    provider is skipped for reset_seconds. Then a single trial request is let
+    through (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. Claims the trial slot when half-open."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+
+    def release(self) -> None:
+        """Forget an attempt that was abandoned without an outcome (e.g. a losing hedge)."""
+        self._trial_in_flight = False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+_breakers: dict[LLMProvider, CircuitBreaker] = {}
+
+hedge_stats: dict[str, int] = {
+    "streams": 0,
+    "hedged": 0,
+    "hedge_wins": 0,
+    "failovers": 0,
+}
+
+
+def get_breaker(provider: LLMProvider) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        settings = get_settings()
+        breaker = CircuitBreaker(settings.llm_breaker_failure_threshold, settings.llm_breaker_reset_seconds)
+        _breakers[provider] = breaker
+    return breaker
+
+
+def get_llm_providers(primary: dict[str, Any]) -> list[LLMProvider]:
+    """
+    The primary provider (from global settings) followed by LLM_FALLBACK_PROVIDERS.
+
+    Fallback entries are dicts with base_url, api_key and model keys.
+    """
+    providers = [LLMProvider(primary["base_url"], primary["api_key"], primary["model"])]
+    for entry in get_settings().llm_fallback_providers:
+        if not entry.get("model"):
+            logger.warning(f"Ignoring LLM fallback provider without a model: {entry.get('base_url')}")
+            continue
+        provider = LLMProvider(entry.get("base_url") or None, entry.get("api_key", ""), entry["model"])
+        if provider not in providers:
+            providers.append(provider)
+    return providers
+
+
+def get_provider_stats() -> dict[str, Any]:
+    """Return breaker state per provider and hedging counters."""
+    return {
+        "providers": {provider.name: breaker.stats() for provider, breaker in _breakers.items()},
+        **hedge_stats,
+    }
+
+
+async def close_stream(stream: Any) -> None:
+    """
+    Close a streaming completion, tolerating wrappers without an async close().
+
+    The one place upstream streams are closed (finished, cancelled or losing a
+    hedge). A failure to close only leaks the connection, so it is logged, not raised.
+    """
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.debug("Closing LLM stream failed: %r", e)
+
+
+@dataclass
+class StartedStream:
+    """A provider stream that has produced its first token."""
+    provider: LLMProvider
+    stream: Any
+    chunks: AsyncIterator[Any]
+    # Chunks read up to and including the first token, to be replayed first
+    first_chunks: list[Any]
+
+
+def _has_output(chunk: Any) -> bool:
+    """Whether a chunk carries generated text, a tool call or the finish, not just the role."""
+    choices = getattr(chunk, "choices", None)
+    if not choices:
+        return False
+    delta = choices[0].delta
+    return bool(choices[0].finish_reason or (delta and (delta.content or delta.tool_calls)))
+
+
+async def _open_first_chunk(provider: LLMProvider, open_stream: Callable[[LLMProvider], Awaitable[Any]]) -> StartedStream:
+    stream = await open_stream(provider)
+    first_chunks = []
+    try:
+        chunks = stream.__aiter__()
+        # The opening role-only delta arrives before the model has produced anything
+        async for chunk in chunks:
+            first_chunks.append(chunk)
+            if _has_output(chunk):
+                break
+    except BaseException:
+        # Includes cancellation of a losing hedge: abort the upstream request
+        await close_stream(stream)
+        raise
+    return StartedStream(provider, stream, chunks, first_chunks)
+
+
+def _discard_attempt(task: asyncio.Task, provider: LLMProvider) -> None:
+    """Clean up a hedge attempt that lost the race, even if it finished meanwhile."""
+    get_breaker(provider).release()
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(close_stream(task.result().stream))
+
+
+async def start_stream(
+    providers: list[LLMProvider],
+    open_stream: Callable[[LLMProvider], Awaitable[Any]],
+    hedge_after_seconds: float,
+    scheduler: UpstreamScheduler | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> StartedStream:
+    """
+    Open a completion stream, hedging slow starts and failing over on errors.
+
+    Providers are tried in order, skipping those whose breaker is open. If the
+    current attempt has not produced a first token within hedge_after_seconds
+    (0 disables hedging), the next provider is started as well and whichever
+    produces a token first wins; the others are cancelled. An attempt that
+    fails before its first token counts against its breaker and the next
+    provider is started immediately. Raises the last error if none succeed.
+
+    The caller holds one scheduler slot for the stream. A hedge runs
+    alongside the current attempt, so it takes an extra slot of the given
+    priority from scheduler, only if one is free; otherwise hedging waits.
+    Extra slots are released once a single attempt remains.
+    """
+    hedge_stats["streams"] += 1
+    remaining = iter(providers)
+    attempts: dict[asyncio.Task, LLMProvider] = {}
+    hedges: set[LLMProvider] = set()
+    last_error: Exception | None = None
+    extra_slots = 0
+
+    def release_extra_slots(keep: int) -> None:
+        nonlocal extra_slots
+        while extra_slots > keep:
+            scheduler.release(priority)
+            extra_slots -= 1
+
+    def launch() -> bool:
+        for provider in remaining:
+            if get_breaker(provider).allow():
+                attempts[asyncio.create_task(_open_first_chunk(provider, open_stream))] = provider
+                return True
+            logger.debug("Skipping LLM provider %s: circuit open", provider.name)
+        return False
+
+    can_launch = launch()
+    if not can_launch:
+        raise RuntimeError("All LLM providers are unavailable (circuit breakers open)")
+
+    try:
+        while attempts:
+            timeout = hedge_after_seconds if hedge_after_seconds > 0 and can_launch else None
+            done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if scheduler:
+                    if scheduler.try_acquire(priority) is None:
+                        logger.debug("No LLM slot free for a hedge, waiting on the current attempt")
+                        continue
+                    extra_slots += 1
+                can_launch = launch()
+                if can_launch:
+                    hedge = list(attempts.values())[-1]
+                    hedges.add(hedge)
+                    hedge_stats["hedged"] += 1
+                    logger.info(f"No first token within {hedge_after_seconds:.1f}s, hedging to {hedge.name}")
+                release_extra_slots(max(0, len(attempts) - 1))
+                continue
+
+            winner = None
+            for task in done:
+                provider = attempts.pop(task)
+                try:
+                    started = task.result()
+                except Exception as e:
+                    get_breaker(provider).record_failure()
+                    last_error = e
+                    logger.warning(f"LLM provider {provider.name} failed before first token: {e}")
+                    continue
+                if winner is None:
+                    winner = started
+                else:
+                    await close_stream(started.stream)
+                    get_breaker(provider).release()
+
+            if winner:
+                if winner.provider in hedges:
+                    hedge_stats["hedge_wins"] += 1
+                return winner
+
+            if not attempts:
+                can_launch = launch()
+                if can_launch:
+                    hedge_stats["failovers"] += 1
+            release_extra_slots(max(0, len(attempts) - 1))
+    finally:
+        for task, provider in attempts.items():
+            task.cancel()
+            task.add_done_callback(lambda t, p=provider: _discard_attempt(t, p))
+        # Only the returned stream (or none) is left, covered by the caller's slot
+        release_extra_slots(0)
+
+    raise last_error or RuntimeError("All LLM providers are unavailable")
@@ -1,11 +1,24 @@
 """LLM service using ChatCompletions API with provider abstraction."""
+import hashlib
+import json
+import time
 from typing import AsyncGenerator, Any
 
 from fastapi import HTTPException, status
 
-from app.db.supabase import get_supabase_client
-from app.services.langsmith import get_traced_async_openai_client
-from app.routers.settings import decrypt_value
+from app.services.http_clients import get_async_openai_client
+from app.services.langsmith import start_run
+from app.services.llm_providers import (
+    LLMProvider,
+    StartedStream,
+    close_stream,
+    get_breaker,
+    get_llm_providers,
+    start_stream,
+)
+from app.services.metrics import llm_tokens, observe_stage, provider_label
+from app.services.scheduler import llm_scheduler
+from app.routers.settings import decrypt_value, get_global_settings_row
 
 SYSTEM_PROMPT = """You are a legal document assistant. Your ONLY job is to provide COMPLETE and EXACT information from retrieved documents.
 
@@ -270,6 +283,72 @@ Use filters when user mentions specific document types or technologies.""",
 }]
 
 
+QUOTE_TOOL_NAME = "quote_document_span"
+
+VERBATIM_SYSTEM_PROMPT = """You are a legal document assistant. You deliver COMPLETE and EXACT article text from retrieved documents.
+
+You NEVER type article text yourself. The server delivers the exact stored text when you call the quote_document_span tool.
+
+📋 PROCESS:
+
+1. **ANALYZE THE QUERY**
+   - AMBIGUOUS (just an article number like "5-modda", no law/resolution name): do NOT search. Ask:
+     "Qaysi qonun yoki qaror haqida gap ketyapti? Iltimos, hujjat nomini yoki raqamini ko'rsating."
+   - SPECIFIC (mentions a law, resolution or unique terms): call search_documents immediately.
+
+2. **LOCATE THE SPANS**
+   - Each search result is tagged [Source: filename] (document_id: ..., chunk: N).
+   - Find the chunk where the requested article starts and the chunk where it ends.
+   - Large articles span several consecutive chunks. If a chunk ends with a semicolon (;) or comma (,), the article continues in chunk N+1.
+
+3. **DELIVER THE TEXT**
+   - Write a short source label first, e.g. "**Manba:** O'zbekiston Respublikasining Davlat xaridlari to'g'risidagi Qonuni"
+   - Call quote_document_span with the document_id and the first and last chunk numbers of the article.
+   - Pass start_text (e.g. "46-modda.") so delivery starts at the article heading, and stop_before (e.g. "47-modda.") so it ends before the next article.
+   - If the answer covers several laws, label and quote each one separately.
+   - After the text is delivered, add at most one or two short sentences if needed. NEVER repeat, summarize or retype the delivered text.
+
+Remember: the user must receive the article exactly as stored. Select spans generously - missing part of an article is worse than including a neighbouring sentence."""
+
+QUOTE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": QUOTE_TOOL_NAME,
+        "description": """Deliver the exact stored text of a span of consecutive chunks of one document directly to the user.
+
+Use the document_id and chunk numbers shown in search_documents results. The text is streamed to the user verbatim by the server; you only receive a short confirmation. Do not retype the text yourself.""",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "document_id": {
+                    "type": "string",
+                    "description": "The document_id shown in the search result"
+                },
+                "start_chunk": {
+                    "type": "integer",
+                    "description": "First chunk number of the article"
+                },
+                "end_chunk": {
+                    "type": "integer",
+                    "description": "Last chunk number of the article (inclusive)"
+                },
+                "start_text": {
+                    "type": "string",
+                    "description": "Optional exact heading to start from, e.g. \"46-modda.\""
+                },
+                "stop_before": {
+                    "type": "string",
+                    "description": "Optional exact heading to stop before, e.g. \"47-modda.\""
+                }
+            },
+            "required": ["document_id", "start_chunk", "end_chunk"]
+        }
+    }
+}
+
+VERBATIM_TOOLS = [*RAG_TOOLS, QUOTE_TOOL]
+
+
 def get_global_llm_settings() -> dict[str, Any]:
     """
     Get global LLM settings from the global_settings table.
@@ -280,17 +359,12 @@ def get_global_llm_settings() -> dict[str, Any]:
     """
     from app.config import get_settings
 
-    supabase = get_supabase_client()
     api_key = None
     model = None
     base_url = None
 
     try:
-        result = supabase.table("global_settings").select(
-            "llm_model, llm_base_url, llm_api_key"
-        ).limit(1).maybe_single().execute()
-
-        data = result.data if result else None
+        data = get_global_settings_row()
         if data:
             api_key = decrypt_value(data.get("llm_api_key"))
             model = data.get("llm_model")
@@ -319,10 +393,90 @@ def get_global_llm_settings() -> dict[str, Any]:
     }
 
 
+# Cumulative token usage reported by the provider, used to verify prompt caching savings
+prompt_cache_stats: dict[str, int] = {
+    "requests": 0,
+    "requests_with_usage": 0,
+    "prompt_tokens": 0,
+    "cached_prompt_tokens": 0,
+    "completion_tokens": 0,
+}
+
+
+# Base URLs of providers that rejected stream_options (no usage reporting)
+stream_usage_unsupported: set[str] = set()
+
+
+def get_prompt_cache_stats() -> dict[str, Any]:
+    """Return cumulative provider usage counters with the cached-token ratio."""
+    stats: dict[str, Any] = dict(prompt_cache_stats)
+    prompt_tokens = stats["prompt_tokens"]
+    stats["cached_ratio"] = round(stats["cached_prompt_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+    return stats
+
+
+def resolve_prompt_cache_mode(base_url: str | None) -> str:
+    """
+    Decide how to request provider-side prompt caching.
+
+    Returns one of:
+        "openai"        - automatic prefix caching; send a stable prompt_cache_key
+        "cache_control" - mark the static system prompt with cache_control breakpoints
+                          (OpenRouter passes these to Anthropic/Gemini models)
+        "off"           - leave the request untouched
+    """
+    from app.config import get_settings
+
+    mode = get_settings().llm_prompt_cache_mode
+    if mode != "auto":
+        return mode
+    if not base_url or "api.openai.com" in base_url:
+        return "openai"
+    if "openrouter.ai" in base_url:
+        return "cache_control"
+    return "off"
+
+
+def build_system_message(system_prompt: str, cache_mode: str) -> dict[str, Any]:
+    """Build the system message, adding a cache breakpoint after the static prompt if requested."""
+    if cache_mode == "cache_control":
+        return {
+            "role": "system",
+            "content": [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }],
+        }
+    return {"role": "system", "content": system_prompt}
+
+
+def get_prompt_cache_key(system_prompt: str, tools: list[dict] | None) -> str:
+    """Stable key for the static prefix (system prompt + tool schema) so requests route to a warm cache."""
+    prefix = system_prompt + json.dumps(tools or [], sort_keys=True, ensure_ascii=False)
+    return "rag-" + hashlib.sha256(prefix.encode()).hexdigest()[:24]
+
+
+def record_usage(usage: Any) -> dict[str, int]:
+    """Accumulate a streamed usage payload into prompt_cache_stats and return its counts."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_prompt_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+    prompt_cache_stats["requests_with_usage"] += 1
+    for name, value in counts.items():
+        prompt_cache_stats[name] += value
+    return counts
+
+
 async def astream_chat_response(
     messages: list[dict],
     tools: list[dict] | None = None,
     user_id: str | None = None,
+    system_prompt: str = SYSTEM_PROMPT,
+    max_completion_tokens: int | None = None,
 ) -> AsyncGenerator[dict[str, Any], None]:
     """
     Stream a chat response using the ChatCompletions API.
@@ -331,39 +485,101 @@ async def astream_chat_response(
         messages: List of message dicts with 'role' and 'content' keys
         tools: Optional list of tool definitions for function calling
         user_id: Unused, kept for API compatibility
+        system_prompt: System prompt to prepend (VERBATIM_SYSTEM_PROMPT in verbatim mode)
+        max_completion_tokens: Output token limit for this call (default: LLM_MAX_COMPLETION_TOKENS)
 
     Yields:
         Event dicts with 'type' and additional data
     """
     import logging
+    from app.config import get_settings
     logger = logging.getLogger(__name__)
 
     llm_settings = get_global_llm_settings()
-    model = llm_settings["model"]
-    client = get_traced_async_openai_client(
-        base_url=llm_settings["base_url"],
-        api_key=llm_settings["api_key"],
+    providers = get_llm_providers(llm_settings)
+    hedge_after_seconds = get_settings().llm_hedge_after_ms / 1000
+    if max_completion_tokens is None:
+        max_completion_tokens = get_settings().llm_max_completion_tokens
+
+    async def open_stream(provider: LLMProvider) -> Any:
+        from openai import BadRequestError
+
+        client = get_async_openai_client(base_url=provider.base_url, api_key=provider.api_key)
+
+        # The static prefix (system prompt, then tools) must come first and stay
+        # byte-identical across requests and tool rounds for provider caches to hit.
+        cache_mode = resolve_prompt_cache_mode(provider.base_url)
+        request_kwargs: dict[str, Any] = {
+            "model": provider.model,
+            "messages": [build_system_message(system_prompt, cache_mode), *messages],
+            "stream": True,
+            "max_completion_tokens": max_completion_tokens,
+            "temperature": 0.0,  # Zero temperature for exact copying
+        }
+        if tools:
+            request_kwargs["tools"] = tools
+        if cache_mode == "openai":
+            request_kwargs["prompt_cache_key"] = get_prompt_cache_key(system_prompt, tools)
+
+        # Usage feeds token metrics and the prompt cache stats, but some
+        # OpenAI-compatible servers reject stream_options with a 400
+        include_usage = (provider.base_url or "") not in stream_usage_unsupported
+        if include_usage:
+            request_kwargs["stream_options"] = {"include_usage": True}
+
+        logger.debug("Chat completion: provider=%s, tools=%d, prompt_cache=%s", provider.name, len(tools) if tools else 0, cache_mode)
+        try:
+            return await client.chat.completions.create(**request_kwargs)
+        except BadRequestError as e:
+            if not include_usage:
+                raise
+            del request_kwargs["stream_options"]
+            stream = await client.chat.completions.create(**request_kwargs)
+            # Only remembered once the request succeeds without it
+            stream_usage_unsupported.add(provider.base_url or "")
+            logger.warning(f"Provider {provider.name} rejected stream_options ({e}); streaming without usage")
+            return stream
+
+    # The admission slot is held until the stream is fully consumed or closed
+    priority = await llm_scheduler.acquire()
+    run = start_run(
+        "ChatCompletion", "chat", run_type="llm",
+        inputs={"messages": messages, "tools": [t["function"]["name"] for t in tools or []]},
     )
-
-    request_kwargs: dict[str, Any] = {
-        "model": model,
-        "messages": [{"role": "system", "content": SYSTEM_PROMPT}, *messages],
-        "stream": True,
-        "max_completion_tokens": 16000,  # Maximum tokens for response generation
-        "temperature": 0.0,  # Zero temperature for exact copying
-    }
-    if tools:
-        request_kwargs["tools"] = tools
-
-    logger.debug(f"Chat completion: model={model}, tools={len(tools) if tools else 0}")
-
+    trace_outputs: dict[str, Any] = {}
+    trace_error: str | None = "cancelled"
+    started: StartedStream | None = None
+    stream_started_at = time.perf_counter()
     try:
-        stream = await client.chat.completions.create(**request_kwargs)
+        started = await start_stream(providers, open_stream, hedge_after_seconds, llm_scheduler, priority)
+        prompt_cache_stats["requests"] += 1
+        model = started.provider.model
+        provider = provider_label(started.provider.base_url)
+        observe_stage("llm_ttft", time.perf_counter() - stream_started_at, model, provider)
+
+        async def chunks():
+            for chunk in started.first_chunks:
+                yield chunk
+            async for chunk in started.chunks:
+                yield chunk
 
         full_response = ""
         tool_calls_buffer: dict[int, dict] = {}
+        final_event: dict[str, Any] | None = None
+
+        async for chunk in chunks():
+            if getattr(chunk, "usage", None):
+                # Sent in a final chunk with no choices, after finish_reason
+                counts = record_usage(chunk.usage)
+                trace_outputs["usage"] = counts
+                for kind, value in counts.items():
+                    llm_tokens.inc(value, model=model, provider=provider, kind=kind.removesuffix("_tokens"))
+                logger.debug(
+                    "Usage: prompt=%s (cached=%s), completion=%s",
+                    counts['prompt_tokens'], counts['cached_prompt_tokens'], counts['completion_tokens'],
+                )
+                yield {"type": "usage", **counts}
 
-        async for chunk in stream:
             delta = chunk.choices[0].delta if chunk.choices else None
             finish_reason = chunk.choices[0].finish_reason if chunk.choices else None
 
@@ -388,13 +604,37 @@ async def astream_chat_response(
                     if tc.function and tc.function.arguments:
                         tool_calls_buffer[idx]["arguments"] += tc.function.arguments
 
+            # Hold the terminal event until the trailing usage chunk has arrived
             if finish_reason == "tool_calls":
-                yield {"type": "tool_calls", "tool_calls": list(tool_calls_buffer.values())}
+                final_event = {"type": "tool_calls", "tool_calls": list(tool_calls_buffer.values()), "model": model}
 
             if finish_reason == "stop":
-                yield {"type": "response_completed", "content": full_response}
+                final_event = {"type": "response_completed", "content": full_response, "model": model}
+
+        get_breaker(started.provider).record_success()
+        observe_stage("llm_stream", time.perf_counter() - stream_started_at, model, provider)
+        trace_outputs.update(
+            content=full_response,
+            tool_calls=list(tool_calls_buffer.values()),
+            model=model,
+            provider=provider,
+        )
+        trace_error = None
+        if final_event:
+            yield final_event
 
     except HTTPException:
         raise
     except Exception as e:
+        if started:
+            # Failed mid-stream: text was already sent, so no failover here
+            get_breaker(started.provider).record_failure()
+        trace_error = str(e)
         yield {"type": "error", "error": str(e)}
+    finally:
+        # Closing the response aborts the upstream request, so a cancelled
+        # generation (client gone) stops consuming completion tokens.
+        if started:
+            await close_stream(started.stream)
+        llm_scheduler.release(priority)
+        run.end(trace_outputs, error=trace_error)
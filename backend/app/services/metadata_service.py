@@ -1,8 +1,10 @@
 """Metadata extraction service using LLM structured outputs."""
 import logging
-from openai import AsyncOpenAI
 from app.models.schemas import DocumentMetadata
 from app.config import get_settings
+from app.services.http_clients import get_async_openai_client
+from app.services.langsmith import trace_run
+from app.services.scheduler import llm_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -53,11 +55,8 @@ async def extract_metadata(text_content: str, filename: str) -> DocumentMetadata
         if not llm_base_url or not llm_api_key or not llm_model:
             raise ValueError("LLM settings incomplete. Please configure base_url, api_key, and model.")
 
-        # Create OpenAI client
-        client = AsyncOpenAI(
-            base_url=llm_base_url,
-            api_key=llm_api_key
-        )
+        # Shared OpenAI client for this provider
+        client = get_async_openai_client(base_url=llm_base_url, api_key=llm_api_key)
 
         # Truncate content to 8000 chars for cost optimization
         truncated_content = text_content[:8000]
@@ -65,11 +64,15 @@ async def extract_metadata(text_content: str, filename: str) -> DocumentMetadata
             truncated_content += "\n\n[Content truncated for metadata extraction]"
 
         # Use structured outputs (beta feature)
-        completion = await client.beta.chat.completions.parse(
-            model=llm_model,
-            messages=[{
-                "role": "user",
-                "content": f"""Analyze this document and extract structured metadata.
+        async with llm_scheduler.slot(), trace_run(
+            "ExtractMetadata", "ingestion", run_type="llm",
+            inputs={"filename": filename, "content_chars": len(text_content)}, model=llm_model,
+        ) as outputs:
+            completion = await client.beta.chat.completions.parse(
+                model=llm_model,
+                messages=[{
+                    "role": "user",
+                    "content": f"""Analyze this document and extract structured metadata.
 
 Filename: {filename}
 
@@ -87,9 +90,10 @@ Extract the following information:
 - Technical difficulty level (beginner, intermediate, advanced, or expert)
 
 Be concise and accurate. If information is not present, use appropriate defaults."""
-            }],
-            response_format=DocumentMetadata
-        )
+                }],
+                response_format=DocumentMetadata
+            )
+            outputs["metadata"] = completion.choices[0].message.parsed.model_dump()
 
         metadata = completion.choices[0].message.parsed
         logger.debug(f"Extracted metadata for {filename}: {metadata.document_type}, {len(metadata.topics)} topics")
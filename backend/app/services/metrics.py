@@ -0,0 +1,255 @@
+"""In-process counters and histograms with Prometheus text exposition, plus per-request stage timings."""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+from urllib.parse import urlparse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+
+    def register(self, metric: Counter | Histogram) -> Counter | Histogram:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_duration = registry.register(Histogram(
+    "rag_stage_duration_seconds",
+    "Duration of request and ingestion stages.",
+    ("stage", "model", "provider"),
+))
+stage_errors = registry.register(Counter(
+    "rag_stage_errors_total",
+    "Stages that raised an exception.",
+    ("stage", "model", "provider"),
+))
+llm_tokens = registry.register(Counter(
+    "rag_llm_tokens_total",
+    "Tokens reported by LLM providers.",
+    ("model", "provider", "kind"),
+))
+search_candidates = registry.register(Counter(
+    "rag_search_candidate_sets_total",
+    "Hybrid searches by candidate-set outcome (full, narrow, or widened and why).",
+    ("outcome",),
+))
+vector_index_lookups = registry.register(Counter(
+    "rag_vector_index_lookups_total",
+    "In-process vector index lookups by outcome (hit, or why the database served the vector leg).",
+    ("outcome",),
+))
+keyword_index_lookups = registry.register(Counter(
+    "rag_keyword_index_lookups_total",
+    "In-process BM25 index lookups by outcome (hit, or why the database served the keyword leg).",
+    ("outcome",),
+))
+rerank_payload = registry.register(Counter(
+    "rag_rerank_payload_total",
+    "Documents and characters sent to the reranker, and documents truncated or withheld by the caps.",
+    ("kind",),
+))
+http_request_duration = registry.register(Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request duration until the last body byte (whole stream for SSE).",
+    ("method", "route", "status"),
+))
+
+
+def provider_label(base_url: str | None) -> str:
+    """Host name used as the provider label (api.openai.com when no base URL is set)."""
+    return (urlparse(base_url).hostname if base_url else None) or "api.openai.com"
+
+
+# Stage name -> milliseconds for the current request (None outside a request)
+_request_timings: contextvars.ContextVar[dict[str, float] | None] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def get_request_timings() -> dict[str, float] | None:
+    return _request_timings.get()
+
+
+@contextmanager
+def collect_timings() -> Iterator[dict[str, float]]:
+    """Collect stage timings of the enclosed block (outside HTTP requests, e.g. scripts)."""
+    timings: dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def observe_stage(stage: str, seconds: float, model: str = "", provider: str = "") -> None:
+    """Record a stage duration in the histogram and the current request's timings."""
+    stage_duration.observe(seconds, stage=stage, model=model, provider=provider)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+
+
+@contextmanager
+def timed_stage(stage: str, model: str = "", provider: str = "") -> Iterator[None]:
+    """Time a block as one stage. Exceptions are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage, model=model, provider=provider)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started, model, provider)
+
+
+def format_server_timing(timings: dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in timings.items())
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware giving each HTTP request its own stage timings.
+
+    Stages finished before the response starts are sent in a Server-Timing
+    header; streamed responses report the rest in their final event. The
+    whole request duration is recorded per route template.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: dict) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if timings:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", format_server_timing(timings).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code),
+            )
@@ -0,0 +1,215 @@
+"""Write-behind persistence of assistant messages off the SSE response path."""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from app.config import get_settings
+from app.db.supabase import get_supabase_client
+from app.services.metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 0.5
+MAX_CONCURRENT_WRITES = 8
+SHUTDOWN_FLUSH_TIMEOUT_SECONDS = 30.0
+
+
+class WriteBehindQueue:
+    """
+    Background persistence of assistant messages and thread timestamps.
+
+    Each job runs as its own task (at most MAX_CONCURRENT_WRITES writing at
+    once), so one job backing off between retries never holds up the rest.
+    Jobs carry a client-generated message id used as an idempotency key:
+    inserts are upserts that ignore an existing id, so retrying after a
+    timeout that actually succeeded never duplicates the message.
+
+    A job that still fails after max_attempts is appended to the dead-letter
+    file (WRITE_BEHIND_DEAD_LETTER_PATH, JSON lines) and retried on the next
+    start. Pending jobs are flushed on shutdown, and wait_for_thread() lets
+    the next turn of a thread read its history only after the previous
+    answer is written.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_base_delay: float = RETRY_BASE_DELAY_SECONDS,
+        dead_letter_path: str | None = None,
+    ):
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.dead_letter_path = Path(dead_letter_path or get_settings().write_behind_dead_letter_path)
+        self._tasks: set[asyncio.Task] = set()
+        # thread_id -> tasks still writing to that thread
+        self._pending: dict[str, set[asyncio.Task]] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self.persisted = 0
+        self.retries = 0
+        self.failed = 0
+        self.replayed = 0
+
+    def start(self) -> None:
+        """Set up the write slots and replay dead-lettered jobs (idempotent)."""
+        if self._semaphore is not None:
+            return
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_WRITES)
+        self._replay_dead_letters()
+
+    async def stop(self, timeout: float = SHUTDOWN_FLUSH_TIMEOUT_SECONDS) -> None:
+        """Flush pending jobs; jobs still unwritten at the timeout are dead-lettered."""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            logger.error(f"Write-behind flush timed out with {len(pending)} job(s) pending")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def enqueue_assistant_message(self, thread_id: str, user_id: str, content: str) -> str:
+        """
+        Queue an assistant message and thread updated_at bump.
+
+        Returns the message id assigned to the row.
+        """
+        now = datetime.utcnow().isoformat()
+        job = {
+            "message": {
+                "id": str(uuid.uuid4()),
+                "thread_id": thread_id,
+                "user_id": user_id,
+                "role": "assistant",
+                "content": content,
+                # Timestamp at enqueue time keeps history ordering correct
+                "created_at": now,
+            },
+            "thread_id": thread_id,
+            "updated_at": now,
+        }
+        self._submit(job)
+        return job["message"]["id"]
+
+    async def wait_for_thread(self, thread_id: str, timeout: float) -> None:
+        """
+        Wait until this process has written the queued messages of a thread.
+
+        Gives up after timeout; the caller then reads whatever is stored.
+        """
+        tasks = self._pending.get(thread_id)
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(set(tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"Read thread {thread_id} with {len(pending)} assistant message(s) still unwritten")
+
+    def _submit(self, job: dict[str, Any]) -> asyncio.Task:
+        self.start()
+        task = asyncio.create_task(self._persist_with_retry(job))
+        thread_tasks = self._pending.setdefault(job["thread_id"], set())
+        self._tasks.add(task)
+        thread_tasks.add(task)
+
+        def forget(_task: asyncio.Task) -> None:
+            self._tasks.discard(task)
+            thread_tasks.discard(task)
+            if not thread_tasks and self._pending.get(job["thread_id"]) is thread_tasks:
+                del self._pending[job["thread_id"]]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def _persist_with_retry(self, job: dict[str, Any]) -> None:
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    async with self._semaphore:
+                        await asyncio.to_thread(_persist, job)
+                    self.persisted += 1
+                    return
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        self.failed += 1
+                        logger.error(
+                            f"Dead-lettering assistant message {job['message']['id']} for thread "
+                            f"{job['thread_id']} after {attempt} attempts: {e}"
+                        )
+                        await asyncio.to_thread(self._dead_letter, job)
+                        return
+                    self.retries += 1
+                    delay = self.retry_base_delay * 2 ** (attempt - 1)
+                    logger.warning(f"Persisting message {job['message']['id']} failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Shutdown flush timed out: keep the message for the next start
+            self._dead_letter(job)
+            raise
+
+    def _dead_letter(self, job: dict[str, Any]) -> None:
+        """Append a job to the dead-letter file."""
+        try:
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(job, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"Could not dead-letter message {job['message']['id']}: {e}. Content lost.")
+
+    def _replay_dead_letters(self) -> None:
+        """
+        Resubmit dead-lettered jobs.
+
+        The file is first renamed, so jobs failing again are appended to a
+        fresh file; the renamed copy is deleted once every job has finished.
+        """
+        replay_path = self.dead_letter_path.with_name(self.dead_letter_path.name + ".replay")
+        try:
+            if self.dead_letter_path.exists() and not replay_path.exists():
+                os.replace(self.dead_letter_path, replay_path)
+            if not replay_path.exists():
+                return
+            jobs = [json.loads(line) for line in replay_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read dead-lettered messages from {replay_path}: {e}")
+            return
+
+        logger.info(f"Replaying {len(jobs)} dead-lettered assistant message(s)")
+        self.replayed += len(jobs)
+        tasks = [self._submit(job) for job in jobs]
+
+        async def remove_when_done() -> None:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            replay_path.unlink(missing_ok=True)
+
+        asyncio.create_task(remove_when_done())
+
+    def stats(self) -> dict[str, Any]:
+        """Return in-flight jobs and outcome counters for monitoring."""
+        return {
+            "pending": len(self._tasks),
+            "persisted": self.persisted,
+            "retries": self.retries,
+            "failed": self.failed,
+            "replayed": self.replayed,
+            "dead_letter_path": str(self.dead_letter_path),
+        }
+
+
+def _persist(job: dict[str, Any]) -> None:
+    """Write one job. Safe to repeat: the message insert is keyed by its id."""
+    supabase = get_supabase_client()
+    with timed_stage("db_write"):
+        supabase.table("messages").upsert(
+            job["message"], on_conflict="id", ignore_duplicates=True
+        ).execute()
+        supabase.table("threads").update({
+            "updated_at": job["updated_at"]
+        }).eq("id", job["thread_id"]).execute()
+
+
+persistence_queue = WriteBehindQueue()
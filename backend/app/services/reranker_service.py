@@ -4,8 +4,16 @@ import logging
 from typing import List
 import httpx
 
+from app.config import get_settings
+from app.services.http_clients import get_http_client
+from app.services.metrics import rerank_payload, timed_stage
+from app.services.scheduler import reranker_scheduler
+
 
 DEFAULT_JINA_RERANK_MODEL = "jina-reranker-v2-base-multilingual"
+DEFAULT_JINA_RERANK_URL = "https://api.jina.ai/v1/rerank"
+# Score given to chunks left out of the rerank request: relevance scores are >= 0
+WITHHELD_RERANK_SCORE = 0.0
 
 logger = logging.getLogger(__name__)
 
@@ -15,20 +23,14 @@ def get_reranker_settings() -> dict:
     Get reranker settings from the global_settings table.
     Falls back to environment variables if not configured in DB.
     """
-    from app.db.supabase import get_supabase_client
-    from app.routers.settings import decrypt_value
+    from app.routers.settings import decrypt_value, get_global_settings_row
 
     api_key = None
     model = None
     enabled = False
 
     try:
-        supabase = get_supabase_client()
-        result = supabase.table("global_settings").select(
-            "jina_api_key, jina_rerank_model, jina_rerank_enabled"
-        ).limit(1).maybe_single().execute()
-
-        data = result.data if result else None
+        data = get_global_settings_row()
         if data:
             api_key = decrypt_value(data.get("jina_api_key"))
             model = data.get("jina_rerank_model")
@@ -44,7 +46,40 @@ def get_reranker_settings() -> dict:
     if not enabled:
         enabled = os.getenv("JINA_RERANK_ENABLED", "false").lower() == "true"
 
-    return {"api_key": api_key, "model": model, "enabled": enabled}
+    # Endpoint is env-only; overridden to point at a local stand-in for load tests
+    url = os.getenv("JINA_RERANK_URL") or DEFAULT_JINA_RERANK_URL
+
+    return {"api_key": api_key, "model": model, "enabled": enabled, "url": url}
+
+
+def cap_rerank_documents(chunks: List[dict]) -> List[str]:
+    """
+    Documents to send for reranking, within the RERANK_MAX_* caps.
+
+    Chunks are in RRF order, so the caps withhold the weakest candidates:
+    at most rerank_max_documents are sent, each truncated to
+    rerank_max_document_chars (the cross-encoder only reads the first ~1024
+    tokens anyway), stopping once rerank_max_payload_chars would be exceeded.
+    """
+    settings = get_settings()
+    documents: List[str] = []
+    payload_chars = 0
+    truncated = 0
+    for chunk in chunks[:settings.rerank_max_documents]:
+        content = chunk["content"]
+        if len(content) > settings.rerank_max_document_chars:
+            content = content[:settings.rerank_max_document_chars]
+            truncated += 1
+        if documents and payload_chars + len(content) > settings.rerank_max_payload_chars:
+            break
+        documents.append(content)
+        payload_chars += len(content)
+
+    rerank_payload.inc(len(documents), kind="documents")
+    rerank_payload.inc(payload_chars, kind="chars")
+    rerank_payload.inc(truncated, kind="truncated")
+    rerank_payload.inc(len(chunks) - len(documents), kind="withheld")
+    return documents
 
 
 async def rerank_chunks(
@@ -56,7 +91,11 @@ async def rerank_chunks(
     Rerank chunks using Jina AI Reranker API.
 
     The reranker uses a cross-encoder model to score query-document pairs,
-    providing more accurate relevance ranking than RRF alone.
+    providing more accurate relevance ranking than RRF alone. Only the
+    leading chunks that fit cap_rerank_documents() are scored; if they yield
+    fewer than top_n results the rest follow in RRF order, marked with
+    rerank_withheld and a rerank_score of 0.0 (the floor of the relevance
+    scale), so they never outrank or mix with scored chunks.
 
     Args:
         query: User query
@@ -81,26 +120,28 @@ async def rerank_chunks(
     if not chunks:
         return []
 
-    # Prepare documents for reranking (extract text content)
-    documents = [chunk["content"] for chunk in chunks]
+    # Prepare documents for reranking (capped text content)
+    documents = cap_rerank_documents(chunks)
 
     try:
         # Call Jina Reranker API
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.jina.ai/v1/rerank",
-                headers={
-                    "Authorization": f"Bearer {jina_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": jina_rerank_model,
-                    "query": query,
-                    "documents": documents,
-                    "top_n": min(top_n, len(documents))  # Don't request more than available
-                },
-                timeout=30.0
-            )
+        client = get_http_client()
+        async with reranker_scheduler.slot():
+            with timed_stage("rerank", model=jina_rerank_model, provider="jina"):
+                response = await client.post(
+                    settings["url"],
+                    headers={
+                        "Authorization": f"Bearer {jina_api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": jina_rerank_model,
+                        "query": query,
+                        "documents": documents,
+                        "top_n": min(top_n, len(documents))  # Don't request more than available
+                    },
+                    timeout=30.0
+                )
             response.raise_for_status()
             result = response.json()
 
@@ -112,6 +153,9 @@ async def rerank_chunks(
             chunk["rerank_score"] = item["relevance_score"]
             reranked.append(chunk)
 
+        # Withheld chunks keep their RRF order behind the scored ones
+        for chunk in chunks[len(documents):len(documents) + top_n - len(reranked)]:
+            reranked.append({**chunk, "rerank_score": WITHHELD_RERANK_SCORE, "rerank_withheld": True})
         return reranked
 
     except httpx.HTTPError as e:
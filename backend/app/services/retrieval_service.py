@@ -1,11 +1,102 @@
 """Hybrid search (vector + keyword) with optional reranking."""
+import json
 import logging
+from dataclasses import dataclass
+from app.config import get_settings
 from app.db.supabase import get_supabase_client
+from app.services.cache import TTLCache
+from app.services.corpus_state import get_corpus_generation
 from app.services.embedding_service import get_embeddings
-from app.services.reranker_service import rerank_chunks
+from app.services.metrics import keyword_index_lookups, search_candidates, timed_stage, vector_index_lookups
+from app.services.reranker_service import rerank_chunks, get_reranker_settings
+from app.services.singleflight import SingleFlight
+from app.services.vector_index import vector_index
 
 logger = logging.getLogger(__name__)
 
+_settings = get_settings()
+search_cache = TTLCache(
+    max_entries=_settings.search_cache_max_entries,
+    ttl_seconds=_settings.search_cache_ttl_seconds,
+    name="search_results",
+)
+search_flight = SingleFlight(name="search")
+
+
+@dataclass(frozen=True)
+class SearchParams:
+    """
+    Result and candidate-set sizes for one search.
+
+    top_k chunks are returned; each RPC leg fetches match_count candidates,
+    the fused top final_count go to the reranker, fused with constant rrf_k.
+
+    With initial_match_count/initial_final_count set, the RPC first runs
+    with those smaller sizes and is repeated with the full ones only when
+    the narrow result looks ambiguous (see widen_reason()).
+    """
+    top_k: int
+    match_count: int
+    final_count: int
+    rrf_k: int
+    initial_match_count: int | None = None
+    initial_final_count: int | None = None
+
+    @classmethod
+    def from_settings(cls, **overrides: int | None) -> "SearchParams":
+        """Configured sizes (SEARCH_* settings), with non-None overrides applied."""
+        values = {
+            "top_k": _settings.search_top_k,
+            "match_count": _settings.search_match_count,
+            "final_count": _settings.search_final_count,
+            "rrf_k": _settings.search_rrf_k,
+        }
+        if _settings.search_adaptive_enabled:
+            values["initial_match_count"] = _settings.search_initial_match_count
+            values["initial_final_count"] = _settings.search_initial_final_count
+        values.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**values)
+
+    @property
+    def adaptive(self) -> bool:
+        """Whether a narrow first pass is smaller than the full candidate set."""
+        return (
+            self.initial_match_count is not None
+            and self.initial_final_count is not None
+            and (self.initial_match_count, self.initial_final_count) < (self.match_count, self.final_count)
+        )
+
+
+def widen_reason(chunks: list[dict], params: SearchParams) -> str | None:
+    """
+    Why a narrow first-pass result should be re-run with the full sizes.
+
+    "flat": the vector similarities of the candidates span less than
+    search_widen_min_score_gap, so the cut-off is arbitrary and better
+    matches may sit just below it. "disagreement": both legs found
+    candidates but fewer than search_widen_min_agreement of the fused
+    results came from both, so the legs rank different chunks. A narrow
+    pass that already exhausted both legs (fewer rows than requested)
+    never widens: the full sizes cannot return anything new.
+    """
+    if len(chunks) < params.initial_final_count:
+        return None
+
+    similarities = [chunk.get("vector_similarity") or 0 for chunk in chunks]
+    vector_hits = [similarity for similarity in similarities if similarity > 0]
+    if len(vector_hits) > 1 and max(vector_hits) - min(vector_hits) < _settings.search_widen_min_score_gap:
+        return "flat"
+
+    keyword_hits = sum(1 for chunk in chunks if (chunk.get("keyword_rank") or 0) > 0)
+    if vector_hits and keyword_hits:
+        both = sum(
+            1 for chunk in chunks
+            if (chunk.get("vector_similarity") or 0) > 0 and (chunk.get("keyword_rank") or 0) > 0
+        )
+        if both / len(chunks) < _settings.search_widen_min_agreement:
+            return "disagreement"
+    return None
+
 
 def normalize_query(query: str) -> str:
     """
@@ -36,7 +127,8 @@ def normalize_query(query: str) -> str:
     # Uzbek text uses many Unicode variants: ʻ (U+02BB), ʼ (U+02BC), ' (U+2019), etc.
     apostrophe_variants = [
         "'", "ʻ", "'", "`", "ʼ", "´", "ʹ", "ˈ", "'", "‛", "′", "ʹ",  # Various apostrophes
-        "ʻ", "ʼ", "ˊ", "ˋ", "˴"  # Modifier letters
+        "ʻ", "ʼ", "ˊ", "ˋ", "˴",  # Modifier letters
+        "\u2018", "\u2019",  # Curly single quotes
     ]
     for variant in apostrophe_variants:
         normalized = normalized.replace(variant, "'")
@@ -47,13 +139,42 @@ def normalize_query(query: str) -> str:
     return normalized
 
 
+def build_search_cache_key(
+    normalized_query: str,
+    params: SearchParams,
+    threshold: float,
+    metadata_filters: dict | None,
+    use_reranking: bool,
+) -> tuple:
+    """
+    Build the result-cache key for a search.
+
+    Includes the corpus generation so entries cached before an ingestion or
+    deletion are never served, and the effective reranker config so toggling
+    the reranker in Settings does not return stale rankings.
+    """
+    reranker_key = None
+    if use_reranking:
+        reranker = get_reranker_settings()
+        reranker_key = (bool(reranker["enabled"] and reranker["api_key"]), reranker["model"])
+
+    return (
+        normalized_query.casefold(),
+        json.dumps(metadata_filters, sort_keys=True) if metadata_filters else None,
+        params,
+        threshold,
+        reranker_key,
+        get_corpus_generation(),
+    )
+
+
 async def search_documents(
     query: str,
     user_id: str,
-    top_k: int = 20,  # Return 20 chunks for complete answers (was 10)
     threshold: float = 0.0,  # No threshold - return any matches (was 0.2)
     metadata_filters: dict | None = None,
-    use_reranking: bool = True
+    use_reranking: bool = True,
+    params: SearchParams | None = None,
 ) -> list[dict]:
     """
     Search ALL documents using hybrid search (vector + keyword) with optional reranking.
@@ -70,73 +191,268 @@ async def search_documents(
     Args:
         query: Search query text
         user_id: User ID for logging/context (not used for filtering)
-        top_k: Number of final results to return
         threshold: Minimum similarity threshold for vector search
         metadata_filters: Optional metadata filters (e.g., {"document_type": "tutorial"})
         use_reranking: Whether to apply reranking (default True)
+        params: Result and candidate-set sizes (default: SearchParams.from_settings())
 
     Returns:
         List of reranked chunks with relevance scores
+
+    Results are cached per (normalized query, filters, params, reranker config,
+    corpus generation); callers receive copies, so mutating them is safe.
     """
-    logger.debug(f"Search query: '{query}' for user {user_id[:8]}")
+    params = params or SearchParams.from_settings()
+    logger.debug("Search query: '%s' for user %s", query, user_id[:8])
 
     # Normalize query to handle apostrophe variations
     normalized_query = normalize_query(query)
-    logger.debug(f"Normalized query: '{query}' → '{normalized_query}'")
+    logger.debug("Normalized query: '%s' → '%s'", query, normalized_query)
+
+    cache_key = build_search_cache_key(normalized_query, params, threshold, metadata_filters, use_reranking)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Search cache hit: returning %d chunks", len(cached))
+        return [dict(chunk) for chunk in cached]
+
+    # Concurrent identical searches share one embedding + RPC + rerank
+    chunks = await search_flight.do(
+        cache_key,
+        lambda: _run_search(query, normalized_query, user_id, params, threshold, metadata_filters, use_reranking),
+    )
+    search_cache.set(cache_key, [dict(chunk) for chunk in chunks])
+    return [dict(chunk) for chunk in chunks]
+
 
+async def _run_search(
+    query: str,
+    normalized_query: str,
+    user_id: str,
+    params: SearchParams,
+    threshold: float,
+    metadata_filters: dict | None,
+    use_reranking: bool,
+) -> list[dict]:
+    """Embed, run the hybrid search RPC and rerank (uncached)."""
     # Get embeddings for both original and normalized query to improve matching
     queries_to_embed = [normalized_query]
     if normalized_query != query:
         queries_to_embed.append(query)
 
-    logger.debug(f"Generating embeddings for {len(queries_to_embed)} query variant(s)")
+    logger.debug("Generating embeddings for %d query variant(s)", len(queries_to_embed))
     embeddings = await get_embeddings(queries_to_embed, user_id=user_id)
     query_embedding = embeddings[0]  # Use normalized query embedding
-    logger.debug(f"Embedding generated: {len(query_embedding)} dimensions")
+    logger.debug("Embedding generated: %d dimensions", len(query_embedding))
 
-    # Call hybrid search RPC (combines vector + keyword + RRF)
-    supabase = get_supabase_client()
-    rpc_params = {
-        "query_text": normalized_query,  # Use normalized query for text search
-        "query_embedding": query_embedding,  # Already indexed above
-        "match_threshold": threshold,
-        "match_count": 50,  # Retrieve more candidates
-        "final_count": 30,  # Return more from RRF
-        "p_user_id": user_id,
-        "metadata_filters": metadata_filters,
-        "rrf_k": 60  # RRF constant (standard value)
-    }
-
-    logger.debug(f"Hybrid search RPC: threshold={threshold}, match_count={rpc_params['match_count']}, final_count={rpc_params['final_count']}")
-    result = supabase.rpc("hybrid_search_chunks", rpc_params).execute()
-    chunks = result.data or []
-
-    logger.debug(f"Hybrid search returned {len(chunks)} chunks")
+    # Call hybrid search RPC (combines vector + keyword + RRF), narrow first if adaptive
+    if params.adaptive:
+        chunks = _hybrid_search_rpc(
+            query, normalized_query, query_embedding, user_id, threshold, metadata_filters,
+            params.initial_match_count, params.initial_final_count, params.rrf_k,
+        )
+        reason = widen_reason(chunks, params)
+        search_candidates.inc(outcome=f"widened_{reason}" if reason else "narrow")
+        if reason:
+            logger.debug("Widening candidate set (%s)", reason)
+            chunks = _hybrid_search_rpc(
+                query, normalized_query, query_embedding, user_id, threshold, metadata_filters,
+                params.match_count, params.final_count, params.rrf_k,
+            )
+    else:
+        search_candidates.inc(outcome="full")
+        chunks = _hybrid_search_rpc(
+            query, normalized_query, query_embedding, user_id, threshold, metadata_filters,
+            params.match_count, params.final_count, params.rrf_k,
+        )
 
     if not chunks:
         logger.debug("No chunks found for query")
         return []
 
     # Log chunk details in debug mode
-    for i, chunk in enumerate(chunks[:3], 1):  # Log first 3
-        logger.debug(f"Chunk {i}: vec_sim={chunk.get('vector_similarity', 0):.3f}, "
-                   f"kw_rank={chunk.get('keyword_rank', 0):.3f}, "
-                   f"rrf={chunk.get('rrf_score', 0):.4f}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, chunk in enumerate(chunks[:3], 1):  # Log first 3
+            logger.debug(
+                "Chunk %d: vec_sim=%.3f, kw_rank=%.3f, rrf=%.4f",
+                i, chunk.get('vector_similarity', 0), chunk.get('keyword_rank', 0), chunk.get('rrf_score', 0),
+            )
 
     # Apply reranking if enabled
     if use_reranking:
-        logger.debug(f"Applying reranking (top_n={top_k})")
-        chunks = await rerank_chunks(query, chunks, top_n=top_k)
-        logger.debug(f"Reranking complete: {len(chunks)} chunks")
+        logger.debug("Applying reranking (top_n=%d)", params.top_k)
+        chunks = await rerank_chunks(query, chunks, top_n=params.top_k)
+        logger.debug("Reranking complete: %d chunks", len(chunks))
         # Normalize: use rerank_score as similarity
         for chunk in chunks:
             chunk['similarity'] = chunk.get('rerank_score', chunk.get('rrf_score', 0))
     else:
-        logger.debug(f"Using top {top_k} RRF results without reranking")
-        chunks = chunks[:top_k]
+        logger.debug("Using top %d RRF results without reranking", params.top_k)
+        chunks = chunks[:params.top_k]
         # Normalize: use rrf_score as similarity
         for chunk in chunks:
             chunk['similarity'] = chunk.get('rrf_score', 0)
 
-    logger.debug(f"Search complete: returning {len(chunks)} chunks")
+    logger.debug("Search complete: returning %d chunks", len(chunks))
     return chunks
+
+
+def _hybrid_search_rpc(
+    query: str,
+    normalized_query: str,
+    query_embedding: list[float],
+    user_id: str,
+    threshold: float,
+    metadata_filters: dict | None,
+    match_count: int,
+    final_count: int,
+    rrf_k: int,
+) -> list[dict]:
+    """
+    One hybrid search RPC call; rows are in RRF order.
+
+    In-process replicas supply a leg whenever they are current and no
+    metadata filters apply: with KEYWORD_INDEX_ENABLED the keyword leg
+    (hybrid_search_chunks_with_keyword_candidates, BM25 over the raw query),
+    with VECTOR_INDEX_ENABLED the vector leg (passed to that function, or to
+    hybrid_search_chunks_with_candidates). Wherever the database scans the
+    vector leg itself, SEARCH_VECTOR_INDEX=halfvec/binary makes it a quantized
+    index pass re-scored against the full vectors (hybrid_search_chunks_quantized,
+    or the quantization parameter of the keyword-candidates function).
+    """
+    keyword_candidates = None
+    if _settings.keyword_index_enabled:
+        # Imported here: keyword_index tokenizes with normalize_query from this module
+        from app.services.keyword_index import keyword_index
+
+        if metadata_filters:
+            keyword_index_lookups.inc(outcome="filtered")
+        else:
+            with timed_stage("keyword_index"):
+                keyword_candidates = keyword_index.search(query, match_count)
+
+    vector_candidates = None
+    if _settings.vector_index_enabled:
+        if metadata_filters:
+            vector_index_lookups.inc(outcome="filtered")
+        else:
+            with timed_stage("vector_index"):
+                vector_candidates = vector_index.search(query_embedding, match_count, threshold)
+
+    if keyword_candidates is not None:
+        rpc_name = "hybrid_search_chunks_with_keyword_candidates"
+        rpc_params = {
+            "query_embedding": query_embedding,
+            "match_threshold": threshold,
+            "keyword_ids": [chunk_id for chunk_id, _ in keyword_candidates],
+            "keyword_scores": [score for _, score in keyword_candidates],
+            "match_count": match_count,
+            "final_count": final_count,
+            "metadata_filters": None,
+            "rrf_k": rrf_k,
+        }
+        if vector_candidates is not None:
+            rpc_params["candidate_ids"] = [chunk_id for chunk_id, _ in vector_candidates]
+            rpc_params["candidate_similarities"] = [similarity for _, similarity in vector_candidates]
+        elif _settings.search_vector_index != "exact":
+            rpc_params["quantization"] = _settings.search_vector_index
+            rpc_params["rescore_factor"] = _settings.search_rescore_factor
+    elif vector_candidates is not None:
+        rpc_name = "hybrid_search_chunks_with_candidates"
+        rpc_params = {
+            "query_text": normalized_query,
+            "candidate_ids": [chunk_id for chunk_id, _ in vector_candidates],
+            "candidate_similarities": [similarity for _, similarity in vector_candidates],
+            "match_count": match_count,
+            "final_count": final_count,
+            "metadata_filters": None,
+            "rrf_k": rrf_k,
+        }
+    else:
+        rpc_name = "hybrid_search_chunks"
+        rpc_params = {
+            "query_text": normalized_query,  # Use normalized query for text search
+            "query_embedding": query_embedding,
+            "match_threshold": threshold,
+            "match_count": match_count,  # Candidates per leg (vector, keyword)
+            "final_count": final_count,  # Fused results kept for reranking
+            "p_user_id": user_id,
+            "metadata_filters": metadata_filters,
+            "rrf_k": rrf_k,
+        }
+        if _settings.search_vector_index != "exact":
+            rpc_name = "hybrid_search_chunks_quantized"
+            rpc_params["quantization"] = _settings.search_vector_index
+            rpc_params["rescore_factor"] = _settings.search_rescore_factor
+
+    logger.debug(
+        "%s RPC: threshold=%s, match_count=%s, final_count=%s",
+        rpc_name, threshold, match_count, final_count,
+    )
+    with timed_stage("search_rpc"):
+        result = get_supabase_client().rpc(rpc_name, rpc_params).execute()
+    chunks = result.data or []
+
+    logger.debug("Hybrid search returned %d chunks", len(chunks))
+    return chunks
+
+
+MAX_QUOTE_CHUNKS = 30  # Upper bound on one verbatim span
+MIN_CHUNK_OVERLAP_CHARS = 20  # Shorter matches are treated as coincidence, not chunk overlap
+MAX_CHUNK_OVERLAP_CHARS = 2000  # Must exceed chunking_service's chunk_overlap
+
+
+def merge_chunk_texts(contents: list[str]) -> str:
+    """
+    Join consecutive chunks of one document, removing the overlap between them.
+
+    chunk_text() starts each chunk with the tail of the previous one, so the
+    longest suffix of the merged text that prefixes the next chunk is dropped.
+    """
+    merged = ""
+    for content in contents:
+        if not merged:
+            merged = content
+            continue
+
+        overlap = 0
+        for size in range(min(len(merged), len(content), MAX_CHUNK_OVERLAP_CHARS), MIN_CHUNK_OVERLAP_CHARS - 1, -1):
+            if merged.endswith(content[:size]):
+                overlap = size
+                break
+
+        if overlap:
+            merged += content[overlap:]
+        else:
+            merged += "\n\n" + content
+    return merged
+
+
+def fetch_chunk_span(document_id: str, start_chunk: int, end_chunk: int) -> dict:
+    """
+    Load the exact stored text of chunks start_chunk..end_chunk of a document.
+
+    Returns dict with keys: filename, start_chunk, end_chunk, text.
+    Raises ValueError if the span is invalid or no chunks exist in it.
+    """
+    from app.services.extraction_service import strip_search_annotations
+
+    if start_chunk < 0 or end_chunk < start_chunk:
+        raise ValueError(f"Invalid chunk range {start_chunk}-{end_chunk}")
+    if end_chunk - start_chunk + 1 > MAX_QUOTE_CHUNKS:
+        raise ValueError(f"Chunk range too large (max {MAX_QUOTE_CHUNKS} chunks)")
+
+    supabase = get_supabase_client()
+    result = supabase.table("chunks").select("chunk_index, content, metadata").eq(
+        "document_id", document_id
+    ).gte("chunk_index", start_chunk).lte("chunk_index", end_chunk).order("chunk_index").execute()
+
+    rows = result.data or []
+    if not rows:
+        raise ValueError(f"No chunks {start_chunk}-{end_chunk} found for document {document_id}")
+
+    return {
+        "filename": (rows[0].get("metadata") or {}).get("filename", "unknown"),
+        "start_chunk": rows[0]["chunk_index"],
+        "end_chunk": rows[-1]["chunk_index"],
+        "text": strip_search_annotations(merge_chunk_texts([row["content"] for row in rows])),
+    }
@@ -0,0 +1,255 @@
+"""Priority-aware admission control for upstream provider calls."""
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+from app.config import get_settings
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "upstream_priority", default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+def batch_priority(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Run an async function, and every upstream call it makes, at BATCH priority."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = _current_priority.set(Priority.BATCH)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            _current_priority.reset(token)
+    return wrapper
+
+
+class TokenBucket:
+    """
+    Requests-per-second limiter refilling continuously up to burst tokens.
+
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class UpstreamScheduler:
+    """
+    Admits calls to one upstream provider by priority, rate and concurrency.
+
+    Waiters are served strictly by priority (FIFO within a priority) whenever
+    a rate token and a concurrency slot are free. Batch work may hold at most
+    batch_max_concurrency slots, so long ingestion calls never occupy every
+    slot an arriving chat request could use. A max_concurrency of 0 means
+    unbounded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: float = 1.0,
+        max_concurrency: int = 0,
+        batch_max_concurrency: int = 0,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.batch_max_concurrency = batch_max_concurrency
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+        self._running = {priority: 0 for priority in Priority}
+        self._stats = {
+            priority: {"admitted": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+            for priority in Priority
+        }
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority | None = None) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block."""
+        priority = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def run(self, fn: Callable[[], Awaitable[T]], priority: Priority | None = None) -> T:
+        """Await fn() once admitted."""
+        async with self.slot(priority):
+            return await fn()
+
+    async def acquire(self, priority: Priority | None = None) -> Priority:
+        """Wait for admission. Returns the priority to pass to release()."""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+
+        if not self._waiters and self._can_admit(priority):
+            self._admit(priority, started)
+            return priority
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled: give the slot back
+                self.release(priority)
+            raise
+        self._record_wait(priority, started)
+        return priority
+
+    def try_acquire(self, priority: Priority | None = None) -> Priority | None:
+        """Take a slot only if one is free right now, without queueing. Returns None otherwise."""
+        priority = current_priority() if priority is None else priority
+        if self._waiters or not self._can_admit(priority):
+            return None
+        self._admit(priority, time.monotonic())
+        return priority
+
+    def release(self, priority: Priority) -> None:
+        self._running[priority] -= 1
+        self._dispatch()
+
+    def _can_admit(self, priority: Priority) -> bool:
+        running = sum(self._running.values())
+        if self.max_concurrency and running >= self.max_concurrency:
+            return False
+        if (priority == Priority.BATCH and self.batch_max_concurrency
+                and self._running[Priority.BATCH] >= self.batch_max_concurrency):
+            return False
+        return self.bucket.try_take()
+
+    def _admit(self, priority: Priority, started: float) -> None:
+        self._running[priority] += 1
+        self._record_wait(priority, started)
+
+    def _record_wait(self, priority: Priority, started: float) -> None:
+        waited = time.monotonic() - started
+        stats = self._stats[priority]
+        stats["admitted"] += 1
+        stats["wait_seconds_total"] += waited
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+
+    def _dispatch(self) -> None:
+        """Admit queued waiters in priority order while capacity allows."""
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)  # Cancelled while waiting
+                continue
+            if not self._can_admit(priority):
+                break
+            heapq.heappop(self._waiters)
+            self._running[priority] += 1
+            future.set_result(None)
+
+        # Out of rate tokens: retry when the next one is due. Slot releases
+        # trigger dispatch on their own.
+        if self._waiters and not self._wakeup:
+            delay = self.bucket.seconds_until_available()
+            if delay > 0:
+                loop = asyncio.get_running_loop()
+                self._wakeup = loop.call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth, running calls and wait times per priority."""
+        queued = {priority: 0 for priority in Priority}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                queued[priority] += 1
+
+        by_priority = {}
+        for priority in Priority:
+            stats = self._stats[priority]
+            admitted = stats["admitted"]
+            by_priority[priority.name.lower()] = {
+                "queued": queued[priority],
+                "running": self._running[priority],
+                "admitted": admitted,
+                "avg_wait_ms": round(stats["wait_seconds_total"] / admitted * 1000, 2) if admitted else 0.0,
+                "max_wait_ms": round(stats["wait_seconds_max"] * 1000, 2),
+            }
+        return {
+            "name": self.name,
+            "rate_per_second": self.bucket.rate,
+            "max_concurrency": self.max_concurrency,
+            "batch_max_concurrency": self.batch_max_concurrency,
+            **by_priority,
+        }
+
+
+_settings = get_settings()
+embedding_scheduler = UpstreamScheduler(
+    "embeddings",
+    rate=_settings.embedding_requests_per_second,
+    burst=_settings.embedding_requests_burst,
+    max_concurrency=_settings.embedding_max_concurrency,
+    batch_max_concurrency=_settings.embedding_batch_max_concurrency,
+)
+llm_scheduler = UpstreamScheduler(
+    "llm",
+    rate=_settings.llm_requests_per_second,
+    burst=_settings.llm_requests_burst,
+    max_concurrency=_settings.llm_max_concurrency,
+    batch_max_concurrency=_settings.llm_batch_max_concurrency,
+)
+reranker_scheduler = UpstreamScheduler(
+    "reranker",
+    rate=_settings.rerank_requests_per_second,
+    burst=_settings.rerank_requests_burst,
+    max_concurrency=_settings.rerank_max_concurrency,
+)
+
+
+def get_scheduler_stats() -> list[dict[str, Any]]:
+    return [s.stats() for s in (embedding_scheduler, llm_scheduler, reranker_scheduler)]
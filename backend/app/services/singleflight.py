@@ -0,0 +1,64 @@
+"""Single-flight coalescing of identical concurrent async calls."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Share one in-flight computation between concurrent callers with the same key.
+
+    The first caller for a key starts the work as a separate task; callers that
+    arrive while it is running await the same task instead of starting their
+    own. Exceptions are propagated to every waiter. A waiter being cancelled
+    only detaches that waiter; the shared task is cancelled once no waiters
+    remain, so one disconnecting client never fails the others.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._calls: dict[Hashable, tuple[asyncio.Task, list[int]]] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the call already in flight for key."""
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = (task, [0])
+            self._calls[key] = call
+            self.executions += 1
+            task.add_done_callback(lambda _t, k=key, c=call: self._forget(k, c))
+        else:
+            self.coalesced += 1
+            logger.debug("%s: coalesced request onto in-flight call", self.name)
+
+        task, waiters = call
+        waiters[0] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and waiters[0] == 1:
+                # Last waiter gone - nobody needs the result any more.
+                # Forget it first so new callers start a fresh call.
+                self._forget(key, call)
+                task.cancel()
+            raise
+        finally:
+            waiters[0] -= 1
+
+    def _forget(self, key: Hashable, call: tuple) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, Any]:
+        """Return execution and coalescing counters for monitoring."""
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,97 @@
+"""
+On-disk snapshot directories shared by the API workers of one host.
+
+Used by vector_index and keyword_index. A snapshot root holds one directory
+per snapshot, a CURRENT file naming the live one and a LOCK file. Writers
+hold an exclusive lock on LOCK while they write and publish, so two workers
+never write at once and a worker can check, under the lock, whether another
+one has just published a snapshot it should load instead.
+
+Superseded directories are removed only once they have been superseded for
+SNAPSHOT_GRACE_SECONDS, so a worker that read CURRENT just before it moved
+can still load the directory it names.
+"""
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev machines run a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CURRENT_POINTER = "CURRENT"
+LOCK_FILE = "LOCK"
+SUPERSEDED_MARKER = "SUPERSEDED"
+SNAPSHOT_GRACE_SECONDS = 600
+
+
+def current_snapshot(root: Path) -> str | None:
+    """Name of the snapshot CURRENT points to, or None."""
+    try:
+        return (root / CURRENT_POINTER).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def snapshot_lock(root: Path) -> Iterator[None]:
+    """Hold the exclusive writer lock of a snapshot root (blocking)."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / LOCK_FILE, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def new_snapshot_directory(root: Path) -> Path:
+    """Create an empty, uniquely named snapshot directory."""
+    name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    directory = root / name
+    directory.mkdir(parents=True)
+    return directory
+
+
+def publish_snapshot(root: Path, directory: Path) -> None:
+    """
+    Point CURRENT at a fully written snapshot directory, then clean up.
+
+    Call with snapshot_lock() held.
+    """
+    temporary = root / f"{CURRENT_POINTER}.{os.getpid()}"
+    temporary.write_text(directory.name)
+    os.replace(temporary, root / CURRENT_POINTER)
+    remove_superseded(root, directory.name)
+
+
+def remove_superseded(root: Path, current: str) -> None:
+    """
+    Mark snapshot directories other than current as superseded, and delete
+    those marked for longer than SNAPSHOT_GRACE_SECONDS.
+
+    Call with snapshot_lock() held, so no directory being written is touched.
+    """
+    now = time.time()
+    for directory in root.iterdir():
+        if not directory.is_dir() or directory.name == current:
+            continue
+        marker = directory / SUPERSEDED_MARKER
+        try:
+            superseded_at = marker.stat().st_mtime
+        except FileNotFoundError:
+            marker.touch()
+            continue
+        if now - superseded_at >= SNAPSHOT_GRACE_SECONDS:
+            logger.debug(f"Removing superseded snapshot {directory}")
+            shutil.rmtree(directory, ignore_errors=True)
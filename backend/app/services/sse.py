@@ -0,0 +1,130 @@
+"""Server-Sent Events framing with coalesced text_delta flushing."""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable
+
+try:
+    import orjson
+
+    def dumps(data: Any) -> str:
+        """Serialize to a JSON string using orjson."""
+        return orjson.dumps(data).decode()
+except ImportError:  # pragma: no cover - orjson is optional
+    def dumps(data: Any) -> str:
+        """Serialize to a JSON string using the stdlib encoder."""
+        return json.dumps(data)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a single SSE frame."""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+class DeltaCoalescer:
+    """
+    Buffer text deltas and emit them as fewer, larger text_delta frames.
+
+    A frame is flushed once flush_interval_ms has passed since the last flush
+    or once flush_bytes of UTF-8 text is buffered, whichever comes first.
+    Setting both to 0 emits one frame per delta (the previous behaviour).
+    Callers must call flush() before emitting any other event and at the end
+    of the stream so no text is held back or reordered; paced_events() also
+    flushes when the interval runs out while the upstream is silent.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = 50,
+        flush_bytes: int = 2048,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_bytes = flush_bytes
+        self._clock = clock
+        self._parts: list[str] = []
+        self._size = 0
+        self._last_flush = clock()
+        self.deltas = 0
+        self.frames = 0
+        self.bytes_sent = 0
+
+    def add(self, text: str) -> str | None:
+        """Buffer a delta. Returns a frame to send if the flush policy says so."""
+        self.deltas += 1
+        self._parts.append(text)
+        self._size += len(text.encode())
+
+        if self._size >= self.flush_bytes or self._clock() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def time_until_flush(self) -> float | None:
+        """Seconds until buffered text is due, or None if nothing is buffered."""
+        if not self._parts:
+            return None
+        return max(0.0, self.flush_interval - (self._clock() - self._last_flush))
+
+    def flush(self) -> str | None:
+        """Return a frame with all buffered text, or None if nothing is buffered."""
+        self._last_flush = self._clock()
+        if not self._parts:
+            return None
+        content = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        frame = format_sse("text_delta", {"content": content})
+        self.frames += 1
+        self.bytes_sent += len(frame)
+        return frame
+
+    def stats(self) -> dict[str, int]:
+        """Return delta/frame counters for this stream."""
+        return {"deltas": self.deltas, "frames": self.frames, "bytes": self.bytes_sent}
+
+
+async def _next_event(events: AsyncIterator[dict]) -> dict:
+    return await events.__anext__()
+
+
+async def paced_events(events: AsyncIterator[dict], coalescer: DeltaCoalescer) -> AsyncIterator[dict]:
+    """
+    Relay events, flushing the coalescer when its interval passes between them.
+
+    While text is buffered, the next event is awaited with the remaining
+    interval as timeout; if it has not arrived by then, a
+    {"type": "sse_flush", "frame": ...} event carries the buffered text, so
+    a stall upstream never holds text back for longer than the interval.
+    """
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            timeout = coalescer.time_until_flush()
+            if pending is None:
+                if timeout is None:
+                    try:
+                        event = await events.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    yield event
+                    continue
+                pending = asyncio.ensure_future(_next_event(events))
+
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                frame = coalescer.flush()
+                if frame:
+                    yield {"type": "sse_flush", "frame": frame}
+                continue
+
+            task, pending = pending, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
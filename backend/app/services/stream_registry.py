@@ -0,0 +1,246 @@
+"""Server-side buffering of chat SSE streams so dropped clients can resume."""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator
+
+from app.config import get_settings
+from app.services.sse import format_sse
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeUnavailable(Exception):
+    """The requested position is no longer buffered (stream pruned or trimmed)."""
+
+
+class StreamBuffer:
+    """
+    Frames of one chat response, numbered with sequential SSE event ids.
+
+    Event ids have the form "<stream_id>:<seq>" so a Last-Event-ID header
+    identifies both the stream and the position in it. The oldest frames are
+    dropped once max_bytes is exceeded.
+    """
+
+    def __init__(self, thread_id: str, user_id: str, max_bytes: int, disconnect_grace_seconds: float):
+        self.stream_id = uuid.uuid4().hex
+        self.thread_id = thread_id
+        self.user_id = user_id
+        self.max_bytes = max_bytes
+        self.disconnect_grace_seconds = disconnect_grace_seconds
+        self.subscribers = 0
+        self._cancel_handle: asyncio.TimerHandle | None = None
+        self.created_at = time.monotonic()
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self._frames: list[tuple[int, str]] = []
+        self._size = 0
+        self._next_seq = 1
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def append(self, frame: str) -> None:
+        """Number a frame and wake subscribers."""
+        seq = self._next_seq
+        self._next_seq += 1
+        numbered = f"id: {self.stream_id}:{seq}\n{frame}"
+        self._frames.append((seq, numbered))
+        self._size += len(numbered)
+        while self._size > self.max_bytes and len(self._frames) > 1:
+            _, dropped = self._frames.pop(0)
+            self._size -= len(dropped)
+        self._notify()
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncIterator[str]:
+        """
+        Yield buffered frames after after_seq, then live frames until the stream ends.
+
+        While at least one client is subscribed the generation keeps running.
+        When the last one disconnects, the generation is cancelled unless a
+        client resumes within disconnect_grace_seconds.
+        """
+        self._attach()
+        try:
+            cursor = after_seq
+            while True:
+                if self._frames and cursor + 1 < self._frames[0][0]:
+                    raise ResumeUnavailable(f"Frames after {cursor} were trimmed from stream {self.stream_id}")
+
+                changed = self._changed
+                pending = [(seq, frame) for seq, frame in self._frames if seq > cursor]
+                for seq, frame in pending:
+                    cursor = seq
+                    yield frame
+
+                if self.done and cursor >= self._next_seq - 1:
+                    return
+                await changed.wait()
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self.subscribers += 1
+        if self._cancel_handle:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+
+    def _detach(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers > 0 or self.done:
+            return
+        if self.disconnect_grace_seconds <= 0:
+            self._cancel_if_abandoned()
+        else:
+            loop = asyncio.get_running_loop()
+            self._cancel_handle = loop.call_later(self.disconnect_grace_seconds, self._cancel_if_abandoned)
+
+    def _cancel_if_abandoned(self) -> None:
+        self._cancel_handle = None
+        if self.subscribers == 0 and not self.done and self.task:
+            logger.info(f"Client disconnected from stream {self.stream_id}, cancelling generation")
+            self.task.cancel()
+
+
+class StreamRegistry:
+    """
+    Tracks in-flight and recently finished chat streams.
+
+    Each response is produced by a background task writing into a
+    StreamBuffer, independent of the HTTP connection, so a client that drops
+    mid-answer can reconnect with Last-Event-ID and replay what it missed.
+    Finished buffers are kept for retention_seconds, and at most max_streams
+    buffers are retained. A generation nobody is listening to is cancelled
+    after disconnect_grace_seconds, which also stops the upstream LLM call.
+    """
+
+    def __init__(
+        self,
+        retention_seconds: float,
+        max_streams: int,
+        max_bytes_per_stream: int,
+        disconnect_grace_seconds: float = 0.0,
+    ):
+        self.retention_seconds = retention_seconds
+        self.max_streams = max_streams
+        self.max_bytes_per_stream = max_bytes_per_stream
+        self.disconnect_grace_seconds = disconnect_grace_seconds
+        self._streams: dict[str, StreamBuffer] = {}
+        self._latest_by_thread: dict[str, str] = {}
+
+    def start(self, thread_id: str, user_id: str, frames: AsyncGenerator[str, None]) -> StreamBuffer:
+        """Run a frame generator in the background, buffering its output."""
+        self.prune()
+        buffer = StreamBuffer(thread_id, user_id, self.max_bytes_per_stream, self.disconnect_grace_seconds)
+        self._streams[buffer.stream_id] = buffer
+        self._latest_by_thread[thread_id] = buffer.stream_id
+
+        buffer.append(format_sse("stream", {"stream_id": buffer.stream_id}))
+        buffer.task = asyncio.create_task(self._produce(buffer, frames))
+        return buffer
+
+    async def _produce(self, buffer: StreamBuffer, frames: AsyncGenerator[str, None]) -> None:
+        try:
+            async for frame in frames:
+                buffer.append(frame)
+        except asyncio.CancelledError:
+            await frames.aclose()
+            buffer.append(format_sse("error", {"error": "Generation cancelled: client disconnected"}))
+            raise
+        except Exception as e:
+            logger.error(f"Stream {buffer.stream_id} failed: {e}")
+            buffer.append(format_sse("error", {"error": str(e)}))
+        finally:
+            buffer.finish()
+
+    def resolve(self, thread_id: str, user_id: str, last_event_id: str | None) -> tuple[StreamBuffer, int]:
+        """
+        Find the buffer to resume and the sequence number to resume after.
+
+        Without a Last-Event-ID the thread's latest stream is replayed from the start.
+        Raises ResumeUnavailable if there is nothing to resume.
+        """
+        stream_id, after_seq = None, 0
+        if last_event_id:
+            stream_id, _, seq = last_event_id.partition(":")
+            after_seq = int(seq) if seq.isdigit() else 0
+        else:
+            stream_id = self._latest_by_thread.get(thread_id)
+
+        buffer = self._streams.get(stream_id or "")
+        if not buffer or buffer.thread_id != thread_id or buffer.user_id != user_id:
+            raise ResumeUnavailable("No resumable stream for this thread")
+        return buffer, after_seq
+
+    def prune(self) -> None:
+        """Drop expired finished buffers, then the oldest finished ones over max_streams."""
+        now = time.monotonic()
+        for stream_id, buffer in list(self._streams.items()):
+            if buffer.done and now - buffer.finished_at > self.retention_seconds:
+                self._remove(stream_id)
+
+        if len(self._streams) >= self.max_streams:
+            finished = sorted(
+                (b for b in self._streams.values() if b.done),
+                key=lambda b: b.finished_at,
+            )
+            for buffer in finished[:len(self._streams) - self.max_streams + 1]:
+                self._remove(buffer.stream_id)
+
+    def _remove(self, stream_id: str) -> None:
+        buffer = self._streams.pop(stream_id, None)
+        if buffer and self._latest_by_thread.get(buffer.thread_id) == stream_id:
+            del self._latest_by_thread[buffer.thread_id]
+
+    def stats(self) -> dict[str, Any]:
+        """Return buffer counts and generation outcomes for monitoring."""
+        active = sum(1 for b in self._streams.values() if not b.done)
+        return {"active": active, "buffered": len(self._streams), **generation_stats}
+
+
+# Completion tokens are approximated by streamed deltas when the provider
+# sends no usage. "Saved" is the average completed generation length minus
+# what had already been generated, so it is an estimate.
+generation_stats: dict[str, int] = {
+    "completed": 0,
+    "completed_tokens": 0,
+    "cancelled": 0,
+    "cancelled_tokens_generated": 0,
+    "estimated_tokens_saved": 0,
+}
+
+
+def record_generation_completed(completion_tokens: int) -> None:
+    """Count a generation that ran to completion."""
+    generation_stats["completed"] += 1
+    generation_stats["completed_tokens"] += completion_tokens
+
+
+def record_generation_cancelled(completion_tokens: int) -> None:
+    """Count a generation cancelled after a client disconnect, estimating tokens saved."""
+    generation_stats["cancelled"] += 1
+    generation_stats["cancelled_tokens_generated"] += completion_tokens
+    if generation_stats["completed"]:
+        average = generation_stats["completed_tokens"] / generation_stats["completed"]
+        generation_stats["estimated_tokens_saved"] += max(0, round(average - completion_tokens))
+
+
+_settings = get_settings()
+stream_registry = StreamRegistry(
+    retention_seconds=_settings.stream_buffer_retention_seconds,
+    max_streams=_settings.stream_buffer_max_streams,
+    max_bytes_per_stream=_settings.stream_buffer_max_bytes,
+    disconnect_grace_seconds=_settings.stream_disconnect_grace_seconds,
+)
@@ -1,7 +1,11 @@
 """Tool execution dispatcher."""
 import json
 import logging
-from app.services.retrieval_service import search_documents
+import uuid
+
+from postgrest.exceptions import APIError
+
+from app.services.retrieval_service import search_documents, fetch_chunk_span
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +28,7 @@ async def execute_tool_call(tool_call: dict, user_id: str) -> str:
         query = arguments.get("query", "")
         metadata_filters = arguments.get("metadata_filters")
 
-        logger.debug(f"Tool: search_documents, query: '{query}', user: {user_id[:8]}")
+        logger.debug("Tool: search_documents, query: '%s', user: %s", query, user_id[:8])
 
         results = await search_documents(query, user_id, metadata_filters=metadata_filters)
 
@@ -32,20 +36,71 @@ async def execute_tool_call(tool_call: dict, user_id: str) -> str:
             logger.debug("Tool: no results found")
             return "No relevant documents found."
 
-        logger.debug(f"Tool: found {len(results)} results")
+        logger.debug("Tool: found %d results", len(results))
 
         # Format results for LLM context
         formatted = []
         for i, r in enumerate(results, 1):
-            logger.debug(f"Result {i}: similarity={r['similarity']:.3f}, length={len(r['content'])} chars")
+            logger.debug("Result %d: similarity=%.3f, length=%d chars", i, r['similarity'], len(r['content']))
+            similarity = "not reranked" if r.get("rerank_withheld") else f"{r['similarity']:.2f}"
             formatted.append(
                 f"[Source: {r.get('metadata', {}).get('filename', 'unknown')}] "
-                f"(similarity: {r['similarity']:.2f})\n{r['content']}"
+                f"(document_id: {r.get('document_id')}, chunk: {r.get('chunk_index')}, "
+                f"similarity: {similarity})\n{r['content']}"
             )
 
         formatted_text = "\n\n---\n\n".join(formatted)
-        logger.debug(f"Tool: returning {len(formatted_text)} characters to LLM")
+        logger.debug("Tool: returning %d characters to LLM", len(formatted_text))
         return formatted_text
 
     logger.warning(f"Unknown tool: {name}")
     return f"Error: Unknown tool '{name}'"
+
+
+def _trim_span(text: str, start_text: str | None, stop_before: str | None) -> str:
+    """Cut a quoted span to start at start_text and end before stop_before, when found."""
+    if start_text:
+        start = text.find(start_text)
+        if start != -1:
+            text = text[start:]
+    if stop_before:
+        # Skip position 0 so a heading equal to start_text cannot empty the span
+        stop = text.find(stop_before, 1)
+        if stop != -1:
+            text = text[:stop]
+    return text.strip()
+
+
+def execute_quote_call(tool_call: dict) -> tuple[str, str]:
+    """
+    Execute a quote_document_span tool call.
+
+    Returns:
+        Tuple of (verbatim text to stream to the user, short result for the LLM).
+        The verbatim text is empty if the span could not be delivered.
+    """
+    try:
+        arguments = json.loads(tool_call["arguments"])
+        # Reject malformed ids here; Postgres would fail the query on them
+        document_id = str(uuid.UUID(str(arguments["document_id"])))
+        span = fetch_chunk_span(
+            document_id,
+            int(arguments["start_chunk"]),
+            int(arguments["end_chunk"]),
+        )
+    except (ValueError, KeyError, TypeError, APIError) as e:
+        logger.warning(f"Quote tool failed: {e}")
+        return "", f"Error: could not deliver span ({e}). Check document_id and chunk numbers from search results."
+
+    text = _trim_span(span["text"], arguments.get("start_text"), arguments.get("stop_before"))
+    logger.debug(
+        "Tool: quote_document_span, %s chunks %s-%s, %d chars",
+        span['filename'], span['start_chunk'], span['end_chunk'], len(text),
+    )
+
+    result = (
+        f"Delivered {len(text)} characters verbatim to the user from {span['filename']} "
+        f"(chunks {span['start_chunk']}-{span['end_chunk']}). "
+        f"Text begins: \"{text[:80]}\" and ends: \"{text[-80:]}\". Do not repeat it."
+    )
+    return text, result
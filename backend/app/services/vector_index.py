@@ -0,0 +1,434 @@
+"""
+In-process replica of chunk embeddings for the vector leg of hybrid search.
+
+The index is an IVF (inverted file) layout: vectors are clustered with
+spherical k-means and stored contiguously per cluster as float16, so a query
+scores the nearest vector_index_nprobe clusters instead of every row.
+Snapshots live on disk (vector_index_path) and are memory-mapped, so every
+API worker on a host shares one copy through the page cache and a restart
+only has to fetch what changed since the snapshot was written.
+
+Sync is driven by the corpus generation: when it moves, a background thread
+fetches the per-document chunk stamps changed since its last sync
+(corpus_state.fetch_stamp_changes), hides rows of changed or deleted
+documents and fetches the chunks of new or changed ones into an in-memory
+delta. Once the delta or the hidden rows grow
+past vector_index_compact_rows the replica writes a fresh snapshot. Workers
+write under the snapshot lock and load a snapshot another worker has just
+published instead of writing their own (see app.services.snapshots).
+
+search() returns None while the replica is not loaded or lags the corpus
+generation; retrieval_service then uses the hybrid_search_chunks RPC as
+before.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from app.config import get_settings
+from app.db.supabase import get_supabase_client
+from app.services.corpus_state import fetch_stamp_changes, get_corpus_generation
+from app.services.metrics import vector_index_lookups
+from app.services.snapshots import current_snapshot, new_snapshot_directory, publish_snapshot, snapshot_lock
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+FETCH_DOCUMENTS_PER_REQUEST = 20
+FETCH_PAGE_SIZE = 1000
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_ROWS = 50_000
+ASSIGN_BATCH_ROWS = 65_536
+MAX_LISTS = 4096
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _parse_embedding(value) -> list[float]:
+    # PostgREST returns pgvector values in their text form, "[0.1,0.2,...]"
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _spherical_kmeans(vectors, lists: int, seed: int = 0):
+    """Centroids of `lists` clusters of unit vectors (cosine k-means on a sample)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE_ROWS:
+        sample = vectors[np.sort(rng.choice(len(vectors), KMEANS_SAMPLE_ROWS, replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters with random sample rows
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _assign(vectors, centroids):
+    import numpy as np
+
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BATCH_ROWS):
+        batch = np.asarray(vectors[start:start + ASSIGN_BATCH_ROWS], dtype=np.float32)
+        assignment[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return assignment
+
+
+@dataclass
+class IndexState:
+    """
+    One immutable view of the replica; sync builds a new one and swaps it in.
+
+    Snapshot rows (memory-mapped, grouped by cluster via offsets) and delta
+    rows (in memory, scanned exhaustively) each carry chunk and document ids
+    as 16-byte UUIDs; rows of changed or deleted documents are masked out
+    rather than removed until the next snapshot.
+    """
+    vectors: Any
+    ids: Any
+    documents: Any
+    centroids: Any
+    offsets: Any
+    alive: Any
+    delta_vectors: Any
+    delta_ids: Any
+    delta_documents: Any
+    stamps: dict[str, list] = field(default_factory=dict)
+    # Database generation the stamps are current to (None: never synced)
+    stamps_generation: int | None = None
+    directory: Path | None = None
+
+    @property
+    def hidden_rows(self) -> int:
+        return int(len(self.alive) - self.alive.sum())
+
+    @property
+    def rows(self) -> int:
+        return int(self.alive.sum()) + len(self.delta_ids)
+
+
+class VectorIndex:
+    """Process-wide vector index replica (see module docstring)."""
+
+    def __init__(self):
+        # (state, corpus generation it is current for), swapped in as one
+        # reference so a search never pairs a state with another generation
+        self._current: tuple[IndexState, int] | None = None
+        self._sync_lock = threading.Lock()
+        self._sync_thread: threading.Thread | None = None
+        self.last_sync_at: str | None = None
+        self.last_sync_ms: float | None = None
+        self.last_error: str | None = None
+        self.snapshots_written = 0
+
+    @property
+    def path(self) -> Path:
+        return BACKEND_DIR / get_settings().vector_index_path
+
+    def start(self) -> None:
+        """Load the snapshot and sync in the background (idempotent)."""
+        self.request_sync()
+
+    def request_sync(self) -> None:
+        """Start a background sync unless one is already running."""
+        with self._sync_lock:
+            if self._sync_thread and self._sync_thread.is_alive():
+                return
+            self._sync_thread = threading.Thread(target=self._sync_safely, name="vector-index-sync", daemon=True)
+            self._sync_thread.start()
+
+    def search(self, embedding: list[float], match_count: int, threshold: float) -> list[tuple[str, float]] | None:
+        """
+        Nearest chunks as (chunk id, cosine similarity), best first.
+
+        Returns None if the replica is not loaded or behind the current
+        corpus generation (a sync is requested); callers fall back to the
+        database.
+        """
+        current = self._current
+        if current is None:
+            vector_index_lookups.inc(outcome="not_loaded")
+            self.request_sync()
+            return None
+        state, generation = current
+        if generation != get_corpus_generation():
+            vector_index_lookups.inc(outcome="stale")
+            self.request_sync()
+            return None
+
+        import numpy as np
+
+        query = _normalize(np.asarray([embedding], dtype=np.float32))[0]
+        scores: list = []
+        rows: list = []
+
+        if len(state.ids):
+            nprobe = min(get_settings().vector_index_nprobe, len(state.centroids))
+            lists = np.argpartition(-(state.centroids @ query), nprobe - 1)[:nprobe]
+            for cluster in lists:
+                start, stop = int(state.offsets[cluster]), int(state.offsets[cluster + 1])
+                if start == stop:
+                    continue
+                cluster_scores = np.asarray(state.vectors[start:stop], dtype=np.float32) @ query
+                cluster_scores[~state.alive[start:stop]] = -np.inf
+                scores.append(cluster_scores)
+                rows.append(np.arange(start, stop))
+        if len(state.delta_ids):
+            scores.append(state.delta_vectors @ query)
+            rows.append(np.arange(len(state.delta_ids)) + len(state.ids))
+        if not scores:
+            vector_index_lookups.inc(outcome="hit")
+            return []
+
+        scores = np.concatenate(scores)
+        rows = np.concatenate(rows)
+        keep = min(match_count, len(scores))
+        best = np.argpartition(-scores, keep - 1)[:keep]
+        best = best[np.argsort(-scores[best])]
+
+        results = []
+        for position in best:
+            score = float(scores[position])
+            if score <= threshold:
+                break
+            row = int(rows[position])
+            raw_id = state.ids[row] if row < len(state.ids) else state.delta_ids[row - len(state.ids)]
+            results.append((str(uuid.UUID(bytes=bytes(raw_id))), score))
+        vector_index_lookups.inc(outcome="hit")
+        return results
+
+    def stats(self) -> dict[str, Any]:
+        state, generation = self._current or (None, None)
+        return {
+            "name": "vector_index",
+            "loaded": state is not None,
+            "generation": generation,
+            "rows": state.rows if state else 0,
+            "snapshot_rows": len(state.ids) if state else 0,
+            "delta_rows": len(state.delta_ids) if state else 0,
+            "hidden_rows": state.hidden_rows if state else 0,
+            "lists": len(state.centroids) if state else 0,
+            "snapshot": state.directory.name if state and state.directory else None,
+            "snapshots_written": self.snapshots_written,
+            "last_sync_at": self.last_sync_at,
+            "last_sync_ms": self.last_sync_ms,
+            "last_error": self.last_error,
+        }
+
+    def _sync_safely(self) -> None:
+        try:
+            self.sync()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Vector index sync failed: {e}")
+
+    def sync(self) -> None:
+        """Bring the replica up to the current corpus generation (blocking)."""
+        started = time.perf_counter()
+        # Read first: changes made while syncing move it again and trigger another sync
+        generation = get_corpus_generation()
+        state = self._current[0] if self._current else None
+        if state is None or self._published_elsewhere(state):
+            state = self._load_snapshot() or state or self._empty_state()
+
+        state, changed, removed = self._apply_stamps(state)
+
+        if self._needs_snapshot(state, changed, removed):
+            with snapshot_lock(self.path):
+                # Another worker may have written one while we fetched: use it
+                if self._published_elsewhere(state):
+                    loaded = self._load_snapshot()
+                    if loaded is not None:
+                        state, changed, removed = self._apply_stamps(loaded)
+                if self._needs_snapshot(state, changed, removed):
+                    state = self._write_snapshot(state)
+
+        self._current = (state, generation)
+        self.last_sync_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.last_sync_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            "Vector index synced to generation %s: %d rows (%d changed, %d removed documents) in %.0f ms",
+            generation, state.rows, len(changed), len(removed), self.last_sync_ms,
+        )
+
+    def _published_elsewhere(self, state: IndexState) -> bool:
+        """Whether CURRENT names a snapshot other than the one state is built on."""
+        published = current_snapshot(self.path)
+        return published is not None and (state.directory is None or published != state.directory.name)
+
+    def _needs_snapshot(self, state: IndexState, changed: list[str], removed: list[str]) -> bool:
+        if not changed and not removed:
+            return False
+        # Also snapshot the first load, so a restart only fetches what changed since
+        compact_rows = get_settings().vector_index_compact_rows
+        return state.directory is None or len(state.delta_ids) + state.hidden_rows >= compact_rows
+
+    def _apply_stamps(self, state: IndexState) -> tuple[IndexState, list[str], list[str]]:
+        """Hide rows of documents changed since state's stamps and fetch changed ones into the delta."""
+        import numpy as np
+
+        changed, removed, stamps, stamps_generation = fetch_stamp_changes(state.stamps, state.stamps_generation)
+        if not changed and not removed:
+            return replace(state, stamps=stamps, stamps_generation=stamps_generation), changed, removed
+
+        stale = np.array([uuid.UUID(document_id).bytes for document_id in changed + removed], dtype="S16")
+        alive = state.alive & ~np.isin(state.documents, stale)
+        keep = ~np.isin(state.delta_documents, stale)
+        vectors, ids, documents = self._fetch_chunks(changed)
+        state = IndexState(
+            vectors=state.vectors,
+            ids=state.ids,
+            documents=state.documents,
+            centroids=state.centroids,
+            offsets=state.offsets,
+            alive=alive,
+            delta_vectors=np.concatenate([state.delta_vectors[keep], vectors]),
+            delta_ids=np.concatenate([state.delta_ids[keep], ids]),
+            delta_documents=np.concatenate([state.delta_documents[keep], documents]),
+            stamps=stamps,
+            stamps_generation=stamps_generation,
+            directory=state.directory,
+        )
+        return state, changed, removed
+
+    def _fetch_chunks(self, document_ids: list[str]):
+        """Embeddings of all chunks of the given documents, as unit float32 rows."""
+        import numpy as np
+
+        supabase = get_supabase_client()
+        embeddings, ids, documents = [], [], []
+        for start in range(0, len(document_ids), FETCH_DOCUMENTS_PER_REQUEST):
+            batch = document_ids[start:start + FETCH_DOCUMENTS_PER_REQUEST]
+            offset = 0
+            while True:
+                rows = supabase.table("chunks").select("id, document_id, embedding").in_(
+                    "document_id", batch
+                ).order("id").range(offset, offset + FETCH_PAGE_SIZE - 1).execute().data or []
+                for row in rows:
+                    if row.get("embedding") is None:
+                        continue
+                    embeddings.append(_parse_embedding(row["embedding"]))
+                    ids.append(uuid.UUID(row["id"]).bytes)
+                    documents.append(uuid.UUID(row["document_id"]).bytes)
+                if len(rows) < FETCH_PAGE_SIZE:
+                    break
+                offset += FETCH_PAGE_SIZE
+
+        dimensions = get_settings().vector_index_dimensions
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, dimensions)
+        return _normalize(vectors), np.array(ids, dtype="S16"), np.array(documents, dtype="S16")
+
+    def _empty_state(self) -> IndexState:
+        import numpy as np
+
+        dimensions = get_settings().vector_index_dimensions
+        return IndexState(
+            vectors=np.zeros((0, dimensions), dtype=np.float16),
+            ids=np.zeros(0, dtype="S16"),
+            documents=np.zeros(0, dtype="S16"),
+            centroids=np.zeros((0, dimensions), dtype=np.float32),
+            offsets=np.zeros(1, dtype=np.int64),
+            alive=np.zeros(0, dtype=bool),
+            delta_vectors=np.zeros((0, dimensions), dtype=np.float32),
+            delta_ids=np.zeros(0, dtype="S16"),
+            delta_documents=np.zeros(0, dtype="S16"),
+        )
+
+    def _load_snapshot(self) -> IndexState | None:
+        """Memory-map the snapshot CURRENT points to, if there is one."""
+        import numpy as np
+
+        name = current_snapshot(self.path)
+        if name is None:
+            return None
+        directory = self.path / name
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+            if meta["dimensions"] != get_settings().vector_index_dimensions:
+                logger.warning(f"Ignoring vector index snapshot {directory.name}: dimensions {meta['dimensions']}")
+                return None
+            state = self._empty_state()
+            state.vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+            state.ids = np.load(directory / "ids.npy", mmap_mode="r")
+            state.documents = np.load(directory / "documents.npy", mmap_mode="r")
+            state.centroids = np.load(directory / "centroids.npy")
+            state.offsets = np.load(directory / "offsets.npy")
+            state.alive = np.ones(len(state.ids), dtype=bool)
+            state.stamps = meta["stamps"]
+            state.stamps_generation = meta["stamps_generation"]
+            state.directory = directory
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load vector index snapshot {directory.name}: {e}")
+            return None
+        logger.info("Loaded vector index snapshot %s (%d rows)", directory.name, len(state.ids))
+        return state
+
+    def _write_snapshot(self, state: IndexState) -> IndexState:
+        """
+        Cluster all live rows into a new snapshot, point CURRENT at it and
+        return it memory-mapped. Call with snapshot_lock() held; superseded
+        snapshots are removed after the grace period.
+        """
+        import numpy as np
+
+        alive_rows = np.flatnonzero(state.alive)
+        vectors = np.concatenate([np.asarray(state.vectors[alive_rows], dtype=np.float32), state.delta_vectors])
+        ids = np.concatenate([np.asarray(state.ids[alive_rows]), state.delta_ids])
+        documents = np.concatenate([np.asarray(state.documents[alive_rows]), state.delta_documents])
+
+        settings = get_settings()
+        lists = settings.vector_index_lists or int(np.sqrt(len(vectors)))
+        lists = max(1, min(lists, MAX_LISTS, len(vectors)))
+        if len(vectors):
+            centroids = _spherical_kmeans(vectors, lists)
+            assignment = _assign(vectors, centroids)
+        else:
+            centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            assignment = np.zeros(0, dtype=np.int64)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))]).astype(np.int64)
+
+        directory = new_snapshot_directory(self.path)
+        np.save(directory / "vectors.npy", vectors[order].astype(np.float16))
+        np.save(directory / "ids.npy", ids[order])
+        np.save(directory / "documents.npy", documents[order])
+        np.save(directory / "centroids.npy", centroids)
+        np.save(directory / "offsets.npy", offsets)
+        (directory / "meta.json").write_text(json.dumps({
+            "dimensions": settings.vector_index_dimensions,
+            "rows": len(ids),
+            "lists": len(centroids),
+            "stamps": state.stamps,
+            "stamps_generation": state.stamps_generation,
+        }))
+
+        publish_snapshot(self.path, directory)
+        self.snapshots_written += 1
+
+        loaded = self._load_snapshot()
+        if loaded is None:
+            raise RuntimeError(f"Snapshot {directory.name} was written but could not be loaded")
+        logger.info("Wrote vector index snapshot %s (%d rows, %d lists)", directory.name, len(ids), len(centroids))
+        return loaded
+
+
+vector_index = VectorIndex()
@@ -0,0 +1,113 @@
+"""Benchmark pre-stream overhead of send_message: sequential queries vs prepare_chat_turn RPC.
+
+Run against a local Supabase stack (`supabase start`) with SUPABASE_URL and
+SUPABASE_SERVICE_ROLE_KEY pointing at it:
+
+    python -m benchmarks.benchmark_chat_prepare --iterations 200
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from supabase import create_client
+from app.config import get_settings
+
+settings = get_settings()
+supabase = create_client(settings.supabase_url, settings.supabase_service_role_key)
+
+
+def sequential_turn(thread_id: str, user_id: str, content: str) -> None:
+    """The four round-trips send_message used to make before streaming."""
+    supabase.table("threads").select("*").eq("id", thread_id).eq("user_id", user_id).single().execute()
+    supabase.table("messages").insert({
+        "thread_id": thread_id,
+        "user_id": user_id,
+        "role": "user",
+        "content": content,
+        "created_at": datetime.utcnow().isoformat(),
+    }).execute()
+    supabase.table("messages").select("role, content").eq("thread_id", thread_id).order("created_at").execute()
+    supabase.table("documents").select("id", count="exact").eq("status", "completed").limit(1).execute()
+
+
+def rpc_turn(thread_id: str, user_id: str, content: str) -> None:
+    """The single prepare_chat_turn round-trip."""
+    supabase.rpc("prepare_chat_turn", {
+        "p_thread_id": thread_id,
+        "p_user_id": user_id,
+        "p_content": content,
+        "p_history_limit": settings.chat_history_window,
+        "p_created_at": datetime.utcnow().isoformat(),
+    }).execute()
+
+
+def measure(fn, thread_id: str, user_id: str, iterations: int) -> list[float]:
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(thread_id, user_id, f"benchmark message {i}")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(name: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<12} mean={statistics.mean(timings):7.2f} ms  "
+          f"p50={statistics.median(timings):7.2f} ms  p95={p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--history", type=int, default=20, help="Messages to seed in the thread")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Chat turn preparation benchmark")
+    print("=" * 60)
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    user = supabase.auth.admin.create_user({
+        "email": email,
+        "password": uuid.uuid4().hex,
+        "email_confirm": True,
+    }).user
+
+    try:
+        thread = supabase.table("threads").insert({"user_id": user.id, "title": "benchmark"}).execute().data[0]
+        supabase.table("messages").insert([
+            {
+                "thread_id": thread["id"],
+                "user_id": user.id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"seed message {i} " * 50,
+            }
+            for i in range(args.history)
+        ]).execute()
+
+        # Warm up connections and plans
+        measure(sequential_turn, thread["id"], user.id, 5)
+        measure(rpc_turn, thread["id"], user.id, 5)
+
+        sequential = measure(sequential_turn, thread["id"], user.id, args.iterations)
+        rpc = measure(rpc_turn, thread["id"], user.id, args.iterations)
+
+        summarize("sequential", sequential)
+        summarize("rpc", rpc)
+        print(f"\nPre-stream overhead reduced by "
+              f"{statistics.median(sequential) - statistics.median(rpc):.2f} ms (p50)")
+    finally:
+        # Threads and messages cascade from the auth user
+        supabase.auth.admin.delete_user(user.id)
+
+
+if __name__ == "__main__":
+    main()
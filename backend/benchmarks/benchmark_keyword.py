@@ -0,0 +1,146 @@
+"""Benchmark the in-process BM25 keyword index against the SQL keyword leg.
+
+Builds app.services.keyword_index from the chunks of a synthetic corpus
+already loaded with benchmarks/load_corpus.py (read straight from Postgres,
+bypassing the sync RPCs), then runs labeled queries from
+benchmarks/corpus.py through both the local index and the keyword leg of
+hybrid_search_chunks (ts_rank over to_tsvector('russian', content)).
+Reports build throughput, postings size, latency percentiles, recall of the
+labeled article and MRR for each:
+
+    python -m benchmarks.benchmark_keyword --queries 500 --match-count 50 --output keyword.json
+
+Queries mix article numbers written as "509⁶" and "509-6" with Uzbek
+apostrophe variants, which is where the two tokenizations differ.
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.keyword_index import KeywordIndex
+from app.services.retrieval_service import normalize_query
+from benchmarks.benchmark_retrieval import RECALL_AT, WARMUP_QUERIES, first_relevant_rank
+from benchmarks.corpus import LabeledQuery, add_document_arguments, document_options, generate_queries
+from benchmarks.load_corpus import DEFAULT_DSN, loaded_state
+from benchmarks.reporting import summarize, write_report
+
+BUILD_BATCH_ROWS = 1000
+
+# The keyword leg of hybrid_search_chunks, run on its own
+SQL_KEYWORD_QUERY = """
+    SELECT c.id, c.document_id, c.metadata
+    FROM chunks c
+    WHERE to_tsvector('russian', c.content) @@ plainto_tsquery('russian', %(text)s)
+    ORDER BY ts_rank(to_tsvector('russian', c.content), plainto_tsquery('russian', %(text)s)) DESC
+    LIMIT %(match_count)s
+"""
+
+
+def build_index(conn: psycopg.Connection, seed: int) -> tuple[KeywordIndex, dict, dict]:
+    """Index every chunk of the seed's corpus; returns the index, chunk labels and build stats."""
+    index = KeywordIndex()
+    labels: dict[str, tuple] = {}
+    started = time.perf_counter()
+    # Server-side cursors need a transaction, even on an autocommit connection
+    with conn.transaction(), conn.cursor(name="keyword_build") as cur:
+        cur.itersize = BUILD_BATCH_ROWS
+        cur.execute(
+            """
+            SELECT c.id::text, c.document_id::text, c.content, c.metadata
+            FROM chunks c JOIN documents d ON d.id = c.document_id
+            WHERE d.metadata->>'bench_seed' = %s
+            """,
+            (str(seed),),
+        )
+        while rows := cur.fetchmany(BUILD_BATCH_ROWS):
+            index.add([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+            for chunk_id, document_id, _, metadata in rows:
+                labels[chunk_id] = (chunk_id, document_id, {"articles": (metadata or {}).get("articles", [])})
+    seconds = time.perf_counter() - started
+    stats = index.stats()
+    return index, labels, {
+        "rows": stats["rows"],
+        "terms": stats["terms"],
+        "postings_bytes": stats["postings_bytes"],
+        "build_seconds": round(seconds, 1),
+        "rows_per_second": round(stats["rows"] / seconds, 1) if seconds else None,
+    }
+
+
+def evaluate(search, queries: list[LabeledQuery]) -> dict:
+    """Latency, recall and MRR of one keyword leg; search(query) returns (id, document_id, metadata) rows."""
+    latencies = []
+    ranks = []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        rows = search(query.query)
+        elapsed = (time.perf_counter() - started) * 1000
+        if i < WARMUP_QUERIES:
+            continue
+        latencies.append(elapsed)
+        ranks.append(first_relevant_rank(rows, query))
+
+    measured = len(ranks) or 1
+    return {
+        "latency_ms": summarize(latencies),
+        "recall": {f"@{k}": round(sum(1 for rank in ranks if rank and rank <= k) / measured, 3) for k in RECALL_AT},
+        "mrr": round(statistics.mean(1 / rank if rank else 0 for rank in ranks), 3) if ranks else None,
+        "misses": sum(1 for rank in ranks if rank is None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_document_arguments(parser)
+    parser.add_argument("--dsn", default=DEFAULT_DSN)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--match-count", type=int, default=50)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    options = document_options(args)
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        documents, chunks = loaded_state(conn, args.seed)
+        if not documents:
+            raise SystemExit(f"No corpus loaded for seed {args.seed}; run benchmarks.load_corpus first")
+        queries = generate_queries(args.seed, documents, args.queries + WARMUP_QUERIES, **options)
+
+        print(f"Building keyword index over {chunks:,} chunks...")
+        index, labels, build = build_index(conn, args.seed)
+        print(f"  {build['rows']:,} rows, {build['terms']:,} terms, "
+              f"{build['postings_bytes'] / 1e6:.1f} MB postings in {build['build_seconds']} s")
+
+        def local_search(query: str) -> list[tuple]:
+            return [labels[chunk_id] for chunk_id, _ in index.score(query, args.match_count)]
+
+        def sql_search(query: str) -> list[tuple]:
+            params = {"text": normalize_query(query), "match_count": args.match_count}
+            return conn.execute(SQL_KEYWORD_QUERY, params).fetchall()
+
+        legs = {"bm25_local": evaluate(local_search, queries), "sql_ts_rank": evaluate(sql_search, queries)}
+
+    for leg, stats in legs.items():
+        latency = stats["latency_ms"] or {}
+        print(f"  {leg:<12} p50={latency.get('p50')} ms  p95={latency.get('p95')} ms  "
+              f"recall@10={stats['recall']['@10']}  mrr={stats['mrr']}  misses={stats['misses']}")
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parameters": {"seed": args.seed, "queries": args.queries, "match_count": args.match_count, **options},
+        "chunks": chunks,
+        "build": build,
+        "legs": legs,
+    }
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
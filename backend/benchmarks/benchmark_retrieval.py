@@ -0,0 +1,196 @@
+"""Benchmark the retrieval RPCs against synthetic corpora of increasing size.
+
+For each --scales value (total chunks), tops the corpus up with
+benchmarks/load_corpus.py, then runs labeled queries from
+benchmarks/corpus.py through hybrid_search_chunks and its two legs
+(match_chunks, keyword_search_chunks) directly in Postgres, plus the
+halfvec and binary-quantized variants (hybrid_search_chunks_quantized).
+Reports latency percentiles, recall of the labeled article and relation
+sizes (the index footprint) per scale; quantized variants also report how
+much of the exact hybrid result they reproduce (build their indexes first
+with supabase/optional/quantized_index_*.sql, or they scan every row):
+
+    python -m benchmarks.benchmark_retrieval --scales 100000 1000000 --queries 200 \\
+        --jobs 4 --drop-indexes --output retrieval.json
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.retrieval_service import normalize_query
+from benchmarks.corpus import LabeledQuery, add_document_arguments, document_options, embed_texts, generate_queries
+from benchmarks.load_corpus import CORPUS_OWNER_ID, DEFAULT_DSN, load_corpus, loaded_state
+from benchmarks.reporting import summarize, write_report
+
+WARMUP_QUERIES = 5
+RECALL_AT = (1, 5, 10, 20)
+
+QUANTIZED_QUERY = (
+    "SELECT id, document_id, metadata FROM hybrid_search_chunks_quantized(%(text)s, %(embedding)s::vector, "
+    "%(threshold)s, %(match_count)s, %(final_count)s, %(user_id)s, NULL, %(rrf_k)s, "
+    "'{quantization}', %(rescore_factor)s)"
+)
+RPC_QUERIES = {
+    "hybrid_search_chunks": (
+        "SELECT id, document_id, metadata FROM hybrid_search_chunks(%(text)s, %(embedding)s::vector, "
+        "%(threshold)s, %(match_count)s, %(final_count)s, %(user_id)s, NULL, %(rrf_k)s)"
+    ),
+    "hybrid_search_halfvec": QUANTIZED_QUERY.format(quantization="halfvec"),
+    "hybrid_search_binary": QUANTIZED_QUERY.format(quantization="binary"),
+    "match_chunks": (
+        "SELECT id, document_id, metadata FROM match_chunks(%(embedding)s::vector, %(threshold)s, "
+        "%(match_count)s, %(user_id)s, NULL)"
+    ),
+    "keyword_search_chunks": (
+        "SELECT id, document_id, metadata FROM keyword_search_chunks(%(text)s, %(match_count)s, %(user_id)s, NULL)"
+    ),
+}
+EXACT_RPC = "hybrid_search_chunks"
+QUANTIZED_RPCS = ("hybrid_search_halfvec", "hybrid_search_binary")
+
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(f"{value:.6f}" for value in vector) + "]"
+
+
+def first_relevant_rank(rows: list[tuple], query: LabeledQuery) -> int | None:
+    """1-based rank of the first chunk containing the labeled article, if any."""
+    for rank, (_, document_id, metadata) in enumerate(rows, 1):
+        if str(document_id) == query.document_id and query.article in (metadata or {}).get("articles", []):
+            return rank
+    return None
+
+
+def relation_sizes(conn: psycopg.Connection) -> dict[str, int]:
+    rows = conn.execute(
+        """
+        SELECT c.relname, pg_relation_size(c.oid)
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE i.indrelid = 'public.chunks'::regclass
+        """
+    ).fetchall()
+    sizes = {"chunks_total": conn.execute("SELECT pg_total_relation_size('public.chunks')").fetchone()[0]}
+    sizes.update({name: size for name, size in rows})
+    return sizes
+
+
+def run_queries(conn: psycopg.Connection, rpc: str, queries: list[LabeledQuery], embeddings, args) -> dict:
+    """Latency, recall and MRR of one RPC; "ids" keeps each query's result ids for overlap."""
+    latencies = []
+    ranks = []
+    ids = []
+    for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+        params = {
+            "text": normalize_query(query.query),
+            "embedding": embedding,
+            "threshold": args.threshold,
+            "match_count": args.match_count,
+            "final_count": args.final_count,
+            "user_id": CORPUS_OWNER_ID,
+            "rrf_k": args.rrf_k,
+            "rescore_factor": args.rescore_factor,
+        }
+        started = time.perf_counter()
+        rows = conn.execute(RPC_QUERIES[rpc], params).fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        if i < WARMUP_QUERIES:
+            continue
+        latencies.append(elapsed)
+        ranks.append(first_relevant_rank(rows, query))
+        ids.append([row[0] for row in rows])
+
+    measured = len(ranks) or 1
+    return {
+        "latency_ms": summarize(latencies),
+        "recall": {f"@{k}": round(sum(1 for rank in ranks if rank and rank <= k) / measured, 3) for k in RECALL_AT},
+        "mrr": round(statistics.mean(1 / rank if rank else 0 for rank in ranks), 3) if ranks else None,
+        "ids": ids,
+    }
+
+
+def exact_overlap(quantized_ids: list[list], exact_ids: list[list]) -> float | None:
+    """Mean share of the exact hybrid result a quantized variant reproduces."""
+    shares = [len(set(q) & set(e)) / len(e) for q, e in zip(quantized_ids, exact_ids) if e]
+    return round(statistics.mean(shares), 3) if shares else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_document_arguments(parser)
+    parser.add_argument("--dsn", default=DEFAULT_DSN)
+    parser.add_argument("--scales", type=int, nargs="*", default=[], help="Chunk counts to load and benchmark (default: as loaded)")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rpc", nargs="+", choices=list(RPC_QUERIES), default=list(RPC_QUERIES))
+    parser.add_argument("--threshold", type=float, default=0.0)
+    parser.add_argument("--match-count", type=int, default=50)
+    parser.add_argument("--final-count", type=int, default=30)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Quantized candidates per match_count")
+    parser.add_argument("--jobs", type=int, default=1, help="Loader processes")
+    parser.add_argument("--drop-indexes", action="store_true", help="Rebuild chunk indexes after each load")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    options = document_options(args)
+    results = []
+    for scale in args.scales or [None]:
+        load = None
+        if scale is not None:
+            print(f"Loading corpus up to {scale:,} chunks...")
+            load = load_corpus(args.dsn, args.seed, scale, options, jobs=args.jobs, drop_indexes=args.drop_indexes)
+
+        with psycopg.connect(args.dsn, autocommit=True) as conn:
+            documents, chunks = loaded_state(conn, args.seed)
+            if not documents:
+                raise SystemExit(f"No corpus loaded for seed {args.seed}; pass --scales or run benchmarks.load_corpus")
+            queries = generate_queries(args.seed, documents, args.queries + WARMUP_QUERIES, **options)
+            embeddings = [vector_literal(row) for row in embed_texts([normalize_query(q.query) for q in queries])]
+
+            print(f"Benchmarking {len(queries) - WARMUP_QUERIES} queries at {chunks:,} chunks...")
+            result = {
+                "chunks": chunks,
+                "documents": documents,
+                "load": load,
+                "relation_sizes": relation_sizes(conn),
+                "rpcs": {rpc: run_queries(conn, rpc, queries, embeddings, args) for rpc in args.rpc},
+            }
+        rpcs = result["rpcs"]
+        for rpc in QUANTIZED_RPCS:
+            if rpc in rpcs and EXACT_RPC in rpcs:
+                rpcs[rpc]["exact_overlap"] = exact_overlap(rpcs[rpc]["ids"], rpcs[EXACT_RPC]["ids"])
+        for stats in rpcs.values():
+            del stats["ids"]
+        results.append(result)
+        for rpc, stats in result["rpcs"].items():
+            latency = stats["latency_ms"] or {}
+            overlap = f"  exact_overlap={stats['exact_overlap']}" if "exact_overlap" in stats else ""
+            print(f"  {rpc:<24} p50={latency.get('p50')} ms  p95={latency.get('p95')} ms  "
+                  f"recall@10={stats['recall']['@10']}  mrr={stats['mrr']}{overlap}")
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parameters": {
+            "seed": args.seed,
+            "queries": args.queries,
+            "threshold": args.threshold,
+            "match_count": args.match_count,
+            "final_count": args.final_count,
+            "rrf_k": args.rrf_k,
+            "rescore_factor": args.rescore_factor,
+            **options,
+        },
+        "scales": results,
+    }
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark SSE framing cost: one json.dumps frame per delta vs coalesced orjson frames.
+
+Simulates a 12,000-word Uzbek legal answer streamed token by token and
+reports frames, bytes and CPU time per stream for each flush policy:
+
+    python -m benchmarks.benchmark_sse --words 12000 --tokens-per-second 80
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.sse import DeltaCoalescer
+
+WORDS = (
+    "davlat xaridlari jarayonida quyidagilarga yoʻl qoʻyilmaydi ishtirokchining "
+    "vakolatli vakilining yaqin qarindoshlari ijrochini tanlash boʻyicha qaror "
+    "qabul qilish huquqiga ega boʻlsa manfaatlar toʻqnashuviga 46-modda"
+).split()
+
+
+def make_deltas(words: int) -> list[str]:
+    """Split a synthetic answer into token-sized deltas (~1.3 tokens per word)."""
+    rng = random.Random(42)
+    deltas = []
+    for _ in range(words):
+        word = " " + rng.choice(WORDS)
+        # Long words arrive as two tokens
+        if len(word) > 8:
+            deltas.extend([word[:5], word[5:]])
+        else:
+            deltas.append(word)
+    return deltas
+
+
+def baseline(deltas: list[str]) -> tuple[int, int]:
+    """Previous behaviour: json.dumps + one frame per delta."""
+    frames = 0
+    size = 0
+    for delta in deltas:
+        data = json.dumps({"content": delta})
+        frame = f"event: text_delta\ndata: {data}\n\n"
+        frames += 1
+        size += len(frame)
+    return frames, size
+
+
+def coalesced(deltas: list[str], interval_ms: int, flush_bytes: int, token_interval: float) -> tuple[int, int]:
+    """Coalesced frames, with a simulated clock advancing at the token rate."""
+    now = [0.0]
+    coalescer = DeltaCoalescer(interval_ms, flush_bytes, clock=lambda: now[0])
+    for delta in deltas:
+        now[0] += token_interval
+        coalescer.add(delta)
+    coalescer.flush()
+    stats = coalescer.stats()
+    return stats["frames"], stats["bytes"]
+
+
+def cpu_per_stream(fn, repeats: int) -> float:
+    start = time.process_time()
+    for _ in range(repeats):
+        fn()
+    return (time.process_time() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=12000)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    deltas = make_deltas(args.words)
+    token_interval = 1 / args.tokens_per_second
+
+    print("=" * 72)
+    print(f"SSE framing benchmark: {len(deltas)} deltas, {args.tokens_per_second:.0f} tokens/s")
+    print("=" * 72)
+    print(f"{'policy':<28}{'frames':>10}{'bytes':>12}{'CPU ms/stream':>16}")
+
+    frames, size = baseline(deltas)
+    cpu = cpu_per_stream(lambda: baseline(deltas), args.repeats)
+    print(f"{'per-delta json.dumps':<28}{frames:>10}{size:>12}{cpu:>16.2f}")
+
+    for interval_ms, flush_bytes in [(0, 0), (25, 1024), (50, 2048), (100, 4096)]:
+        frames, size = coalesced(deltas, interval_ms, flush_bytes, token_interval)
+        cpu = cpu_per_stream(lambda: coalesced(deltas, interval_ms, flush_bytes, token_interval), args.repeats)
+        print(f"{f'coalesced {interval_ms}ms/{flush_bytes}B':<28}{frames:>10}{size:>12}{cpu:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Deterministic synthetic Uzbek-style legal corpus for scale-testing retrieval.
+
+Documents are codes split into chapters ("3-bob") and articles ("46-modda"),
+including inserted articles with superscript numbers ("509⁶-modda") the way
+amended Uzbek codes number them. Text goes through the same normalize_text()
+and chunk_text() as ingestion, and embeddings are the hashed-word vectors
+benchmarks/fake_providers.py returns, so a loaded corpus can be queried
+through the API running against the fake providers.
+
+Everything is a pure function of (seed, document index): the loader can
+resume at any index and benchmarks regenerate queries without reading the
+corpus back.
+
+    python -m benchmarks.corpus --documents 3 --show 1
+    python -m benchmarks.corpus --documents 1000 --queries 500 --queries-output queries.jsonl
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.chunking_service import chunk_text
+from app.services.extraction_service import normalize_text
+from benchmarks.fake_providers import METADATA_RESPONSE, TOKEN_PATTERN, word_feature
+
+CORPUS_NAMESPACE = uuid.UUID("5d1f6a52-0c4e-4b7a-9a43-2f64c0b7e9d1")
+SUPERSCRIPTS = "⁰¹²³⁴⁵⁶⁷⁸⁹"
+# Uzbek Latin writes oʻ/gʻ and the tutuq belgisi with several code points in the wild
+APOSTROPHES = ("ʻ", "ʼ", "'", "‘", "’")
+
+CODE_NAMES = [
+    "Fuqarolik kodeksi", "Mehnat kodeksi", "Soliq kodeksi", "Jinoyat kodeksi",
+    "Maʼmuriy javobgarlik toʻgʻrisidagi kodeks", "Oila kodeksi", "Yer kodeksi",
+    "Bojxona kodeksi", "Davlat xaridlari toʻgʻrisidagi qonun", "Uy-joy kodeksi",
+]
+TITLE_WORDS = (
+    "shartnoma tuzish tartibi majburiyatlarni bajarish javobgarlik asoslari "
+    "mulk huquqi meros ochilishi ijara toʻlovi mehnat shartnomasi bekor qilish "
+    "soliq toʻlovchining huquqlari ish haqi taʼtil berish davlat xaridlari "
+    "manfaatlar toʻqnashuvi nizolarni hal qilish sud tartibida undirish "
+    "vakolatli organ qarori yer uchastkasi ajratish bojxona rasmiylashtiruvi "
+    "jarima miqdori vasiylik va homiylik nikoh tuzish shartlari"
+).split()
+BODY_WORDS = (
+    "mazkur modda qoidalari tomonlarning kelishuvi bilan belgilanadi agar qonunda "
+    "boshqacha tartib nazarda tutilmagan boʻlsa fuqarolar va yuridik shaxslar "
+    "oʻz huquqlarini erkin amalga oshiradilar majburiyat lozim darajada bajarilishi "
+    "shart belgilangan muddatda toʻlanmagan taqdirda penya undiriladi vakolatli "
+    "davlat organi oʻn kun ichida qaror qabul qiladi ariza yozma shaklda beriladi "
+    "ishtirokchining yaqin qarindoshlari ijrochini tanlash boʻyicha qaror qabul "
+    "qilish huquqiga ega emas shikoyat sudga yuborilishi mumkin hujjatlar "
+    "notarial tartibda tasdiqlanadi zarar toʻliq hajmda qoplanadi"
+).split()
+
+# normalize_text() turns "509⁶-modda" into "509⁶ (509-6)-modda"
+ARTICLE_HEADER = re.compile(r"^(\d+[⁰¹²³⁴⁵⁶⁷⁸⁹]*)(?: \(\d+-\d+\))?-modda\.", re.MULTILINE)
+TO_DIGITS = str.maketrans(SUPERSCRIPTS, "0123456789")
+
+
+@dataclass
+class Article:
+    label: str  # "46" or "509⁶"
+    title: str
+
+
+@dataclass
+class SyntheticDocument:
+    index: int
+    id: str
+    filename: str
+    text: str
+    articles: list[Article]
+    chunks: list[str] = field(default_factory=list)
+    chunk_articles: list[list[str]] = field(default_factory=list)
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.text.encode()).hexdigest()
+
+    def metadata(self, seed: int) -> dict:
+        return {**METADATA_RESPONSE, "bench_seed": seed, "bench_index": self.index}
+
+    def chunk_id(self, chunk_index: int) -> str:
+        return str(uuid.uuid5(CORPUS_NAMESPACE, f"{self.id}:{chunk_index}"))
+
+
+def uzbek_apostrophes(text: str, rng: random.Random) -> str:
+    """Vary the apostrophe code point per occurrence, as scanned and typed texts do."""
+    return re.sub("ʻ", lambda _: rng.choice(APOSTROPHES), text)
+
+
+def to_superscript(number: int) -> str:
+    return "".join(SUPERSCRIPTS[int(digit)] for digit in str(number))
+
+
+def generate_document(
+    seed: int,
+    index: int,
+    articles: int = 40,
+    words_per_article: int = 300,
+    chunk_size: int = 5000,
+    chunk_overlap: int = 1000,
+) -> SyntheticDocument:
+    """Generate document number index of the corpus for seed, already chunked."""
+    rng = random.Random(f"{seed}:{index}")
+    code = rng.choice(CODE_NAMES)
+    number = rng.randint(1, 400)
+    lines = [f"Oʻzbekiston Respublikasining {code}", f"(tahrir {seed}-{index})", ""]
+
+    article_list: list[Article] = []
+    chapter = 0
+    while len(article_list) < articles:
+        if len(article_list) % 8 == 0:
+            chapter += 1
+            lines += [f"{chapter}-bob. {' '.join(rng.sample(TITLE_WORDS, 3)).capitalize()}", ""]
+
+        # Amended codes insert articles between existing ones: 509, 509¹, 509², 510
+        inserted = rng.randint(1, 4) if rng.random() < 0.1 else 0
+        for part in range(inserted + 1):
+            label = f"{number}{to_superscript(part)}" if part else str(number)
+            title = " ".join(rng.sample(TITLE_WORDS, rng.randint(2, 5))).capitalize()
+            article_list.append(Article(label, title))
+            lines += [f"{label}-modda. {title}", ""]
+            paragraphs = rng.randint(1, 4)
+            for paragraph in range(1, paragraphs + 1):
+                count = max(10, words_per_article // paragraphs)
+                body = " ".join(rng.choice(BODY_WORDS) for _ in range(count))
+                lines += [f"{paragraph}) {body}.", ""]
+        number += 1
+
+    text = normalize_text(uzbek_apostrophes("\n".join(lines), rng))
+    document = SyntheticDocument(
+        index=index,
+        id=str(uuid.uuid5(CORPUS_NAMESPACE, f"{seed}:{index}")),
+        filename=f"bench-{seed}-{index:07d}.md",
+        text=text,
+        articles=article_list,
+    )
+    document.chunks = chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    document.chunk_articles = [ARTICLE_HEADER.findall(chunk) for chunk in document.chunks]
+    return document
+
+
+def embed_texts(texts: list[str], dimensions: int = 1536) -> np.ndarray:
+    """
+    Bulk version of fake_providers.pseudo_embedding: float32 unit rows.
+
+    Word features are cached, so the cost is tokenizing plus one
+    np.add.at per text.
+    """
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        features = [word_feature(word) for word in TOKEN_PATTERN.findall(text.lower())]
+        if not features:
+            continue
+        hashes, signs = zip(*features)
+        np.add.at(vectors[row], np.array(hashes, dtype=np.int64) % dimensions, np.array(signs, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@dataclass
+class LabeledQuery:
+    query: str
+    document_id: str
+    filename: str
+    article: str
+
+
+def generate_queries(seed: int, documents: int, count: int, **document_options) -> list[LabeledQuery]:
+    """
+    Queries labeled with the article that answers them.
+
+    Styles mirror real traffic: article number plus title, title only, and
+    the superscript written as "509-6" or with apostrophes typed differently.
+    """
+    rng = random.Random(f"{seed}:queries")
+    queries = []
+    for _ in range(count):
+        document = generate_document(seed, rng.randrange(documents), **document_options)
+        article = rng.choice(document.articles)
+        title = article.title.lower()
+        style = rng.random()
+        if style < 0.4:
+            query = f"{article.label}-modda {title}"
+        elif style < 0.7:
+            query = f"{title} qanday tartibda amalga oshiriladi?"
+        else:
+            base = article.label.rstrip(SUPERSCRIPTS)
+            part = article.label[len(base):].translate(TO_DIGITS)
+            number = f"{base}-{part}" if part else base
+            query = f"{number}-moddada {title} haqida nima deyilgan"
+        queries.append(LabeledQuery(uzbek_apostrophes(query, rng), document.id, document.filename, article.label))
+    return queries
+
+
+def add_document_arguments(parser: argparse.ArgumentParser) -> None:
+    """Corpus shape options shared by the loader and the benchmarks."""
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--articles", type=int, default=40, help="Articles per document")
+    parser.add_argument("--words-per-article", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--chunk-overlap", type=int, default=1000)
+
+
+def document_options(args: argparse.Namespace) -> dict:
+    return {
+        "articles": args.articles,
+        "words_per_article": args.words_per_article,
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_document_arguments(parser)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--show", type=int, default=0, help="Print the first N documents")
+    parser.add_argument("--queries", type=int, default=0, help="Labeled queries to generate")
+    parser.add_argument("--queries-output", type=Path, help="Write labeled queries as JSON lines")
+    args = parser.parse_args()
+
+    chunks = 0
+    characters = 0
+    for index in range(args.documents):
+        document = generate_document(args.seed, index, **document_options(args))
+        chunks += len(document.chunks)
+        characters += len(document.text)
+        if index < args.show:
+            print(document.text[:2000])
+            print(f"... ({len(document.text)} chars, {len(document.chunks)} chunks)\n")
+    print(f"{args.documents} documents, {chunks} chunks, {characters / 1e6:.1f}M characters "
+          f"({chunks / max(args.documents, 1):.1f} chunks/document)")
+
+    if args.queries:
+        queries = generate_queries(args.seed, args.documents, args.queries, **document_options(args))
+        lines = [json.dumps(query.__dict__, ensure_ascii=False) for query in queries]
+        if args.queries_output:
+            args.queries_output.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            print(f"{len(queries)} labeled queries written to {args.queries_output}")
+        else:
+            print("\n".join(lines[:10]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Offline retrieval evaluation: sweep hybrid search sizes over labeled queries.
+
+Runs every labeled query through retrieval_service.search_documents (the
+same embedding, hybrid_search_chunks RPC and reranker path chat uses) for
+each combination of the swept SearchParams, with the reranker on and/or
+off and with adaptive candidate sizing on and/or off. Per configuration it
+reports recall@k, MRR, latency (total and per stage), the share of
+adaptive searches that widened and the chunks/characters/estimated tokens
+handed to the model, then recommends the cheapest configuration meeting
+--target-recall.
+
+Labels are JSON lines with "query" and "article" ("46", "509⁶"), plus
+optional "document_id" or "filename"; benchmarks/corpus.py --queries-output
+writes them for synthetic corpora. A chunk is relevant when it contains the
+article's "N-modda." heading (and belongs to the labeled document, if given).
+
+    python -m benchmarks.evaluate_retrieval --labels queries.jsonl \\
+        --match-count 20 50 --final-count 10 30 --top-k 5 10 20 --rerank on off --adaptive on off \\
+        --target-recall 0.9 --output sweep.json
+
+Providers come from the usual settings, so run it against the fake
+providers (benchmarks/fake_providers.py) for cost-free latency numbers or
+against the real ones for reranker quality.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.http_clients import close_http_clients
+from app.config import get_settings
+from app.services.metrics import collect_timings, search_candidates
+from app.services.reranker_service import get_reranker_settings
+from app.services.retrieval_service import SearchParams, search_cache, search_documents
+from benchmarks.corpus import ARTICLE_HEADER
+from benchmarks.reporting import summarize, write_report
+
+CHARS_PER_TOKEN = 4  # Rough estimate for mixed Uzbek/Russian legal text
+RECALL_AT = (1, 3, 5, 10, 20)
+WARMUP_QUERIES = 3
+STAGES = ("embedding", "vector_index", "keyword_index", "search_rpc", "rerank")
+WIDEN_REASONS = ("flat", "disagreement")
+
+
+def load_labels(path: Path) -> list[dict]:
+    labels = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    for label in labels:
+        if "query" not in label or "article" not in label:
+            raise SystemExit(f"Label without query/article: {label}")
+    return labels
+
+
+def is_relevant(chunk: dict, label: dict) -> bool:
+    if label.get("document_id") and str(chunk.get("document_id")) != label["document_id"]:
+        return False
+    filename = (chunk.get("metadata") or {}).get("filename")
+    if label.get("filename") and filename and filename != label["filename"]:
+        return False
+    return label["article"] in ARTICLE_HEADER.findall(chunk.get("content", ""))
+
+
+async def evaluate(labels: list[dict], params: SearchParams, rerank: bool) -> dict:
+    """Run all labeled queries with one configuration (result cache cleared first)."""
+    search_cache.clear()
+    widened_before = sum(search_candidates.value(outcome=f"widened_{reason}") for reason in WIDEN_REASONS)
+    latencies: list[float] = []
+    stage_times: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    ranks: list[int | None] = []
+    chunks_returned: list[int] = []
+    chars_returned: list[int] = []
+
+    for label in labels:
+        with collect_timings() as timings:
+            started = time.perf_counter()
+            results = await search_documents(label["query"], "evaluation", use_reranking=rerank, params=params)
+            latencies.append((time.perf_counter() - started) * 1000)
+        for stage in STAGES:
+            if stage in timings:
+                stage_times[stage].append(timings[stage])
+        ranks.append(next((rank for rank, chunk in enumerate(results, 1) if is_relevant(chunk, label)), None))
+        chunks_returned.append(len(results))
+        chars_returned.append(sum(len(chunk.get("content", "")) for chunk in results))
+
+    queries = len(labels)
+    widened = sum(search_candidates.value(outcome=f"widened_{reason}") for reason in WIDEN_REASONS) - widened_before
+    recall = {
+        f"@{k}": round(sum(1 for rank in ranks if rank and rank <= k) / queries, 3)
+        for k in RECALL_AT if k <= params.top_k
+    }
+    recall["@top_k"] = round(sum(1 for rank in ranks if rank) / queries, 3)
+    return {
+        "params": {"rerank": rerank, **params.__dict__},
+        "recall": recall,
+        "mrr": round(statistics.mean(1 / rank if rank else 0 for rank in ranks), 3),
+        "latency_ms": summarize(latencies),
+        "stage_p50_ms": {stage: summarize(times)["p50"] for stage, times in stage_times.items() if times},
+        "widened": round(widened / queries, 3),
+        "chunks_returned": round(statistics.mean(chunks_returned), 1),
+        "chars_returned": round(statistics.mean(chars_returned)),
+        "tokens_returned": round(statistics.mean(chars_returned) / CHARS_PER_TOKEN),
+    }
+
+
+def recommend(results: list[dict], target_recall: float) -> dict | None:
+    """Fewest tokens (then lowest p50) among configurations reaching the target recall."""
+    eligible = [result for result in results if result["recall"]["@top_k"] >= target_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda result: (result["tokens_returned"], result["latency_ms"]["p50"]))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    labels = load_labels(args.labels)
+    if args.limit:
+        labels = labels[:args.limit]
+
+    reranker = get_reranker_settings()
+    reranker_available = bool(reranker["enabled"] and reranker["api_key"])
+    rerank_modes = sorted({mode == "on" for mode in args.rerank}, reverse=True)
+    if True in rerank_modes and not reranker_available:
+        print("Reranker is disabled or has no API key; 'on' runs will fall back to RRF order")
+
+    # Warm provider connections and the embedding path once, unmeasured
+    for label in labels[:WARMUP_QUERIES]:
+        await search_documents(label["query"], "evaluation", use_reranking=False)
+
+    results = []
+    settings = get_settings()
+    adaptive_modes = sorted({mode == "on" for mode in args.adaptive})
+    grid = itertools.product(args.match_count, args.final_count, args.rrf_k, args.top_k, rerank_modes, adaptive_modes)
+    for match_count, final_count, rrf_k, top_k, rerank, adaptive in grid:
+        if final_count > 2 * match_count or top_k > final_count:
+            continue  # RRF over two legs can't return more; top_k is cut from final_count
+        initial = {}
+        if adaptive:
+            # Narrow pass uses the configured initial sizes, never more than the full ones
+            initial = {
+                "initial_match_count": min(settings.search_initial_match_count, match_count),
+                "initial_final_count": max(min(settings.search_initial_final_count, final_count), top_k),
+            }
+        params = SearchParams(top_k=top_k, match_count=match_count, final_count=final_count, rrf_k=rrf_k, **initial)
+        if adaptive and not params.adaptive:
+            continue  # Initial sizes equal the full ones: same as the non-adaptive run
+        result = await evaluate(labels, params, rerank)
+        results.append(result)
+        print(f"match={match_count:<4} final={final_count:<4} rrf_k={rrf_k:<4} top_k={top_k:<3} "
+              f"rerank={'on ' if rerank else 'off'} adaptive={'on ' if adaptive else 'off'}  "
+              f"recall@top_k={result['recall']['@top_k']:.3f}  mrr={result['mrr']:.3f}  "
+              f"p50={result['latency_ms']['p50']} ms  widened={result['widened']:.0%}  "
+              f"tokens={result['tokens_returned']}")
+
+    best = recommend(results, args.target_recall)
+    if best:
+        print(f"\nRecommended (recall@top_k >= {args.target_recall}): {best['params']}")
+    else:
+        print(f"\nNo configuration reached recall@top_k >= {args.target_recall}")
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "labels": str(args.labels),
+        "queries": len(labels),
+        "reranker": {"available": reranker_available, "model": reranker["model"]},
+        "target_recall": args.target_recall,
+        "recommended": best["params"] if best else None,
+        "configurations": results,
+    }
+
+
+async def run_and_close(args: argparse.Namespace) -> dict:
+    try:
+        return await run(args)
+    finally:
+        await close_http_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=Path, required=True, help="JSON lines of labeled queries")
+    parser.add_argument("--limit", type=int, help="Evaluate only the first N labels")
+    parser.add_argument("--match-count", type=int, nargs="+", default=[20, 50])
+    parser.add_argument("--final-count", type=int, nargs="+", default=[10, 30])
+    parser.add_argument("--rrf-k", type=int, nargs="+", default=[60])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--rerank", nargs="+", choices=["on", "off"], default=["on", "off"])
+    parser.add_argument("--adaptive", nargs="+", choices=["on", "off"], default=["off"],
+                        help="Narrow first pass with the SEARCH_INITIAL_* sizes, widening when ambiguous")
+    parser.add_argument("--target-recall", type=float, default=0.9)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    write_report(asyncio.run(run_and_close(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Local stand-ins for the OpenAI-compatible chat/embedding APIs and the Jina reranker.
+
+Latency, token rate and error rate are configurable so load tests exercise
+the backend's streaming, scheduling and failover paths without paying real
+providers. All three APIs are served from one process:
+
+    python -m benchmarks.fake_providers --port 8900 --ttft-ms 400 --tokens-per-second 60
+
+Point the backend at it with LLM_BASE_URL / EMBEDDING_BASE_URL set to
+http://127.0.0.1:8900/v1 and JINA_RERANK_URL set to http://127.0.0.1:8900/v1/rerank
+(benchmarks/load_test.py does this itself).
+"""
+import argparse
+import array
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "davlat xaridlari jarayonida quyidagilarga yoʻl qoʻyilmaydi ishtirokchining "
+    "vakolatli vakilining yaqin qarindoshlari ijrochini tanlash boʻyicha qaror "
+    "qabul qilish huquqiga ega boʻlsa manfaatlar toʻqnashuviga 46-modda"
+).split()
+
+# Valid DocumentMetadata for structured-output (metadata extraction) requests
+METADATA_RESPONSE = {
+    "document_type": "reference",
+    "topics": ["davlat xaridlari"],
+    "programming_languages": [],
+    "frameworks_tools": [],
+    "date_references": None,
+    "key_entities": [],
+    "summary": "Synthetic legal document generated for load testing.",
+    "technical_level": "intermediate",
+}
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class FakeProviderConfig:
+    ttft_ms: float = 300.0
+    tokens_per_second: float = 60.0
+    completion_tokens: int = 200
+    tool_call_rate: float = 1.0
+    embedding_latency_ms: float = 50.0
+    embedding_ms_per_input: float = 1.0
+    rerank_latency_ms: float = 80.0
+    rerank_ms_per_document: float = 2.0
+    jitter: float = 0.2
+    error_rate: float = 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+@lru_cache(maxsize=100_000)
+def word_feature(word: str) -> tuple[int, float]:
+    """(hash, sign) of a word; its vector component is hash % dimensions."""
+    digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "little"), 1.0 if digest[4] & 1 else -1.0
+
+
+def pseudo_embedding(text: str, dimensions: int) -> list[float]:
+    """
+    Deterministic unit vector from hashed word features.
+
+    Texts sharing words get similar vectors, so retrieval over fake
+    embeddings still ranks overlapping chunks first. benchmarks/corpus.py
+    computes the same vectors in bulk for synthetic corpora.
+    """
+    vector = [0.0] * dimensions
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        word_hash, sign = word_feature(word)
+        vector[word_hash % dimensions] += sign
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def encode_base64(vector: list[float]) -> str:
+    """The openai client requests base64 float32 embeddings by default."""
+    return base64.b64encode(array.array("f", vector).tobytes()).decode()
+
+
+def create_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI(title="Fake providers")
+    stats: Counter = Counter()
+    rng = random.Random()
+
+    async def delay(ms: float) -> None:
+        if ms > 0:
+            await asyncio.sleep(ms * (1 + rng.uniform(-config.jitter, config.jitter)) / 1000)
+
+    def injected_error() -> JSONResponse | None:
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
+        return None
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"config": asdict(config), "counters": dict(stats)}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or 1536
+        stats["embedding_requests"] += 1
+        stats["embedding_inputs"] += len(inputs)
+
+        await delay(config.embedding_latency_ms + config.embedding_ms_per_input * len(inputs))
+        if error := injected_error():
+            return error
+
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for index, text in enumerate(inputs):
+            vector = pseudo_embedding(text, dimensions)
+            data.append({"object": "embedding", "index": index, "embedding": encode_base64(vector) if as_base64 else vector})
+        prompt_tokens = sum(estimate_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    @app.post("/v1/rerank")
+    async def rerank(request: Request):
+        body = await request.json()
+        documents = body["documents"]
+        stats["rerank_requests"] += 1
+        stats["rerank_documents"] += len(documents)
+
+        await delay(config.rerank_latency_ms + config.rerank_ms_per_document * len(documents))
+        if error := injected_error():
+            return error
+
+        query_words = set(TOKEN_PATTERN.findall(body["query"].lower()))
+        scored = []
+        for index, document in enumerate(documents):
+            words = set(TOKEN_PATTERN.findall(document.lower()))
+            overlap = len(query_words & words) / (len(query_words) or 1)
+            scored.append((overlap, index))
+        scored.sort(reverse=True)
+        top_n = body.get("top_n") or len(documents)
+        return {
+            "model": body.get("model", "fake-reranker"),
+            "usage": {"total_tokens": sum(estimate_tokens(document) for document in documents)},
+            "results": [
+                {"index": index, "relevance_score": score, "document": {"text": documents[index]}}
+                for score, index in scored[:top_n]
+            ],
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "fake-chat")
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+        stats["chat_requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+
+        if error := injected_error():
+            return error
+
+        # Call a tool once per turn, the way a RAG model searches before answering
+        tool = next(iter(body.get("tools") or []), None)
+        call_tool = (
+            tool is not None
+            and messages and messages[-1].get("role") == "user"
+            and rng.random() < config.tool_call_rate
+        )
+
+        if not body.get("stream"):
+            await delay(config.ttft_ms)
+            content = json.dumps(METADATA_RESPONSE) if body.get("response_format") else " ".join(WORDS)
+            completion_tokens = estimate_tokens(content)
+            stats["completion_tokens"] += completion_tokens
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            await delay(config.ttft_ms)
+            if call_tool:
+                query = str(messages[-1].get("content") or "")
+                completion_tokens = estimate_tokens(query) + 10
+                yield chunk({"role": "assistant", "tool_calls": [{
+                    "index": 0,
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": tool["function"]["name"], "arguments": json.dumps({"query": query})},
+                }]})
+                yield chunk({}, "tool_calls")
+            else:
+                completion_tokens = config.completion_tokens
+                interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+                started = time.perf_counter()
+                for i in range(completion_tokens):
+                    # Pace against the start time so sleep overhead doesn't accumulate
+                    wait = started + i * interval - time.perf_counter()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    delta = {"content": (" " if i else "") + WORDS[i % len(WORDS)]}
+                    if i == 0:
+                        delta["role"] = "assistant"
+                    yield chunk(delta)
+                yield chunk({}, "stop")
+
+            stats["completion_tokens"] += completion_tokens
+            if include_usage:
+                usage = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                        "prompt_tokens_details": {"cached_tokens": 0},
+                    },
+                }
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def add_config_arguments(parser, dest_prefix: str = "") -> None:
+    """Expose every FakeProviderConfig field as a --flag (shared with load_test.py)."""
+    for name, value in asdict(FakeProviderConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=dest_prefix + name, type=type(value), default=value)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeProviderConfig:
+    return FakeProviderConfig(**{name: getattr(args, name) for name in asdict(FakeProviderConfig())})
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
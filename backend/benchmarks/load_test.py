@@ -0,0 +1,389 @@
+"""End-to-end load test: concurrent uploads and chats against the FastAPI app.
+
+Starts benchmarks/fake_providers.py and the API (uvicorn) with the LLM,
+embedding and reranker endpoints pointed at the fakes, creates throwaway
+users in a local Supabase stack (`supabase start`; SUPABASE_URL,
+SUPABASE_ANON_KEY and SUPABASE_SERVICE_ROLE_KEY pointing at it, and an
+empty global_settings table so the env provider settings apply), then
+drives the scenarios and writes a JSON report for regression tracking:
+
+    python -m benchmarks.load_test --scenario upload chat --concurrency 20 \\
+        --requests 200 --ttft-ms 400 --tokens-per-second 60 --output report.json
+
+Pass --api-url to test an already running API instead (its providers must
+already point at the fakes, see --provider-url).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import get_settings
+from benchmarks.fake_providers import WORDS, add_config_arguments
+from benchmarks.reporting import summarize, write_report
+
+BACKEND_DIR = Path(__file__).parent.parent
+STARTUP_TIMEOUT_SECONDS = 60.0
+INGEST_POLL_INTERVAL_SECONDS = 0.5
+
+settings = get_settings()
+
+
+def make_document(index: int, articles: int) -> bytes:
+    """A unique Uzbek-style legal text (uploads with identical content are deduplicated)."""
+    lines = [f"# Benchmark qonuni {uuid.uuid4().hex[:8]}", ""]
+    for article in range(1, articles + 1):
+        body = " ".join(WORDS[(article + i) % len(WORDS)] for i in range(120))
+        lines += [f"{article}-modda. Hujjat {index}, band {article}", "", body, ""]
+    return "\n".join(lines).encode()
+
+
+async def wait_until_up(client: httpx.AsyncClient, url: str, process: subprocess.Popen | None) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Process serving {url} exited with code {process.returncode}")
+        try:
+            if (await client.get(url, timeout=2.0)).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+
+def start_fake_providers(args: argparse.Namespace) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.fake_providers", "--port", str(args.fake_port)]
+    for name, value in vars(args).items():
+        if name.startswith("fake_config_"):
+            command += [f"--{name.removeprefix('fake_config_').replace('_', '-')}", str(value)]
+    return subprocess.Popen(command, cwd=BACKEND_DIR)
+
+
+def start_api(args: argparse.Namespace, provider_url: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_BASE_URL": f"{provider_url}/v1",
+        "LLM_API_KEY": "fake",
+        "LLM_MODEL": "fake-chat",
+        "LLM_FALLBACK_PROVIDERS": "[]",
+        "EMBEDDING_BASE_URL": f"{provider_url}/v1",
+        "EMBEDDING_API_KEY": "fake",
+        "JINA_API_KEY": "fake",
+        "JINA_RERANK_ENABLED": "true" if args.rerank else "false",
+        "JINA_RERANK_URL": f"{provider_url}/v1/rerank",
+        "LANGSMITH_API_KEY": "",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": "",
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(args.api_port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+class BenchUsers:
+    """Throwaway auth users with bearer tokens; deleted (with their data) on cleanup."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.user_ids: list[str] = []
+        self.service_headers = {
+            "apikey": settings.supabase_service_role_key,
+            "Authorization": f"Bearer {settings.supabase_service_role_key}",
+        }
+
+    async def create(self, is_admin: bool = False) -> str:
+        """Create a user (its profile is created by trigger); return an access token."""
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        password = uuid.uuid4().hex
+        response = await self.client.post(
+            f"{settings.supabase_url}/auth/v1/admin/users",
+            headers=self.service_headers,
+            json={"email": email, "password": password, "email_confirm": True},
+        )
+        response.raise_for_status()
+        user_id = response.json()["id"]
+        self.user_ids.append(user_id)
+
+        if is_admin:
+            response = await self.client.patch(
+                f"{settings.supabase_url}/rest/v1/user_profiles",
+                params={"id": f"eq.{user_id}"},
+                headers=self.service_headers,
+                json={"is_admin": True},
+            )
+            response.raise_for_status()
+
+        response = await self.client.post(
+            f"{settings.supabase_url}/auth/v1/token",
+            params={"grant_type": "password"},
+            headers={"apikey": settings.supabase_anon_key},
+            json={"email": email, "password": password},
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    async def cleanup(self) -> None:
+        for user_id in self.user_ids:
+            await self.client.delete(f"{settings.supabase_url}/auth/v1/admin/users/{user_id}", headers=self.service_headers)
+
+
+class Recorder:
+    """Collects per-request timings for one scenario."""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.ttfts: list[float] = []
+        self.ingest: list[float] = []
+        self.errors = 0
+        self.ingest_errors = 0
+        self.error_samples: list[str] = []
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def error(self, message: str, ingest: bool = False) -> None:
+        if ingest:
+            self.ingest_errors += 1
+        else:
+            self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(message)
+
+    def report(self) -> dict:
+        duration = max(self.finished - self.started, 1e-9)
+        result = {
+            "requests": len(self.latencies) + self.errors,
+            "errors": self.errors,
+            "duration_s": round(duration, 2),
+            "throughput_rps": round(len(self.latencies) / duration, 2),
+            "latency_ms": summarize(self.latencies),
+        }
+        if self.ttfts:
+            result["ttft_ms"] = summarize(self.ttfts)
+        if self.ingest or self.ingest_errors:
+            result["ingest_ms"] = summarize(self.ingest)
+            result["ingest_errors"] = self.ingest_errors
+        if self.error_samples:
+            result["error_samples"] = self.error_samples
+        return result
+
+
+async def run_workers(concurrency: int, requests: int, task) -> None:
+    """Closed loop: concurrency workers share a budget of requests."""
+    remaining = iter(range(requests))
+
+    async def worker(worker_index: int):
+        for request_index in remaining:
+            await task(worker_index, request_index)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+async def upload_scenario(client: httpx.AsyncClient, api_url: str, admin_token: str, args: argparse.Namespace) -> dict:
+    """Concurrent uploads; latency is the upload request, ingest_ms is upload until status=completed."""
+    recorder = Recorder()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    pending: dict[str, float] = {}
+
+    async def upload(worker_index: int, request_index: int):
+        filename = f"bench-{uuid.uuid4().hex[:8]}-{request_index}.md"
+        content = make_document(request_index, args.articles)
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                f"{api_url}/documents/upload",
+                headers=headers,
+                files={"file": (filename, content, "text/markdown")},
+            )
+            response.raise_for_status()
+            recorder.latencies.append((time.perf_counter() - started) * 1000)
+            pending[response.json()["id"]] = started
+        except httpx.HTTPError as e:
+            recorder.error(f"upload: {e!r}")
+
+    async def poll_ingestion():
+        while pending or not uploads_done.is_set():
+            await asyncio.sleep(INGEST_POLL_INTERVAL_SECONDS)
+            try:
+                response = await client.get(f"{api_url}/documents", headers=headers)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                continue
+            now = time.perf_counter()
+            for document in response.json():
+                started = pending.get(document["id"])
+                if started is None:
+                    continue
+                if document["status"] == "completed":
+                    recorder.ingest.append((now - started) * 1000)
+                    del pending[document["id"]]
+                elif document["status"] == "failed":
+                    recorder.error(f"ingest: {document.get('error_message')}", ingest=True)
+                    del pending[document["id"]]
+
+    uploads_done = asyncio.Event()
+    poller = asyncio.create_task(poll_ingestion())
+    await run_workers(args.concurrency, args.requests, upload)
+    uploads_done.set()
+    try:
+        await asyncio.wait_for(poller, timeout=args.ingest_timeout)
+    except asyncio.TimeoutError:
+        for _ in pending:
+            recorder.error("ingest: timed out", ingest=True)
+    recorder.finished = time.perf_counter()
+    return recorder.report()
+
+
+async def chat_scenario(client: httpx.AsyncClient, api_url: str, tokens: list[str], args: argparse.Namespace) -> dict:
+    """Each worker is one user in its own thread; latency is send until the done event."""
+    recorder = Recorder()
+    threads: dict[int, str] = {}
+
+    async def send(worker_index: int, request_index: int):
+        headers = {"Authorization": f"Bearer {tokens[worker_index % len(tokens)]}"}
+        try:
+            if worker_index not in threads:
+                response = await client.post(f"{api_url}/threads", headers=headers, json={"title": "load test"})
+                response.raise_for_status()
+                threads[worker_index] = response.json()["id"]
+
+            question = " ".join(WORDS[(request_index + i) % len(WORDS)] for i in range(8)) + "?"
+            started = time.perf_counter()
+            first_token = None
+            event = None
+            async with client.stream(
+                "POST",
+                f"{api_url}/threads/{threads[worker_index]}/messages",
+                headers=headers,
+                json={"content": question},
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line.removeprefix("event: ")
+                        if event == "text_delta" and first_token is None:
+                            first_token = time.perf_counter()
+                    elif line.startswith("data: ") and event == "error":
+                        raise RuntimeError(json.loads(line.removeprefix("data: ")).get("error"))
+            if event != "done":
+                raise RuntimeError(f"stream ended after {event!r} without done")
+            recorder.latencies.append((time.perf_counter() - started) * 1000)
+            if first_token is not None:
+                recorder.ttfts.append((first_token - started) * 1000)
+        except (httpx.HTTPError, RuntimeError) as e:
+            recorder.error(f"chat: {e!r}")
+
+    await run_workers(args.concurrency, args.requests, send)
+    recorder.finished = time.perf_counter()
+    return recorder.report()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    processes: list[subprocess.Popen] = []
+    timeout = httpx.Timeout(args.request_timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.concurrency * 2 + 10)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        try:
+            provider_url = args.provider_url
+            if not provider_url:
+                provider_url = f"http://127.0.0.1:{args.fake_port}"
+                processes.append(start_fake_providers(args))
+                await wait_until_up(client, f"{provider_url}/health", processes[-1])
+
+            api_url = args.api_url
+            if not api_url:
+                api_url = f"http://127.0.0.1:{args.api_port}"
+                processes.append(start_api(args, provider_url))
+            await wait_until_up(client, f"{api_url}/ready", processes[-1] if not args.api_url else None)
+
+            users = BenchUsers(client)
+            try:
+                admin_token = await users.create(is_admin=True)
+                chat_tokens = [await users.create() for _ in range(min(args.users, args.concurrency))]
+
+                scenarios = {}
+                for scenario in args.scenario:
+                    print(f"Running {scenario} scenario...")
+                    if scenario == "upload":
+                        scenarios["upload"] = await upload_scenario(client, api_url, admin_token, args)
+                    elif scenario == "chat":
+                        scenarios["chat"] = await chat_scenario(client, api_url, chat_tokens, args)
+                    else:
+                        upload, chat = await asyncio.gather(
+                            upload_scenario(client, api_url, admin_token, args),
+                            chat_scenario(client, api_url, chat_tokens, args),
+                        )
+                        scenarios["mixed"] = {"upload": upload, "chat": chat}
+            finally:
+                if not args.keep_users:
+                    await users.cleanup()
+
+            provider_stats = (await client.get(f"{provider_url}/stats")).json()
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=30)
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parameters": {
+            "scenarios": args.scenario,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": args.users,
+            "workers": args.workers,
+            "rerank": args.rerank,
+            "articles_per_document": args.articles,
+        },
+        "providers": provider_stats,
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", nargs="+", choices=["upload", "chat", "mixed"], default=["upload", "chat"])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--users", type=int, default=10, help="Distinct chat users (capped at --concurrency)")
+    parser.add_argument("--articles", type=int, default=20, help="Articles per uploaded document")
+    parser.add_argument("--no-rerank", dest="rerank", action="store_false")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--api-url", help="Use a running API instead of starting one")
+    parser.add_argument("--api-port", type=int, default=8010)
+    parser.add_argument("--provider-url", help="Use running fake providers instead of starting them")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--ingest-timeout", type=float, default=300.0)
+    parser.add_argument("--keep-users", action="store_true", help="Don't delete the benchmark users and their data")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here (default: stdout)")
+    fake_options = parser.add_argument_group("fake providers")
+    add_config_arguments(fake_options, dest_prefix="fake_config_")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    write_report(report, args.output)
+
+    results = []
+    for name, result in report["scenarios"].items():
+        results += result.values() if name == "mixed" else [result]
+    failed = any(result["errors"] or result.get("ingest_errors") for result in results)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Shared result formatting for the benchmark scripts."""
+import json
+import statistics
+from pathlib import Path
+
+
+def summarize(values: list[float]) -> dict[str, float] | None:
+    """p50/p95/p99/mean/max in milliseconds, rounded for stable diffs."""
+    if not values:
+        return None
+    if len(values) == 1:
+        p50 = p95 = p99 = values[0]
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {
+        "p50": round(p50, 1),
+        "p95": round(p95, 1),
+        "p99": round(p99, 1),
+        "mean": round(statistics.mean(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def write_report(report: dict, output: Path | None) -> None:
+    """Write the JSON report to output, or print it."""
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+        print(f"Report written to {output}")
+    else:
+        print(text)
@@ -0,0 +1,72 @@
+"""Shared pytest setup for the backend test suite."""
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are validated on import; the tests never reach Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+# Keep test runs from writing logs/rag_debug.log inside the tree
+os.environ.setdefault("LOG_FILE", "")
+
+
+class StampsSupabase:
+    """
+    Supabase client stand-in for index syncs: answers the chunk_document_stamps
+    RPC from document -> [chunk count, generation] stamps, as the
+    trigger-maintained document_chunk_stamps table would.
+    """
+
+    def __init__(self, chunk_counts: dict[str, int]):
+        self.generation = 1
+        self.stamps = {document_id: [count, self.generation] for document_id, count in chunk_counts.items()}
+        self.requests: list[int | None] = []
+
+    def change(self, document_id: str, chunk_count: int) -> None:
+        """Record a chunk change (chunk_count 0: all chunks deleted) in a new generation."""
+        self.generation += 1
+        self.stamps[document_id] = [chunk_count, self.generation]
+
+    def rpc(self, name, params):
+        since = params["since_generation"]
+        self.requests.append(since)
+        stamps = {
+            document_id: stamp for document_id, stamp in self.stamps.items()
+            if (stamp[0] > 0 if since is None else stamp[1] > since)
+        }
+        data = {"generation": self.generation, "stamps": stamps}
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+
+@pytest.fixture
+def index_workers(tmp_path, monkeypatch):
+    """
+    Factory for index replicas ("workers") sharing one snapshot directory.
+
+    setup(module, index_class, fetch, chunk_counts) patches module's corpus
+    generation (1) and the stamps RPC, and returns (make, supabase):
+    make() builds an index whose chunk fetch is replaced by fetch.
+    """
+    from app.services import corpus_state
+
+    def setup(module, index_class, fetch, chunk_counts: dict[str, int]):
+        monkeypatch.setattr(module, "BACKEND_DIR", tmp_path)
+        monkeypatch.setattr(module, "get_corpus_generation", lambda: 1)
+        supabase = StampsSupabase(chunk_counts)
+        monkeypatch.setattr(corpus_state, "get_supabase_client", lambda: supabase)
+
+        def make():
+            index = index_class()
+            index._fetch_chunks = fetch
+            return index
+
+        return make, supabase
+
+    return setup
@@ -0,0 +1,44 @@
+"""Tests for app.services.answer_cache."""
+from app.services.answer_cache import SemanticAnswerCache, question_numbers
+
+
+def make_cache() -> SemanticAnswerCache:
+    return SemanticAnswerCache(max_entries=8, ttl_seconds=3600, similarity_threshold=0.97)
+
+
+def test_question_numbers_treat_superscripts_as_parts():
+    assert question_numbers("509⁶-moddasi nima?") == {"509-6"}
+    assert question_numbers("509-6-modda") == {"509-6"}
+    assert question_numbers("Davlat xaridlari qonunining 46-moddasi") == {"46"}
+
+
+def test_lookup_requires_matching_article_numbers():
+    cache = make_cache()
+    embedding = [0.6, 0.8, 0.0]
+    cache.store("Davlat xaridlari qonunining 46-moddasi", embedding, "answer 46", "gpt-4o", 1)
+
+    assert cache.lookup("Davlat xaridlari qonunining 47-moddasi", embedding, "gpt-4o", 1) is None
+    hit = cache.lookup("Davlat xaridlari qonunining 46-moddasi?", embedding, "gpt-4o", 1)
+    assert hit is not None
+    assert hit[0].answer == "answer 46"
+    assert hit[1] > 0.999
+
+
+def test_lookup_picks_most_similar_entry_above_threshold():
+    cache = make_cache()
+    cache.store("savol", [1.0, 0.0, 0.0], "first", "gpt-4o", 1)
+    cache.store("savol", [0.0, 1.0, 0.0], "second", "gpt-4o", 1)
+
+    hit = cache.lookup("savol", [0.1, 0.99, 0.0], "gpt-4o", 1)
+    assert hit is not None and hit[0].answer == "second"
+    assert cache.lookup("savol", [0.7, 0.7, 0.0], "gpt-4o", 1) is None
+
+
+def test_lookup_ignores_other_models_and_generations():
+    cache = make_cache()
+    cache.store("savol", [1.0, 0.0], "fallback answer", "fallback-model", 1)
+
+    assert cache.lookup("savol", [1.0, 0.0], "gpt-4o", 1) is None
+    assert cache.lookup("savol", [1.0, 0.0], "fallback-model", 2) is None
+    # The stale generation was evicted by the previous lookup
+    assert cache.stats()["size"] == 0
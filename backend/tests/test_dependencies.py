@@ -0,0 +1,91 @@
+"""Tests for JWT verification in app.dependencies."""
+import asyncio
+import time
+
+import pytest
+from jose import JWTError, jwt
+
+from app import dependencies
+
+
+class FakeResponse:
+    def __init__(self, keys: list[dict]):
+        self.keys = keys
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"keys": self.keys}
+
+
+class FakeHTTPClient:
+    def __init__(self):
+        self.fetches = 0
+
+    async def get(self, url, **kwargs):
+        self.fetches += 1
+        return FakeResponse([{"kid": "known", "kty": "EC"}])
+
+
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    monkeypatch.setattr(dependencies, "_jwks", {"keys": [], "fetched_at": 0.0, "forced_at": float("-inf")})
+    monkeypatch.setattr(dependencies.get_settings(), "supabase_jwt_secret", "")
+    dependencies.verified_token_cache.clear()
+
+
+def test_hs256_without_secret_is_not_trusted_unverified(monkeypatch):
+    class RejectingAuth:
+        def get_user(self, token):
+            raise Exception("invalid JWT")
+
+    class FakeClient:
+        auth = RejectingAuth()
+
+    monkeypatch.setattr(dependencies, "get_supabase_client", lambda: FakeClient())
+    forged = jwt.encode({"sub": "someone-else", "aud": "authenticated"}, "guessed-secret", algorithm="HS256")
+
+    with pytest.raises(JWTError):
+        asyncio.run(dependencies.decode_token(forged))
+
+
+def test_hs256_without_secret_is_verified_by_auth_server_and_cached(monkeypatch):
+    calls = []
+
+    class User:
+        id = "user-1"
+
+    class Response:
+        user = User()
+
+    class AcceptingAuth:
+        def get_user(self, token):
+            calls.append(token)
+            return Response()
+
+    class FakeClient:
+        auth = AcceptingAuth()
+
+    monkeypatch.setattr(dependencies, "get_supabase_client", lambda: FakeClient())
+    token = jwt.encode(
+        {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 600}, "server-secret", algorithm="HS256"
+    )
+
+    assert asyncio.run(dependencies.decode_token(token))["sub"] == "user-1"
+    assert asyncio.run(dependencies.decode_token(token))["sub"] == "user-1"
+    assert len(calls) == 1
+
+
+def test_unknown_kid_forces_at_most_one_jwks_fetch_per_interval(monkeypatch):
+    client = FakeHTTPClient()
+    monkeypatch.setattr(dependencies, "get_http_client", lambda: client)
+    # Signing ES256 needs a real EC key; only the header matters here
+    monkeypatch.setattr(dependencies.jwt, "get_unverified_header", lambda _token: {"alg": "ES256", "kid": "made-up"})
+
+    for _ in range(5):
+        with pytest.raises(JWTError):
+            asyncio.run(dependencies.decode_token("header.claims.signature"))
+
+    # One regular fetch to populate the cache, one forced refresh for the unknown kid
+    assert client.fetches == 2
@@ -0,0 +1,135 @@
+"""Tests for the in-process vector and keyword index replicas: snapshot sharing and freshness."""
+import uuid
+
+import numpy as np
+import pytest
+
+from app.config import get_settings
+from app.services import keyword_index, snapshots, vector_index
+from app.services.corpus_state import fetch_stamp_changes
+from app.services.keyword_index import KeywordIndex
+from app.services.vector_index import VectorIndex
+
+DIMENSIONS = 4
+DOCUMENTS = [str(uuid.UUID(int=n)) for n in range(1, 4)]
+CHUNKS_PER_DOCUMENT = 2
+
+
+def fetch_vectors(document_ids):
+    rng = np.random.default_rng(len(document_ids))
+    vectors = rng.standard_normal((len(document_ids) * CHUNKS_PER_DOCUMENT, DIMENSIONS)).astype(np.float32)
+    ids = np.array([uuid.uuid4().bytes for _ in range(len(vectors))], dtype="S16")
+    documents = np.array(
+        [uuid.UUID(d).bytes for d in document_ids for _ in range(CHUNKS_PER_DOCUMENT)], dtype="S16"
+    )
+    return vector_index._normalize(vectors), ids, documents
+
+
+def fetch_contents(document_ids):
+    for document_id in document_ids:
+        yield (
+            [str(uuid.uuid4()) for _ in range(CHUNKS_PER_DOCUMENT)],
+            [document_id] * CHUNKS_PER_DOCUMENT,
+            ["509⁶-modda", "Maʼmuriy javobgarlik"],
+        )
+
+
+REPLICAS = [
+    pytest.param((vector_index, VectorIndex, fetch_vectors, "vector_index_compact_rows"), id="vector"),
+    pytest.param((keyword_index, KeywordIndex, fetch_contents, "keyword_index_compact_rows"), id="keyword"),
+]
+
+
+@pytest.fixture(params=REPLICAS)
+def replica(request, index_workers, monkeypatch):
+    """(make, supabase, compact_rows setting) for each replica class."""
+    module, index_class, fetch, compact_rows_setting = request.param
+    monkeypatch.setattr(get_settings(), "vector_index_dimensions", DIMENSIONS)
+    make, supabase = index_workers(module, index_class, fetch, {document_id: CHUNKS_PER_DOCUMENT for document_id in DOCUMENTS})
+    return make, supabase, compact_rows_setting
+
+
+def test_second_worker_loads_published_snapshot_instead_of_writing(replica):
+    make, _, _ = replica
+    first, second = make(), make()
+    first.sync()
+    second.sync()
+
+    assert first.snapshots_written == 1
+    assert second.snapshots_written == 0
+    assert second.stats()["snapshot"] == first.stats()["snapshot"]
+    assert second.stats()["rows"] == len(DOCUMENTS) * CHUNKS_PER_DOCUMENT
+    assert [entry.name for entry in first.path.iterdir() if entry.is_dir()] == [first.stats()["snapshot"]]
+
+
+def test_superseded_snapshots_are_kept_for_the_grace_period(replica, monkeypatch):
+    make, supabase, compact_rows_setting = replica
+    monkeypatch.setattr(get_settings(), compact_rows_setting, 1)
+    first, second = make(), make()
+    first.sync()
+    old = first.stats()["snapshot"]
+
+    supabase.change(DOCUMENTS[0], CHUNKS_PER_DOCUMENT)
+    second.sync()
+    new = second.stats()["snapshot"]
+    path = second.path
+    assert new != old
+    # Still loadable by a worker that read CURRENT before it moved
+    assert (path / old / "meta.json").exists()
+    assert (path / old / snapshots.SUPERSEDED_MARKER).exists()
+
+    monkeypatch.setattr(snapshots, "SNAPSHOT_GRACE_SECONDS", 0)
+    with snapshots.snapshot_lock(path):
+        snapshots.remove_superseded(path, new)
+    assert not (path / old).exists()
+    assert (path / new / "meta.json").exists()
+
+
+def test_sync_fetches_only_documents_changed_since_the_last_sync(replica):
+    make, supabase, _ = replica
+    index = make()
+    fetched = []
+    fetch = index._fetch_chunks
+    index._fetch_chunks = lambda document_ids: fetched.append(list(document_ids)) or fetch(document_ids)
+
+    index.sync()
+    supabase.change(DOCUMENTS[1], CHUNKS_PER_DOCUMENT)
+    index.sync()
+    supabase.change(DOCUMENTS[2], 0)  # document deleted
+    index.sync()
+    index.sync()
+
+    assert supabase.requests == [None, 1, 2, 3]
+    assert fetched == [DOCUMENTS, [DOCUMENTS[1]], []]
+    assert index.stats()["rows"] == 2 * CHUNKS_PER_DOCUMENT
+    stamps = index._stamps if isinstance(index, KeywordIndex) else index._current[0].stamps
+    assert sorted(stamps) == DOCUMENTS[:2]
+
+
+def test_stamps_are_refetched_in_full_when_the_database_generation_goes_back(index_workers):
+    _, supabase = index_workers(keyword_index, KeywordIndex, fetch_contents, {DOCUMENTS[0]: 1, DOCUMENTS[1]: 1})
+    stamps = {DOCUMENTS[0]: [1, 1], DOCUMENTS[2]: [1, 1]}
+
+    changed, removed, merged, generation = fetch_stamp_changes(stamps, since_generation=5)
+
+    assert supabase.requests == [5, None]
+    assert changed == [DOCUMENTS[1]]
+    assert removed == [DOCUMENTS[2]]
+    assert merged == {DOCUMENTS[0]: [1, 1], DOCUMENTS[1]: [1, 1]}
+    assert generation == 1
+
+
+def test_vector_search_uses_the_generation_published_with_the_state(index_workers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "vector_index_dimensions", DIMENSIONS)
+    make, _ = index_workers(
+        vector_index, VectorIndex, fetch_vectors, {document_id: CHUNKS_PER_DOCUMENT for document_id in DOCUMENTS}
+    )
+    index = make()
+    index.request_sync = lambda: None
+    index.sync()
+    query = np.asarray(index._current[0].vectors[0], dtype=np.float32).tolist()
+    assert index.search(query, 3, 0.0)
+
+    monkeypatch.setattr(vector_index, "get_corpus_generation", lambda: 2)
+    assert index.search(query, 3, 0.0) is None
+    assert index.stats()["generation"] == 1
@@ -0,0 +1,43 @@
+"""Tests for app.services.keyword_index."""
+import uuid
+
+from app.services.extraction_service import normalize_text
+from app.services.keyword_index import KeywordIndex, tokenize, tokenize_query
+
+DOCUMENT = str(uuid.UUID(int=1))
+ARTICLE = str(uuid.UUID(int=11))
+OTHER = str(uuid.UUID(int=12))
+
+
+def test_tokenize_splits_article_numbers_and_stems_suffixes():
+    text = normalize_text("509⁶-modda. Maʼmuriy javobgarlik oʻz moddalarda yerga")
+    assert tokenize(text) == [
+        "509", "6", "509-6", "509", "6", "modda", "mamuriy", "javobgarlik", "oz", "modda", "yerga",
+    ]
+
+
+def test_query_tokens_match_content_tokens():
+    assert tokenize_query("509⁶-moddada ma'muriy") == ["509", "6", "509-6", "509", "6", "modda", "mamuriy"]
+    assert tokenize_query("509-6 moddalarda") == ["509-6", "509", "6", "modda"]
+
+
+def test_score_ranks_article_for_superscript_and_suffixed_queries():
+    index = KeywordIndex()
+    index.add(
+        [ARTICLE, OTHER],
+        [DOCUMENT, DOCUMENT],
+        [
+            normalize_text("509⁶-modda. Maʼmuriy javobgarlik"),
+            normalize_text("12-modda. Yer uchastkalari"),
+        ],
+    )
+
+    for query in ("509⁶", "509-6", "moddalarda 509⁶"):
+        results = index.score(query, 10)
+        assert results[0][0] == ARTICLE
+        assert results[0][1] > 0
+
+    # "moddalarda" stems to "modda", which both chunks contain
+    assert {chunk_id for chunk_id, _ in index.score("moddalarda", 10)} == {ARTICLE, OTHER}
+    assert index.score("12-moddaga", 10)[0][0] == OTHER
+
@@ -0,0 +1,126 @@
+"""Tests for app.services.langsmith."""
+import asyncio
+
+from app.services import langsmith
+from app.services.langsmith import TraceExporter, TraceRun, truncate_payload
+
+
+def test_truncate_payload_cuts_long_strings_and_lists():
+    texts = ["x" * 5000 for _ in range(50)]
+    payload = truncate_payload({"input": texts, "model": "text-embedding-3-small"})
+
+    assert payload["model"] == "text-embedding-3-small"
+    assert len(payload["input"]) == 21
+    assert payload["input"][-1] == "... [30 more items]"
+    assert payload["input"][0] == "x" * 1000 + "... [4000 more chars]"
+    # The caller's data is untouched
+    assert len(texts) == 50 and len(texts[0]) == 5000
+
+
+def test_runs_are_truncated_before_queueing(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(langsmith.exporter, "submit", submitted.append)
+
+    run = TraceRun("Embeddings", "embedding", {"input": ["y" * 5000] * 50}, {}, sampled=True)
+    run.end({"content": "z" * 3000})
+
+    (queued,) = submitted
+    assert len(queued["inputs"]["input"]) == 21
+    assert len(queued["outputs"]["content"]) < 1100
+
+
+class FakeClient:
+    def __init__(self, fail_first: int = 0):
+        self.batches: list[list] = []
+        self.fail_first = fail_first
+
+    def batch_ingest_runs(self, create):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise ConnectionError("LangSmith unreachable")
+        self.batches.append(list(create))
+
+
+def make_exporter(client: FakeClient, **options) -> TraceExporter:
+    exporter = TraceExporter(**{"max_queue": 100, "batch_size": 10, "flush_interval": 0.01, **options})
+    exporter._client = client
+    return exporter
+
+
+def test_submit_drops_runs_when_queue_is_full():
+    client = FakeClient()
+    exporter = make_exporter(client, max_queue=2)
+
+    async def scenario():
+        for i in range(5):
+            exporter.submit({"id": i})
+        await exporter.stop()
+
+    asyncio.run(scenario())
+    assert exporter.dropped == 3
+    assert exporter.exported == 2
+    assert client.batches == [[{"id": 0}, {"id": 1}]]
+
+
+def test_runs_are_sent_in_batches_of_batch_size():
+    client = FakeClient()
+    exporter = make_exporter(client, batch_size=3)
+
+    async def scenario():
+        for i in range(7):
+            exporter.submit({"id": i})
+        await exporter.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in client.batches] == [3, 3, 1]
+    assert exporter.exported == 7
+
+
+def test_partial_batch_is_sent_after_flush_interval():
+    client = FakeClient()
+    exporter = make_exporter(client, batch_size=50, flush_interval=0.05)
+
+    async def scenario():
+        exporter.submit({"id": 0})
+        await asyncio.sleep(0.01)
+        assert client.batches == []
+        await asyncio.sleep(0.2)
+        assert client.batches == [[{"id": 0}]]
+        await exporter.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_export_is_counted_and_worker_keeps_running():
+    client = FakeClient(fail_first=1)
+    exporter = make_exporter(client)
+
+    async def scenario():
+        exporter.submit({"id": 0})
+        exporter.submit({"id": 1})
+        await asyncio.sleep(0.1)
+        assert exporter.failed == 2
+        assert not exporter._worker.done()
+        exporter.submit({"id": 2})
+        await exporter.stop()
+
+    asyncio.run(scenario())
+    assert exporter.exported == 1
+    assert client.batches == [[{"id": 2}]]
+
+
+def test_start_run_samples_per_operation(monkeypatch):
+    monkeypatch.setattr(langsmith.settings, "langsmith_api_key", "key")
+    monkeypatch.setattr(langsmith, "SAMPLE_RATES", {"chat": 1.0, "embeddings": 0.0, "ingestion": 0.5})
+
+    assert langsmith.start_run("Chat", "chat").sampled
+    assert not langsmith.start_run("Embeddings", "embeddings").sampled
+
+    monkeypatch.setattr(langsmith.random, "random", lambda: 0.3)
+    assert langsmith.start_run("Ingestion", "ingestion").sampled
+    monkeypatch.setattr(langsmith.random, "random", lambda: 0.7)
+    assert not langsmith.start_run("Ingestion", "ingestion").sampled
+
+    # No API key: nothing is sampled, whatever the rate
+    monkeypatch.setattr(langsmith.settings, "langsmith_api_key", "")
+    assert not langsmith.start_run("Chat", "chat").sampled
@@ -0,0 +1,144 @@
+"""Tests for app.services.llm_providers."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_providers
+from app.services.llm_providers import CircuitBreaker, LLMProvider, start_stream
+from app.services.scheduler import Priority, UpstreamScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_success()
+    # A success resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # trial already in flight
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_released_trial_can_be_retried():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    assert breaker.allow()
+    breaker.release()  # e.g. a losing hedge
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def chunk(content: str | None = None, role: str | None = None, finish_reason: str | None = None):
+    delta = SimpleNamespace(content=content, role=role, tool_calls=None)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+class FakeStream:
+    """Yields a role-only delta, then text after a delay."""
+
+    def __init__(self, delay: float, role_delay: float = 0.0):
+        self.delay = delay
+        self.role_delay = role_delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        await asyncio.sleep(self.role_delay)
+        yield chunk(role="assistant", content="")
+        await asyncio.sleep(self.delay)
+        yield chunk("46-modda")
+        yield chunk(finish_reason="stop")
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(llm_providers, "_breakers", {})
+
+
+def test_hedge_waits_for_first_token_not_role_delta_and_takes_a_slot():
+    primary = LLMProvider("http://primary.test/v1", "key", "model-a")
+    fallback = LLMProvider("http://fallback.test/v1", "key", "model-b")
+    # The primary sends its role delta at once but the first token only after 1s
+    streams = {primary: FakeStream(delay=1.0), fallback: FakeStream(delay=0.0)}
+
+    async def open_stream(provider):
+        return streams[provider]
+
+    async def scenario():
+        scheduler = UpstreamScheduler("test", max_concurrency=2)
+        held = await scheduler.acquire(Priority.INTERACTIVE)
+        started = await start_stream([primary, fallback], open_stream, 0.05, scheduler, Priority.INTERACTIVE)
+        running = scheduler.stats()["interactive"]["running"]
+        admitted = scheduler.stats()["interactive"]["admitted"]
+        scheduler.release(held)
+        await asyncio.sleep(0.01)  # let the losing attempt close
+        return started, running, admitted
+
+    started, running, admitted = asyncio.run(scenario())
+    assert started.provider == fallback
+    assert [c.choices[0].delta.content for c in started.first_chunks] == ["", "46-modda"]
+    # The hedge took a second slot and gave it back once it won
+    assert admitted == 2
+    assert running == 1
+    assert streams[primary].closed
+
+
+def test_no_hedge_without_a_free_slot():
+    primary = LLMProvider("http://primary.test/v1", "key", "model-a")
+    fallback = LLMProvider("http://fallback.test/v1", "key", "model-b")
+    streams = {primary: FakeStream(delay=0.2), fallback: FakeStream(delay=0.0)}
+
+    async def open_stream(provider):
+        return streams[provider]
+
+    async def scenario():
+        scheduler = UpstreamScheduler("test", max_concurrency=1)
+        held = await scheduler.acquire(Priority.INTERACTIVE)
+        started = await start_stream([primary, fallback], open_stream, 0.05, scheduler, Priority.INTERACTIVE)
+        scheduler.release(held)
+        return started, scheduler.stats()["interactive"]
+
+    started, stats = asyncio.run(scenario())
+    assert started.provider == primary
+    assert stats["admitted"] == 1 and stats["running"] == 0
@@ -0,0 +1,91 @@
+"""Tests for app.services.persistence_queue."""
+import asyncio
+import json
+
+from app.services import persistence_queue as module
+from app.services.persistence_queue import WriteBehindQueue
+
+
+def make_queue(tmp_path, max_attempts: int = 3) -> WriteBehindQueue:
+    return WriteBehindQueue(
+        max_attempts=max_attempts, retry_base_delay=0.05, dead_letter_path=str(tmp_path / "failed.jsonl")
+    )
+
+
+def test_failing_write_does_not_block_later_messages(tmp_path, monkeypatch):
+    written = []
+
+    def persist(job):
+        if job["thread_id"] == "broken":
+            raise RuntimeError("connection reset")
+        written.append(job["thread_id"])
+
+    monkeypatch.setattr(module, "_persist", persist)
+
+    async def scenario():
+        queue = make_queue(tmp_path, max_attempts=5)
+        queue.enqueue_assistant_message("broken", "user", "first")
+        queue.enqueue_assistant_message("healthy", "user", "second")
+        # Well before the broken job's 0.05 + 0.1 + 0.2 + 0.4 s of backoff
+        await asyncio.sleep(0.03)
+        assert written == ["healthy"]
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.stats()["persisted"] == 1
+    assert queue.stats()["failed"] == 1
+
+
+def test_exhausted_jobs_are_dead_lettered_and_replayed(tmp_path, monkeypatch):
+    def fail(job):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(module, "_persist", fail)
+
+    async def first_run():
+        queue = make_queue(tmp_path)
+        message_id = queue.enqueue_assistant_message("thread-1", "user", "answer")
+        await queue.stop()
+        return message_id
+
+    message_id = asyncio.run(first_run())
+    lines = (tmp_path / "failed.jsonl").read_text().splitlines()
+    assert [json.loads(line)["message"]["id"] for line in lines] == [message_id]
+
+    written = []
+    monkeypatch.setattr(module, "_persist", lambda job: written.append(job["message"]["id"]))
+
+    async def second_run():
+        queue = make_queue(tmp_path)
+        queue.start()
+        await queue.stop()
+        await asyncio.sleep(0)  # let the replay file be removed
+        return queue
+
+    queue = asyncio.run(second_run())
+    assert written == [message_id]
+    assert queue.stats()["replayed"] == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_wait_for_thread_returns_after_pending_write(tmp_path, monkeypatch):
+    written = []
+
+    def slow_persist(job):
+        import time
+        time.sleep(0.05)
+        written.append(job["thread_id"])
+
+    monkeypatch.setattr(module, "_persist", slow_persist)
+
+    async def scenario():
+        queue = make_queue(tmp_path)
+        queue.enqueue_assistant_message("thread-1", "user", "answer")
+        await queue.wait_for_thread("thread-1", timeout=5)
+        seen = list(written)
+        # Nothing pending for other threads
+        await asyncio.wait_for(queue.wait_for_thread("thread-2", timeout=5), timeout=0.01)
+        return seen
+
+    assert asyncio.run(scenario()) == ["thread-1"]
@@ -0,0 +1,36 @@
+"""Tests for the /ready probe."""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import warmup
+
+
+def test_ready_reports_step_outcomes_without_error_details(monkeypatch, caplog):
+    async def failing_step():
+        raise RuntimeError("connection to db.internal:5432 refused (password=hunter2)")
+
+    async def ok_step():
+        pass
+
+    monkeypatch.setattr(warmup, "WARMUP_STEPS", [("global_settings", ok_step), ("jwks", failing_step)])
+    monkeypatch.setitem(warmup.warmup_state, "steps", {})
+    monkeypatch.setitem(warmup.warmup_state, "ready", False)
+    monkeypatch.setitem(warmup.warmup_state, "duration_ms", None)
+    asyncio.run(warmup.warm_up())
+
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "ready": True, "steps": {"global_settings": True, "jwks": False}}
+    assert "RuntimeError: connection to db.internal:5432 refused (password=***)" in caplog.text
+    assert "hunter2" not in caplog.text
+
+
+def test_redact_masks_dsn_and_key_value_credentials():
+    assert warmup.redact("could not connect to postgresql://app:s3cret@db:5432/rag") == (
+        "could not connect to postgresql://***@db:5432/rag"
+    )
+    assert warmup.redact("401: api_key=sk-abc123, token: eyJhbGci") == "401: api_key=***, token: ***"
+    assert warmup.redact("Authorization: Bearer eyJhbGci rejected") == "Authorization: *** rejected"
+    assert warmup.redact("timed out after 5s") == "timed out after 5s"
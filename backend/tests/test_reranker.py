@@ -0,0 +1,45 @@
+"""Tests for app.services.reranker_service."""
+import asyncio
+
+from app.services import reranker_service
+
+
+class FakeResponse:
+    def __init__(self, results):
+        self._results = results
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"results": self._results}
+
+
+class FakeClient:
+    def __init__(self):
+        self.documents = None
+
+    async def post(self, url, json, **kwargs):
+        self.documents = json["documents"]
+        # Only the first document is relevant
+        return FakeResponse([{"index": 0, "relevance_score": 0.91}])
+
+
+def test_withheld_chunks_rank_below_scored_ones(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(reranker_service, "get_http_client", lambda: client)
+    monkeypatch.setattr(
+        reranker_service, "get_reranker_settings",
+        lambda: {"api_key": "key", "model": "jina", "enabled": True, "url": "http://rerank.test"},
+    )
+    # Only two documents fit the payload cap
+    monkeypatch.setattr(reranker_service, "cap_rerank_documents", lambda chunks: [c["content"] for c in chunks[:2]])
+    chunks = [{"id": str(i), "content": f"modda {i}", "rrf_score": 0.03 - i * 0.001} for i in range(5)]
+
+    reranked = asyncio.run(reranker_service.rerank_chunks("modda", chunks, top_n=3))
+
+    assert [c["id"] for c in reranked] == ["0", "2", "3"]
+    assert reranked[0]["rerank_score"] == 0.91 and "rerank_withheld" not in reranked[0]
+    assert all(c["rerank_withheld"] and c["rerank_score"] == 0.0 for c in reranked[1:])
+    # The input chunks are not modified
+    assert "rerank_score" not in chunks[2]
@@ -0,0 +1,68 @@
+"""Tests for app.services.retrieval_service."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import retrieval_service
+from app.services.retrieval_service import MIN_CHUNK_OVERLAP_CHARS, merge_chunk_texts, normalize_query
+
+
+def test_normalize_query_folds_curly_quotes_like_other_apostrophes():
+    expected = "o'z ma'muriy"
+    assert normalize_query("o‘z ma’muriy") == expected
+    assert normalize_query("oʻz maʼmuriy") == expected
+    assert normalize_query("o'z  ma'muriy ") == expected
+
+
+def test_normalize_query_spaces_superscripts():
+    assert normalize_query("509⁶-modda") == "509 6-modda"
+
+
+def test_merge_chunk_texts_removes_overlap():
+    first = "Birinchi qism matni. " + "Takrorlanadigan qism matni shu yerda."
+    second = "Takrorlanadigan qism matni shu yerda." + " Ikkinchi qism davomi."
+    assert merge_chunk_texts([first, second]) == (
+        "Birinchi qism matni. Takrorlanadigan qism matni shu yerda. Ikkinchi qism davomi."
+    )
+
+
+def test_merge_chunk_texts_keeps_short_matches_as_separate_paragraphs():
+    shared = "x" * (MIN_CHUNK_OVERLAP_CHARS - 1)
+    assert merge_chunk_texts(["abc " + shared, shared + " def"]) == f"abc {shared}\n\n{shared} def"
+
+
+def test_merge_chunk_texts_single_and_empty():
+    assert merge_chunk_texts([]) == ""
+    assert merge_chunk_texts(["faqat bitta"]) == "faqat bitta"
+
+
+class RecordingSupabase:
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=[]))
+
+
+@pytest.mark.parametrize("vector_index_setting", ["halfvec", "binary"])
+def test_keyword_replica_keeps_quantized_vector_scan(monkeypatch, vector_index_setting):
+    from app.services.keyword_index import keyword_index
+
+    supabase = RecordingSupabase()
+    monkeypatch.setattr(retrieval_service, "get_supabase_client", lambda: supabase)
+    monkeypatch.setattr(retrieval_service._settings, "keyword_index_enabled", True)
+    monkeypatch.setattr(retrieval_service._settings, "vector_index_enabled", False)
+    monkeypatch.setattr(retrieval_service._settings, "search_vector_index", vector_index_setting)
+    monkeypatch.setattr(retrieval_service._settings, "search_rescore_factor", 6)
+    monkeypatch.setattr(keyword_index, "search", lambda query, match_count: [("chunk-1", 2.5)])
+
+    retrieval_service._hybrid_search_rpc(
+        "509⁶-modda", "509 6-modda", [0.1] * 4, "user-1", 0.3, None, match_count=20, final_count=20, rrf_k=60
+    )
+
+    (name, params), = supabase.calls
+    assert name == "hybrid_search_chunks_with_keyword_candidates"
+    assert params["quantization"] == vector_index_setting
+    assert params["rescore_factor"] == 6
+    assert params["keyword_ids"] == ["chunk-1"]
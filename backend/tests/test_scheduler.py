@@ -0,0 +1,117 @@
+"""Tests for app.services.scheduler and the LLM stream's admission slot."""
+import asyncio
+from types import SimpleNamespace
+
+from app.services import llm_service
+from app.services.llm_providers import StartedStream
+from app.services.scheduler import Priority, UpstreamScheduler, llm_scheduler
+
+
+def test_interactive_waiters_are_admitted_before_batch():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", max_concurrency=1)
+        order = []
+        holder = await scheduler.acquire(Priority.BATCH)
+
+        async def call(name: str, priority: Priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        waiters = [
+            asyncio.create_task(call("batch-1", Priority.BATCH)),
+            asyncio.create_task(call("batch-2", Priority.BATCH)),
+            asyncio.create_task(call("chat", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)  # all three are queued now
+        scheduler.release(holder)
+        await asyncio.gather(*waiters)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["chat", "batch-1", "batch-2"]
+    assert stats["interactive"]["running"] == 0
+    assert stats["batch"]["running"] == 0
+
+
+def test_batch_work_is_capped_below_max_concurrency():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", max_concurrency=2, batch_max_concurrency=1)
+        await scheduler.acquire(Priority.BATCH)
+        second_batch = asyncio.create_task(scheduler.acquire(Priority.BATCH))
+        await asyncio.sleep(0)
+        # The remaining slot stays free for interactive work
+        chat = await asyncio.wait_for(scheduler.acquire(Priority.INTERACTIVE), timeout=1)
+        blocked = not second_batch.done()
+        second_batch.cancel()
+        return chat, blocked
+
+    chat, blocked = asyncio.run(scenario())
+    assert chat == Priority.INTERACTIVE
+    assert blocked
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", max_concurrency=1)
+        holder = await scheduler.acquire(Priority.INTERACTIVE)
+        waiter = asyncio.create_task(scheduler.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release(holder)
+        return await asyncio.wait_for(scheduler.acquire(Priority.INTERACTIVE), timeout=1)
+
+    assert asyncio.run(scenario()) == Priority.INTERACTIVE
+
+
+def chunk(content: str | None = None, finish_reason: str | None = None):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        self.closed = True
+
+
+def test_llm_slot_is_released_when_the_stream_generator_is_closed(monkeypatch):
+    stream = FakeStream([chunk(" modda") for _ in range(10)] + [chunk(finish_reason="stop")])
+
+    async def start_stream(providers, open_stream, hedge_after_seconds, scheduler, priority):
+        chunks = stream.__aiter__()
+        return StartedStream(providers[0], stream, chunks, [await chunks.__anext__()])
+
+    monkeypatch.setattr(
+        llm_service, "get_global_llm_settings",
+        lambda: {"api_key": "test", "base_url": "http://llm.test/v1", "model": "test-model"},
+    )
+    monkeypatch.setattr(llm_service, "start_stream", start_stream)
+
+    async def scenario():
+        events = llm_service.astream_chat_response([{"role": "user", "content": "46-modda"}])
+        first = await events.__anext__()
+        running_while_streaming = llm_scheduler.stats()["interactive"]["running"]
+        # Client disconnected: the chat handler's generator is closed mid-stream
+        await events.aclose()
+        return first, running_while_streaming, llm_scheduler.stats()["interactive"]["running"]
+
+    first, running_while_streaming, running_after_close = asyncio.run(scenario())
+    assert first == {"type": "text_delta", "content": " modda"}
+    assert running_while_streaming == 1
+    assert running_after_close == 0
+    assert stream.closed
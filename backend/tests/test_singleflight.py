@@ -0,0 +1,101 @@
+"""Tests for app.services.singleflight."""
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats()["executions"] == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_exception_propagates_to_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        return flight, await asyncio.gather(
+            *(flight.do("key", work) for _ in range(3)), return_exceptions=True
+        )
+
+    flight, results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["executions"] == 1
+    # A failed call is forgotten, so the next caller retries
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelling_one_waiter_keeps_the_shared_call_running():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "result"
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await started.wait()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "result"
+
+
+def test_cancelling_last_waiter_cancels_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flight.do("key", work))
+        await started.wait()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        # A fresh caller starts a new call instead of joining the cancelled one
+        async def fresh():
+            return "fresh"
+
+        return flight, await flight.do("key", fresh)
+
+    flight, result = asyncio.run(scenario())
+    assert result == "fresh"
+    assert flight.stats()["executions"] == 2
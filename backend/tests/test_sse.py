@@ -0,0 +1,52 @@
+"""Tests for app.services.sse."""
+import asyncio
+
+from app.services.sse import DeltaCoalescer, paced_events
+
+
+def test_flush_bytes_counts_utf8_bytes():
+    coalescer = DeltaCoalescer(flush_interval_ms=10_000, flush_bytes=8)
+    # Four characters, eight bytes
+    assert coalescer.add("ʻʻʻʻ") is not None
+
+
+def test_buffered_text_is_flushed_when_upstream_stalls():
+    async def events():
+        yield {"type": "text_delta", "content": "Modda "}
+        await asyncio.sleep(0.2)
+        yield {"type": "text_delta", "content": "46"}
+
+    async def scenario():
+        coalescer = DeltaCoalescer(flush_interval_ms=20, flush_bytes=2048)
+        seen = []
+        async for event in paced_events(events(), coalescer):
+            if event["type"] == "text_delta":
+                coalescer.add(event["content"])
+            seen.append(event["type"])
+        return seen
+
+    assert asyncio.run(scenario()) == ["text_delta", "sse_flush", "text_delta"]
+
+
+def test_closing_paced_events_closes_the_upstream():
+    closed = asyncio.Event()
+
+    async def events():
+        try:
+            yield {"type": "text_delta", "content": "a"}
+            await asyncio.sleep(10)
+        finally:
+            closed.set()
+
+    async def scenario():
+        coalescer = DeltaCoalescer(flush_interval_ms=10, flush_bytes=2048)
+        paced = paced_events(events(), coalescer)
+        async for event in paced:
+            if event["type"] == "text_delta":
+                coalescer.add(event["content"])
+            else:
+                break
+        await paced.aclose()
+        return closed.is_set()
+
+    assert asyncio.run(scenario())
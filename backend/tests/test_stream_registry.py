@@ -0,0 +1,235 @@
+"""Tests for resumable chat streams in app.services.stream_registry."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.schemas import MessageCreate
+from app.routers import chat
+from app.services import llm_service
+from app.services.llm_providers import StartedStream
+from app.services.scheduler import llm_scheduler
+from app.services.sse import format_sse
+from app.services.stream_registry import (
+    ResumeUnavailable,
+    StreamBuffer,
+    StreamRegistry,
+    generation_stats,
+)
+
+THREAD = "thread-1"
+USER = "user-1"
+GRACE_SECONDS = 0.05
+
+
+def delta(text: str) -> str:
+    return format_sse("text_delta", {"content": text})
+
+
+async def queued_frames(queue: asyncio.Queue):
+    """Frames pushed by the test; None ends the stream."""
+    while (frame := await queue.get()) is not None:
+        yield frame
+
+
+def make_registry(**options) -> StreamRegistry:
+    return StreamRegistry(**{"retention_seconds": 60, "max_streams": 10, "max_bytes_per_stream": 1 << 20, **options})
+
+
+def test_resume_replays_after_last_event_id_then_follows_live_frames():
+    async def scenario():
+        registry = make_registry()
+        queue: asyncio.Queue = asyncio.Queue()
+        buffer = registry.start(THREAD, USER, queued_frames(queue))
+        for text in ("509", "-modda", " 6-qism"):
+            queue.put_nowait(delta(text))
+        await asyncio.sleep(0)
+
+        # seq 1 is the "stream" frame, so seq 3 is "-modda"
+        resumed, after_seq = registry.resolve(THREAD, USER, f"{buffer.stream_id}:3")
+        assert resumed is buffer and after_seq == 3
+
+        received = []
+
+        async def follow():
+            async for frame in resumed.subscribe(after_seq):
+                received.append(frame)
+
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0)
+        queue.put_nowait(delta(" live"))
+        queue.put_nowait(None)
+        await asyncio.wait_for(follower, timeout=1)
+        return buffer.stream_id, received
+
+    stream_id, received = asyncio.run(scenario())
+    assert received == [
+        f"id: {stream_id}:4\n{delta(' 6-qism')}",
+        f"id: {stream_id}:5\n{delta(' live')}",
+    ]
+
+
+def test_resume_without_last_event_id_replays_latest_stream_from_start():
+    async def scenario():
+        registry = make_registry()
+        buffer = registry.start(THREAD, USER, queued_frames(asyncio.Queue()))
+        resumed, after_seq = registry.resolve(THREAD, USER, None)
+        buffer.task.cancel()
+        return buffer, resumed, after_seq
+
+    buffer, resumed, after_seq = asyncio.run(scenario())
+    assert resumed is buffer and after_seq == 0
+
+
+def test_resume_is_unavailable_once_frames_were_trimmed():
+    async def scenario():
+        buffer = StreamBuffer(THREAD, USER, max_bytes=300, disconnect_grace_seconds=0)
+        for i in range(20):
+            buffer.append(delta(f"chunk {i}"))
+        buffer.finish()
+        frames = buffer.subscribe(after_seq=2)
+        with pytest.raises(ResumeUnavailable):
+            await frames.__anext__()
+
+        # A position still in the buffer resumes normally
+        return [frame async for frame in buffer.subscribe(after_seq=19)]
+
+    remaining = asyncio.run(scenario())
+    assert len(remaining) == 1 and "chunk 19" in remaining[0]
+
+
+def test_resolve_rejects_other_users_and_threads():
+    async def scenario():
+        registry = make_registry()
+        buffer = registry.start(THREAD, USER, queued_frames(asyncio.Queue()))
+        last_event_id = f"{buffer.stream_id}:1"
+        try:
+            with pytest.raises(ResumeUnavailable):
+                registry.resolve(THREAD, "user-2", last_event_id)
+            with pytest.raises(ResumeUnavailable):
+                registry.resolve("thread-2", USER, last_event_id)
+            with pytest.raises(ResumeUnavailable):
+                registry.resolve(THREAD, USER, "unknown:1")
+        finally:
+            buffer.task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_prune_keeps_unfinished_buffers():
+    async def scenario():
+        registry = make_registry(retention_seconds=0, max_streams=1)
+        running = registry.start(THREAD, USER, queued_frames(asyncio.Queue()))
+        finished_queue: asyncio.Queue = asyncio.Queue()
+        finished = registry.start("thread-2", USER, queued_frames(finished_queue))
+        finished_queue.put_nowait(None)
+        await asyncio.wait_for(finished.task, timeout=1)
+
+        registry.prune()
+        stats = registry.stats()
+        running.task.cancel()
+        return running, finished, stats, registry
+
+    running, finished, stats, registry = asyncio.run(scenario())
+    assert stats["buffered"] == 1 and stats["active"] == 1
+    assert registry.resolve(THREAD, USER, None)[0] is running
+    with pytest.raises(ResumeUnavailable):
+        registry.resolve("thread-2", USER, None)
+
+
+class SlowLLMStream:
+    """An LLM stream that keeps producing deltas until closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0.005)
+        delta = SimpleNamespace(content=" modda", tool_calls=None)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def chat_stream(monkeypatch):
+    """send_message() wired to a slow fake LLM stream and a registry with a short grace period."""
+    stream = SlowLLMStream()
+
+    async def start_stream(providers, open_stream, hedge_after_seconds, scheduler, priority):
+        return StartedStream(providers[0], stream, stream, [await stream.__anext__()])
+
+    async def prepare_chat_turn(thread_id, user_id, content):
+        return [{"role": "user", "content": content}], False
+
+    async def no_answer_cache(question, user_id):
+        return None
+
+    monkeypatch.setattr(
+        llm_service, "get_global_llm_settings",
+        lambda: {"api_key": "test", "base_url": "http://llm.test/v1", "model": "test-model"},
+    )
+    monkeypatch.setattr(llm_service, "start_stream", start_stream)
+    monkeypatch.setattr(chat, "prepare_chat_turn", prepare_chat_turn)
+    monkeypatch.setattr(chat, "prepare_answer_cache", no_answer_cache)
+    monkeypatch.setattr(chat, "stream_registry", make_registry(disconnect_grace_seconds=GRACE_SECONDS))
+    monkeypatch.setitem(generation_stats, "cancelled", 0)
+
+    async def send():
+        response = await chat.send_message(
+            THREAD, MessageCreate(content="46-modda"), current_user=SimpleNamespace(id=USER), last_event_id=None
+        )
+        frames = response.body_iterator
+        await frames.__anext__()  # "stream" frame
+        await frames.__anext__()  # first text_delta
+        buffer = chat.stream_registry.resolve(THREAD, USER, None)[0]
+        return buffer, frames
+
+    return stream, send
+
+
+def test_generation_is_cancelled_after_grace_period_when_last_client_leaves(chat_stream):
+    stream, send = chat_stream
+
+    async def scenario():
+        buffer, frames = await send()
+        assert llm_scheduler.stats()["interactive"]["running"] == 1
+        await frames.aclose()  # client disconnected
+
+        await asyncio.sleep(GRACE_SECONDS / 5)
+        running_during_grace = not buffer.task.done()
+        await asyncio.wait_for(asyncio.gather(buffer.task, return_exceptions=True), timeout=1)
+        return running_during_grace, buffer
+
+    running_during_grace, buffer = asyncio.run(scenario())
+    assert running_during_grace
+    assert buffer.task.cancelled()
+    assert stream.closed
+    assert llm_scheduler.stats()["interactive"]["running"] == 0
+    assert generation_stats["cancelled"] == 1
+
+
+def test_reconnect_within_grace_period_keeps_generation_running(chat_stream):
+    stream, send = chat_stream
+
+    async def scenario():
+        buffer, frames = await send()
+        await frames.aclose()
+        await asyncio.sleep(GRACE_SECONDS / 5)
+
+        resumed = buffer.subscribe(after_seq=0)
+        await resumed.__anext__()
+        await asyncio.sleep(GRACE_SECONDS * 3)
+        still_running = not buffer.task.done()
+
+        buffer.task.cancel()
+        await asyncio.gather(buffer.task, return_exceptions=True)
+        await resumed.aclose()
+        return still_running
+
+    assert asyncio.run(scenario())
+    assert generation_stats["cancelled"] == 1  # only the explicit cancel at the end
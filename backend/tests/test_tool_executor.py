@@ -0,0 +1,32 @@
+"""Tests for app.services.tool_executor."""
+import json
+
+from postgrest.exceptions import APIError
+
+from app.services import tool_executor
+
+
+def quote_call(**arguments) -> dict:
+    return {"id": "call_1", "name": "quote_document_span", "arguments": json.dumps(arguments)}
+
+
+def test_quote_rejects_malformed_document_id_without_querying(monkeypatch):
+    def fail(*args):
+        raise AssertionError("fetch_chunk_span must not be called")
+
+    monkeypatch.setattr(tool_executor, "fetch_chunk_span", fail)
+    text, result = tool_executor.execute_quote_call(quote_call(document_id="qonun.pdf", start_chunk=1, end_chunk=2))
+    assert text == ""
+    assert result.startswith("Error: could not deliver span")
+
+
+def test_quote_turns_database_errors_into_tool_errors(monkeypatch):
+    def fail(*args):
+        raise APIError({"message": "statement timeout", "code": "57014"})
+
+    monkeypatch.setattr(tool_executor, "fetch_chunk_span", fail)
+    text, result = tool_executor.execute_quote_call(
+        quote_call(document_id="6f1c2b9e-8d4a-4c1e-9a57-3b0f2d8e6a11", start_chunk=1, end_chunk=2)
+    )
+    assert text == ""
+    assert result.startswith("Error: could not deliver span")
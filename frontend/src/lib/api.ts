@@ -85,6 +85,8 @@ export interface SendMessageOptions {
   signal?: AbortSignal
 }
 
+const MAX_STREAM_RESUMES = 3
+
 export async function sendMessage(options: SendMessageOptions): Promise<void> {
   const { threadId, content, onTextDelta, onDone, onError, signal } = options
 
@@ -93,7 +95,7 @@ export async function sendMessage(options: SendMessageOptions): Promise<void> {
     throw new Error('Not authenticated')
   }
 
-  const response = await fetch(`${API_URL}/threads/${threadId}/messages`, {
+  let response = await fetch(`${API_URL}/threads/${threadId}/messages`, {
     method: 'POST',
     headers: {
       'Authorization': `Bearer ${session.access_token}`,
@@ -103,55 +105,87 @@ export async function sendMessage(options: SendMessageOptions): Promise<void> {
     signal,
   })
 
-  if (!response.ok) {
-    const error = await response.json().catch(() => ({ detail: 'Request failed' }))
-    throw new Error(error.detail || 'Request failed')
-  }
+  // Id of the last SSE event received, used to resume after a dropped connection
+  let lastEventId: string | null = null
+  let resumes = 0
 
-  const reader = response.body?.getReader()
-  if (!reader) {
-    throw new Error('No response body')
-  }
+  while (true) {
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: 'Request failed' }))
+      throw new Error(error.detail || 'Request failed')
+    }
 
-  const decoder = new TextDecoder()
-  let buffer = ''
+    const reader = response.body?.getReader()
+    if (!reader) {
+      throw new Error('No response body')
+    }
 
-  try {
-    while (true) {
-      const { done, value } = await reader.read()
-      if (done) break
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let finished = false
 
-      const chunk = decoder.decode(value, { stream: true })
-      buffer += chunk
-      const lines = buffer.split('\n')
-      buffer = lines.pop() || ''
+    try {
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
 
-      for (const line of lines) {
-        if (line.startsWith('event: ')) {
-          const eventType = line.slice(7).trim()
-          if (eventType === 'done') {
-            onDone()
+        const chunk = decoder.decode(value, { stream: true })
+        buffer += chunk
+        const lines = buffer.split('\n')
+        buffer = lines.pop() || ''
+
+        for (const line of lines) {
+          if (line.startsWith('id: ')) {
+            lastEventId = line.slice(4).trim()
+            continue
           }
-          continue
-        }
-        if (line.startsWith('data: ')) {
-          const data = line.slice(6)
-          try {
-            const parsed = JSON.parse(data)
-            if (parsed.content) {
-              onTextDelta(parsed.content)
+          if (line.startsWith('event: ')) {
+            const eventType = line.slice(7).trim()
+            if (eventType === 'done') {
+              finished = true
+              onDone()
             }
-            if (parsed.error) {
-              onError(parsed.error)
+            continue
+          }
+          if (line.startsWith('data: ')) {
+            const data = line.slice(6)
+            try {
+              const parsed = JSON.parse(data)
+              if (parsed.content) {
+                onTextDelta(parsed.content)
+              }
+              if (parsed.error) {
+                finished = true
+                onError(parsed.error)
+              }
+            } catch {
+              // Ignore parse errors
             }
-          } catch {
-            // Ignore parse errors
           }
         }
       }
+    } catch (err) {
+      // Network drop mid-stream: fall through to resume; user aborts propagate
+      if (signal?.aborted || !lastEventId || resumes >= MAX_STREAM_RESUMES) {
+        throw err
+      }
+    } finally {
+      reader.releaseLock()
     }
-  } finally {
-    reader.releaseLock()
+
+    if (finished || signal?.aborted || !lastEventId || resumes >= MAX_STREAM_RESUMES) {
+      return
+    }
+
+    // The server keeps generating; replay the frames after lastEventId
+    resumes += 1
+    response = await fetch(`${API_URL}/threads/${threadId}/messages/stream`, {
+      headers: {
+        'Authorization': `Bearer ${session.access_token}`,
+        'Last-Event-ID': lastEventId,
+      },
+      signal,
+    })
   }
 }
 
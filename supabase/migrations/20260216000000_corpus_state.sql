@@ -0,0 +1,136 @@
+-- ============================================================================
+-- CORPUS STATE COUNTERS
+-- Single-row table maintained by triggers so "does the system have documents
+-- or chunks?" checks are O(1) reads instead of count(*) scans, plus a
+-- generation counter bumped on every corpus change for cache invalidation.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS corpus_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    pending_documents BIGINT NOT NULL DEFAULT 0,
+    processing_documents BIGINT NOT NULL DEFAULT 0,
+    completed_documents BIGINT NOT NULL DEFAULT 0,
+    failed_documents BIGINT NOT NULL DEFAULT 0,
+    chunk_count BIGINT NOT NULL DEFAULT 0,
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Seed from existing data
+INSERT INTO corpus_state (
+    id, pending_documents, processing_documents, completed_documents,
+    failed_documents, chunk_count, generation
+)
+SELECT
+    TRUE,
+    COUNT(*) FILTER (WHERE status = 'pending'),
+    COUNT(*) FILTER (WHERE status = 'processing'),
+    COUNT(*) FILTER (WHERE status = 'completed'),
+    COUNT(*) FILTER (WHERE status = 'failed'),
+    (SELECT COUNT(*) FROM chunks),
+    1
+FROM documents
+ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE corpus_state ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "authenticated_users_view_corpus_state"
+ON corpus_state FOR SELECT
+USING (auth.role() = 'authenticated');
+
+-- Apply a +1/-1 delta to the counter column for a document status
+CREATE OR REPLACE FUNCTION corpus_state_adjust_status(p_status text, p_delta bigint)
+RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE corpus_state SET
+        pending_documents = pending_documents + CASE WHEN p_status = 'pending' THEN p_delta ELSE 0 END,
+        processing_documents = processing_documents + CASE WHEN p_status = 'processing' THEN p_delta ELSE 0 END,
+        completed_documents = completed_documents + CASE WHEN p_status = 'completed' THEN p_delta ELSE 0 END,
+        failed_documents = failed_documents + CASE WHEN p_status = 'failed' THEN p_delta ELSE 0 END
+    WHERE id;
+END;
+$$;
+
+-- Documents: row-level (documents are few; status transitions matter)
+CREATE OR REPLACE FUNCTION corpus_state_on_documents()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM corpus_state_adjust_status(OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM corpus_state_adjust_status(NEW.status, 1);
+    END IF;
+
+    UPDATE corpus_state SET generation = generation + 1, updated_at = NOW() WHERE id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS corpus_state_documents ON documents;
+CREATE TRIGGER corpus_state_documents
+    AFTER INSERT OR DELETE OR UPDATE OF status ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION corpus_state_on_documents();
+
+-- Chunks: statement-level with transition tables, so a 50-chunk batch insert
+-- or a cascaded delete updates the counter row once, not once per chunk
+CREATE OR REPLACE FUNCTION corpus_state_on_chunks_insert()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    UPDATE corpus_state SET
+        chunk_count = chunk_count + (SELECT COUNT(*) FROM new_rows),
+        generation = generation + 1,
+        updated_at = NOW()
+    WHERE id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION corpus_state_on_chunks_delete()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    UPDATE corpus_state SET
+        chunk_count = chunk_count - (SELECT COUNT(*) FROM old_rows),
+        generation = generation + 1,
+        updated_at = NOW()
+    WHERE id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION corpus_state_on_chunks_update()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    -- Content/metadata edits (e.g. metadata backfill) invalidate caches too
+    UPDATE corpus_state SET generation = generation + 1, updated_at = NOW() WHERE id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS corpus_state_chunks_insert ON chunks;
+CREATE TRIGGER corpus_state_chunks_insert
+    AFTER INSERT ON chunks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION corpus_state_on_chunks_insert();
+
+DROP TRIGGER IF EXISTS corpus_state_chunks_delete ON chunks;
+CREATE TRIGGER corpus_state_chunks_delete
+    AFTER DELETE ON chunks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION corpus_state_on_chunks_delete();
+
+DROP TRIGGER IF EXISTS corpus_state_chunks_update ON chunks;
+CREATE TRIGGER corpus_state_chunks_update
+    AFTER UPDATE ON chunks
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION corpus_state_on_chunks_update();
+
+COMMENT ON TABLE corpus_state IS
+'Trigger-maintained document/chunk counters and corpus generation. Replaces count(*) probes on documents and chunks.';
@@ -0,0 +1,67 @@
+-- ============================================================================
+-- PREPARE CHAT TURN
+-- One round-trip for everything send_message needs before streaming:
+-- thread ownership check, user message insert, windowed history and the
+-- corpus flag. Replaces four sequential PostgREST calls.
+--
+-- The user message is stamped with p_created_at, the application clock that
+-- also stamps assistant messages, so database/app clock skew cannot order an
+-- answer before its question.
+-- ============================================================================
+
+-- Serves the windowed history scan (newest first within a thread)
+CREATE INDEX IF NOT EXISTS idx_messages_thread_created
+    ON messages(thread_id, created_at DESC);
+
+DROP FUNCTION IF EXISTS prepare_chat_turn(uuid, uuid, text, int);
+
+CREATE OR REPLACE FUNCTION prepare_chat_turn(
+    p_thread_id uuid,
+    p_user_id uuid,
+    p_content text,
+    p_history_limit int DEFAULT 50,
+    p_created_at timestamptz DEFAULT NOW()
+) RETURNS jsonb LANGUAGE plpgsql AS $$
+DECLARE
+    v_message messages;
+    v_history jsonb;
+    v_state corpus_state;
+BEGIN
+    -- Ownership check; NULL tells the caller to respond 404
+    IF NOT EXISTS (
+        SELECT 1 FROM threads WHERE id = p_thread_id AND user_id = p_user_id
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO messages (thread_id, user_id, role, content, created_at)
+    VALUES (p_thread_id, p_user_id, 'user', p_content, p_created_at)
+    RETURNING * INTO v_message;
+
+    -- Last p_history_limit messages, oldest first (includes the new message)
+    SELECT COALESCE(
+        jsonb_agg(jsonb_build_object('role', h.role, 'content', h.content) ORDER BY h.created_at, h.id),
+        '[]'::jsonb
+    )
+    INTO v_history
+    FROM (
+        SELECT m.id, m.role, m.content, m.created_at
+        FROM messages m
+        WHERE m.thread_id = p_thread_id
+        ORDER BY m.created_at DESC, m.id DESC
+        LIMIT p_history_limit
+    ) h;
+
+    SELECT * INTO v_state FROM corpus_state WHERE id;
+
+    RETURN jsonb_build_object(
+        'message', to_jsonb(v_message),
+        'history', v_history,
+        'has_documents', COALESCE(v_state.completed_documents, 0) > 0,
+        'corpus_generation', COALESCE(v_state.generation, 0)
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION prepare_chat_turn IS
+'Checks thread ownership, inserts the user message and returns {message, history, has_documents, corpus_generation} in one call. Returns NULL if the thread is not owned by the user.';
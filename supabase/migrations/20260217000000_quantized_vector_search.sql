@@ -0,0 +1,144 @@
+-- ============================================================================
+-- QUANTIZED VECTOR SEARCH
+-- Compact first-pass indexes over chunks.embedding with exact re-scoring.
+--
+-- The full vector(1536) column stays the source of truth; the indexes are
+-- expression indexes, so existing rows need no rewrite:
+--   halfvec: float16 HNSW index (~half the size of a float32 index)
+--   binary:  1 bit per dimension HNSW index (~1/32), hamming distance
+-- hybrid_search_chunks_quantized() takes match_count * rescore_factor
+-- candidates from the chosen index, re-scores them with the exact cosine
+-- distance and keeps the best match_count as the vector leg. The keyword
+-- leg and RRF fusion are identical to hybrid_search_chunks().
+--
+-- Requires pgvector >= 0.7 (halfvec, binary_quantize).
+--
+-- This migration only adds the functions. The quantized index itself is
+-- opt-in: before setting SEARCH_VECTOR_INDEX=halfvec or binary, run the
+-- matching script from supabase/optional/ (quantized_index_halfvec.sql or
+-- quantized_index_binary.sql). Each builds one HNSW index CONCURRENTLY, so
+-- writes are not blocked during the build. Deployments that stay on "exact"
+-- do not maintain any extra index on insert.
+-- ============================================================================
+
+-- First-pass candidate ids from a quantized index (approximate order)
+CREATE OR REPLACE FUNCTION quantized_vector_candidates(
+    query_embedding vector(1536),
+    candidate_count int,
+    metadata_filters jsonb DEFAULT NULL,
+    quantization text DEFAULT 'halfvec'
+) RETURNS TABLE (id uuid) LANGUAGE plpgsql AS $$
+BEGIN
+    -- HNSW returns at most ef_search rows per scan
+    PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(candidate_count, 40), 1000)::text, true);
+
+    IF quantization = 'halfvec' THEN
+        RETURN QUERY
+        SELECT c.id
+        FROM chunks c
+        WHERE metadata_filters IS NULL OR c.metadata @> metadata_filters
+        ORDER BY c.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)
+        LIMIT candidate_count;
+    ELSIF quantization = 'binary' THEN
+        RETURN QUERY
+        SELECT c.id
+        FROM chunks c
+        WHERE metadata_filters IS NULL OR c.metadata @> metadata_filters
+        ORDER BY binary_quantize(c.embedding)::bit(1536) <~> binary_quantize(query_embedding)
+        LIMIT candidate_count;
+    ELSE
+        RAISE EXCEPTION 'Unknown quantization: % (expected halfvec or binary)', quantization;
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION hybrid_search_chunks_quantized(
+    query_text TEXT,
+    query_embedding vector(1536),
+    match_threshold float,
+    match_count int,
+    final_count int,
+    p_user_id uuid,
+    metadata_filters jsonb DEFAULT NULL,
+    rrf_k int DEFAULT 60,
+    quantization text DEFAULT 'halfvec',
+    rescore_factor int DEFAULT 4
+) RETURNS TABLE (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    vector_similarity double precision,
+    keyword_rank real,
+    rrf_score double precision
+) LANGUAGE plpgsql AS $$
+BEGIN
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT q.id
+        FROM quantized_vector_candidates(
+            query_embedding, match_count * GREATEST(rescore_factor, 1), metadata_filters, quantization
+        ) q
+    ),
+    vector_search AS (
+        -- Exact re-scoring of the quantized candidates against the full vectors
+        SELECT
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            1 - (c.embedding <=> query_embedding) AS similarity,
+            ROW_NUMBER() OVER (ORDER BY c.embedding <=> query_embedding) AS rank
+        FROM chunks c
+        JOIN candidates q ON q.id = c.id
+        WHERE 1 - (c.embedding <=> query_embedding) > match_threshold
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT match_count
+    ),
+    keyword_search AS (
+        SELECT
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            ts_rank(to_tsvector('russian', c.content), plainto_tsquery('russian', query_text)) AS rank_score,
+            ROW_NUMBER() OVER (ORDER BY ts_rank(to_tsvector('russian', c.content), plainto_tsquery('russian', query_text)) DESC) AS rank
+        FROM chunks c
+        WHERE to_tsvector('russian', c.content) @@ plainto_tsquery('russian', query_text)
+            AND (metadata_filters IS NULL OR c.metadata @> metadata_filters)
+        ORDER BY rank_score DESC
+        LIMIT match_count
+    ),
+    rrf_scores AS (
+        SELECT
+            COALESCE(v.id, k.id) AS id,
+            COALESCE(v.document_id, k.document_id) AS document_id,
+            COALESCE(v.content, k.content) AS content,
+            COALESCE(v.chunk_index, k.chunk_index) AS chunk_index,
+            COALESCE(v.metadata, k.metadata) AS metadata,
+            COALESCE(v.similarity, 0) AS vector_similarity,
+            COALESCE(k.rank_score, 0) AS keyword_rank,
+            (COALESCE(1.0 / (rrf_k + v.rank), 0.0) + COALESCE(1.0 / (rrf_k + k.rank), 0.0))::double precision AS rrf_score
+        FROM vector_search v
+        FULL OUTER JOIN keyword_search k ON v.id = k.id
+    )
+    SELECT
+        rrf.id,
+        rrf.document_id,
+        rrf.content,
+        rrf.chunk_index,
+        rrf.metadata,
+        rrf.vector_similarity,
+        rrf.keyword_rank,
+        rrf.rrf_score
+    FROM rrf_scores rrf
+    ORDER BY rrf.rrf_score DESC
+    LIMIT final_count;
+END;
+$$;
+
+COMMENT ON FUNCTION hybrid_search_chunks_quantized IS
+'hybrid_search_chunks with a halfvec or binary-quantized first pass re-scored against the full vectors';
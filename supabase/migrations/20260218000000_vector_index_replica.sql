@@ -0,0 +1,217 @@
+-- ============================================================================
+-- VECTOR INDEX REPLICA SUPPORT
+-- Functions used by the in-process vector index (app/services/vector_index.py)
+-- and keyword index (app/services/keyword_index.py).
+--
+-- document_chunk_stamps: one row per document that ever had chunks, with its
+-- chunk count and the corpus generation of its last chunk change. Maintained
+-- by statement-level triggers on chunks, like corpus_state, so replicas can
+-- sync without scanning chunks. They fire after the corpus_state triggers
+-- (same-event triggers fire in name order), so they record the generation
+-- those just bumped. Documents whose chunks were all deleted keep a row with
+-- chunk_count 0, so an incremental sync sees the deletion.
+--
+-- chunk_document_stamps(since_generation): {"generation": current corpus
+-- generation, "stamps": {document_id: [chunk count, generation]}} for the
+-- documents changed after since_generation, or for every document with
+-- chunks when it is NULL. One jsonb value rather than rows, so PostgREST's
+-- max-rows cap never truncates it.
+--
+-- hybrid_search_chunks_with_candidates(): hybrid_search_chunks with the
+-- vector leg supplied by the caller (ids and similarities in rank order)
+-- instead of scanning chunks.embedding. Candidates whose chunk no longer
+-- exists are dropped by the join; the keyword leg and RRF fusion are the
+-- same as hybrid_search_chunks().
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS document_chunk_stamps (
+    document_id UUID PRIMARY KEY,
+    chunk_count BIGINT NOT NULL DEFAULT 0,
+    generation BIGINT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS document_chunk_stamps_generation_idx
+    ON document_chunk_stamps (generation);
+
+-- Seed from existing data (the last corpus-sized scan)
+INSERT INTO document_chunk_stamps (document_id, chunk_count, generation)
+SELECT c.document_id, COUNT(*), COALESCE((SELECT generation FROM corpus_state WHERE id), 0)
+FROM chunks c
+GROUP BY c.document_id
+ON CONFLICT (document_id) DO NOTHING;
+
+-- Read through chunk_document_stamps() with the service role only
+ALTER TABLE document_chunk_stamps ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION document_chunk_stamps_on_chunks_insert()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    INSERT INTO document_chunk_stamps AS s (document_id, chunk_count, generation)
+    SELECT n.document_id, COUNT(*), (SELECT generation FROM corpus_state WHERE id)
+    FROM new_rows n
+    GROUP BY n.document_id
+    ON CONFLICT (document_id) DO UPDATE SET
+        chunk_count = s.chunk_count + EXCLUDED.chunk_count,
+        generation = EXCLUDED.generation;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION document_chunk_stamps_on_chunks_delete()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    UPDATE document_chunk_stamps s SET
+        chunk_count = GREATEST(s.chunk_count - o.removed, 0),
+        generation = (SELECT generation FROM corpus_state WHERE id)
+    FROM (SELECT document_id, COUNT(*) AS removed FROM old_rows GROUP BY document_id) o
+    WHERE s.document_id = o.document_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION document_chunk_stamps_on_chunks_update()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public, pg_temp AS $$
+BEGIN
+    -- Only content and embedding matter to the replicas: metadata backfills
+    -- leave the stamps alone, so they do not make replicas refetch documents
+    UPDATE document_chunk_stamps s SET
+        generation = (SELECT generation FROM corpus_state WHERE id)
+    WHERE s.document_id IN (
+        SELECT n.document_id
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.content IS DISTINCT FROM o.content
+            OR n.embedding IS DISTINCT FROM o.embedding
+    );
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS document_chunk_stamps_insert ON chunks;
+CREATE TRIGGER document_chunk_stamps_insert
+    AFTER INSERT ON chunks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION document_chunk_stamps_on_chunks_insert();
+
+DROP TRIGGER IF EXISTS document_chunk_stamps_delete ON chunks;
+CREATE TRIGGER document_chunk_stamps_delete
+    AFTER DELETE ON chunks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION document_chunk_stamps_on_chunks_delete();
+
+DROP TRIGGER IF EXISTS document_chunk_stamps_update ON chunks;
+CREATE TRIGGER document_chunk_stamps_update
+    AFTER UPDATE ON chunks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION document_chunk_stamps_on_chunks_update();
+
+DROP FUNCTION IF EXISTS chunk_document_stamps();
+
+CREATE OR REPLACE FUNCTION chunk_document_stamps(since_generation bigint DEFAULT NULL)
+RETURNS jsonb LANGUAGE sql STABLE AS $$
+    SELECT jsonb_build_object(
+        'generation', COALESCE((SELECT generation FROM corpus_state WHERE id), 0),
+        'stamps', COALESCE((
+            SELECT jsonb_object_agg(s.document_id, jsonb_build_array(s.chunk_count, s.generation))
+            FROM document_chunk_stamps s
+            WHERE CASE
+                WHEN since_generation IS NULL THEN s.chunk_count > 0
+                ELSE s.generation > since_generation
+            END
+        ), '{}'::jsonb)
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION hybrid_search_chunks_with_candidates(
+    query_text TEXT,
+    candidate_ids uuid[],
+    candidate_similarities double precision[],
+    match_count int,
+    final_count int,
+    metadata_filters jsonb DEFAULT NULL,
+    rrf_k int DEFAULT 60
+) RETURNS TABLE (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    vector_similarity double precision,
+    keyword_rank real,
+    rrf_score double precision
+) LANGUAGE plpgsql AS $$
+BEGIN
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT u.candidate_id, u.similarity, u.rank
+        FROM unnest(candidate_ids, candidate_similarities) WITH ORDINALITY AS u(candidate_id, similarity, rank)
+    ),
+    vector_search AS (
+        SELECT
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            v.similarity,
+            v.rank
+        FROM candidates v
+        JOIN chunks c ON c.id = v.candidate_id
+        WHERE metadata_filters IS NULL OR c.metadata @> metadata_filters
+        ORDER BY v.rank
+        LIMIT match_count
+    ),
+    keyword_search AS (
+        SELECT
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            ts_rank(to_tsvector('russian', c.content), plainto_tsquery('russian', query_text)) AS rank_score,
+            ROW_NUMBER() OVER (ORDER BY ts_rank(to_tsvector('russian', c.content), plainto_tsquery('russian', query_text)) DESC) AS rank
+        FROM chunks c
+        WHERE to_tsvector('russian', c.content) @@ plainto_tsquery('russian', query_text)
+            AND (metadata_filters IS NULL OR c.metadata @> metadata_filters)
+        ORDER BY rank_score DESC
+        LIMIT match_count
+    ),
+    rrf_scores AS (
+        SELECT
+            COALESCE(v.id, k.id) AS id,
+            COALESCE(v.document_id, k.document_id) AS document_id,
+            COALESCE(v.content, k.content) AS content,
+            COALESCE(v.chunk_index, k.chunk_index) AS chunk_index,
+            COALESCE(v.metadata, k.metadata) AS metadata,
+            COALESCE(v.similarity, 0) AS vector_similarity,
+            COALESCE(k.rank_score, 0) AS keyword_rank,
+            (COALESCE(1.0 / (rrf_k + v.rank), 0.0) + COALESCE(1.0 / (rrf_k + k.rank), 0.0))::double precision AS rrf_score
+        FROM vector_search v
+        FULL OUTER JOIN keyword_search k ON v.id = k.id
+    )
+    SELECT
+        rrf.id,
+        rrf.document_id,
+        rrf.content,
+        rrf.chunk_index,
+        rrf.metadata,
+        rrf.vector_similarity,
+        rrf.keyword_rank,
+        rrf.rrf_score
+    FROM rrf_scores rrf
+    ORDER BY rrf.rrf_score DESC
+    LIMIT final_count;
+END;
+$$;
+
+COMMENT ON FUNCTION hybrid_search_chunks_with_candidates IS
+'hybrid_search_chunks with the vector leg supplied by an in-process index replica';
+
+COMMENT ON TABLE document_chunk_stamps IS
+'Trigger-maintained per-document chunk count and last-change generation, read by chunk_document_stamps() for incremental replica syncs.';
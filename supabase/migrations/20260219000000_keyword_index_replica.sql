@@ -0,0 +1,133 @@
+-- ============================================================================
+-- KEYWORD INDEX REPLICA SUPPORT
+-- Fusion function used with the in-process BM25 index
+-- (app/services/keyword_index.py).
+--
+-- hybrid_search_chunks_with_keyword_candidates(): hybrid_search_chunks with
+-- the keyword leg supplied by the caller (ids and BM25 scores in rank order)
+-- instead of ts_rank over to_tsvector('russian', ...). The vector leg is
+-- supplied too when the vector index replica is current (candidate_ids),
+-- otherwise it is scanned here: exactly as in hybrid_search_chunks(), or with
+-- quantization 'halfvec'/'binary' (SEARCH_VECTOR_INDEX) as a quantized first
+-- pass of match_count * rescore_factor candidates re-scored exactly, as in
+-- hybrid_search_chunks_quantized().
+-- Candidates whose chunk no longer exists are dropped by the joins.
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS hybrid_search_chunks_with_keyword_candidates(
+    vector, float, uuid[], real[], int, int, jsonb, int, uuid[], double precision[]
+);
+
+CREATE OR REPLACE FUNCTION hybrid_search_chunks_with_keyword_candidates(
+    query_embedding vector(1536),
+    match_threshold float,
+    keyword_ids uuid[],
+    keyword_scores real[],
+    match_count int,
+    final_count int,
+    metadata_filters jsonb DEFAULT NULL,
+    rrf_k int DEFAULT 60,
+    candidate_ids uuid[] DEFAULT NULL,
+    candidate_similarities double precision[] DEFAULT NULL,
+    quantization text DEFAULT 'exact',
+    rescore_factor int DEFAULT 4
+) RETURNS TABLE (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    vector_similarity double precision,
+    keyword_rank real,
+    rrf_score double precision
+) LANGUAGE plpgsql AS $$
+BEGIN
+    IF candidate_ids IS NULL AND quantization <> 'exact' THEN
+        -- Quantized first pass, re-scored against the full vectors
+        SELECT array_agg(v.chunk_id ORDER BY v.distance), array_agg(1 - v.distance ORDER BY v.distance)
+        INTO candidate_ids, candidate_similarities
+        FROM (
+            SELECT c.id AS chunk_id, c.embedding <=> query_embedding AS distance
+            FROM chunks c
+            JOIN quantized_vector_candidates(
+                query_embedding, match_count * GREATEST(rescore_factor, 1), metadata_filters, quantization
+            ) q ON q.id = c.id
+            WHERE 1 - (c.embedding <=> query_embedding) > match_threshold
+            ORDER BY c.embedding <=> query_embedding
+            LIMIT match_count
+        ) v;
+    ELSIF candidate_ids IS NULL THEN
+        -- Separate statement, so the planner can use the embedding index
+        SELECT array_agg(v.chunk_id ORDER BY v.distance), array_agg(1 - v.distance ORDER BY v.distance)
+        INTO candidate_ids, candidate_similarities
+        FROM (
+            SELECT c.id AS chunk_id, c.embedding <=> query_embedding AS distance
+            FROM chunks c
+            WHERE 1 - (c.embedding <=> query_embedding) > match_threshold
+                AND (metadata_filters IS NULL OR c.metadata @> metadata_filters)
+            ORDER BY c.embedding <=> query_embedding
+            LIMIT match_count
+        ) v;
+    END IF;
+
+    RETURN QUERY
+    WITH vector_search AS (
+        SELECT
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            u.similarity,
+            u.rank
+        FROM unnest(candidate_ids, candidate_similarities) WITH ORDINALITY AS u(candidate_id, similarity, rank)
+        JOIN chunks c ON c.id = u.candidate_id
+        WHERE metadata_filters IS NULL OR c.metadata @> metadata_filters
+        ORDER BY u.rank
+        LIMIT match_count
+    ),
+    keyword_search AS (
+        SELECT
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            u.score AS rank_score,
+            u.rank
+        FROM unnest(keyword_ids, keyword_scores) WITH ORDINALITY AS u(candidate_id, score, rank)
+        JOIN chunks c ON c.id = u.candidate_id
+        WHERE metadata_filters IS NULL OR c.metadata @> metadata_filters
+        ORDER BY u.rank
+        LIMIT match_count
+    ),
+    rrf_scores AS (
+        SELECT
+            COALESCE(v.id, k.id) AS id,
+            COALESCE(v.document_id, k.document_id) AS document_id,
+            COALESCE(v.content, k.content) AS content,
+            COALESCE(v.chunk_index, k.chunk_index) AS chunk_index,
+            COALESCE(v.metadata, k.metadata) AS metadata,
+            COALESCE(v.similarity, 0) AS vector_similarity,
+            COALESCE(k.rank_score, 0) AS keyword_rank,
+            (COALESCE(1.0 / (rrf_k + v.rank), 0.0) + COALESCE(1.0 / (rrf_k + k.rank), 0.0))::double precision AS rrf_score
+        FROM vector_search v
+        FULL OUTER JOIN keyword_search k ON v.id = k.id
+    )
+    SELECT
+        rrf.id,
+        rrf.document_id,
+        rrf.content,
+        rrf.chunk_index,
+        rrf.metadata,
+        rrf.vector_similarity,
+        rrf.keyword_rank,
+        rrf.rrf_score
+    FROM rrf_scores rrf
+    ORDER BY rrf.rrf_score DESC
+    LIMIT final_count;
+END;
+$$;
+
+COMMENT ON FUNCTION hybrid_search_chunks_with_keyword_candidates IS
+'hybrid_search_chunks with the keyword leg (and optionally the vector leg) supplied by in-process index replicas';
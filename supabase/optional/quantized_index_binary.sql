@@ -0,0 +1,18 @@
+-- ============================================================================
+-- OPTIONAL: BINARY INDEX FOR SEARCH_VECTOR_INDEX=binary
+-- 1 bit per dimension HNSW expression index over chunks.embedding (~1/32
+-- of the float32 index, hamming distance), used by
+-- hybrid_search_chunks_quantized(). Needs the
+-- 20260217000000_quantized_vector_search migration.
+--
+-- Not a migration: run it once, by hand, only where binary search is
+-- enabled, e.g.
+--     psql "$DATABASE_URL" -f supabase/optional/quantized_index_binary.sql
+-- CONCURRENTLY keeps chunks writable during the build, but cannot run
+-- inside a transaction block. Building HNSW on a large table is slow;
+-- raise maintenance_work_mem for the session first. Once binary is in use,
+-- idx_chunks_embedding can be dropped to free memory.
+-- ============================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_embedding_binary ON chunks
+    USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops);
@@ -0,0 +1,17 @@
+-- ============================================================================
+-- OPTIONAL: HALFVEC INDEX FOR SEARCH_VECTOR_INDEX=halfvec
+-- float16 HNSW expression index over chunks.embedding (~half the size of
+-- the float32 index), used by hybrid_search_chunks_quantized(). Needs the
+-- 20260217000000_quantized_vector_search migration.
+--
+-- Not a migration: run it once, by hand, only where halfvec search is
+-- enabled, e.g.
+--     psql "$DATABASE_URL" -f supabase/optional/quantized_index_halfvec.sql
+-- CONCURRENTLY keeps chunks writable during the build, but cannot run
+-- inside a transaction block. Building HNSW on a large table is slow;
+-- raise maintenance_work_mem for the session first. Once halfvec is in
+-- use, idx_chunks_embedding can be dropped to free memory.
+-- ============================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_embedding_halfvec ON chunks
+    USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops);